@@ -0,0 +1,139 @@
+"""
+Dados sintéticos no formato dos uploads (catálogo/kits, FULL, físico,
+Shopee), gerados de forma reprodutível a partir de uma semente.
+"""
+import io
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Distribuição da profundidade dos kits: nível 1 só tem componentes,
+# nível d tem ao menos um kit do nível d-1.
+PROFUNDIDADE = (0.75, 0.2, 0.05)
+FANOUT = (2, 6)              # componentes por kit (mín, máx)
+FRACAO_KITS = 0.3            # kits por SKU de catálogo
+SKUS_POR_FORNECEDOR = 250
+
+
+@dataclass
+class DadosSinteticos:
+    catalogo: pd.DataFrame    # aba CATALOGO (SKU, Fornecedor, Status)
+    kits: pd.DataFrame        # aba KITS (kit_sku, componente, qtd)
+    full: pd.DataFrame        # SKU, Vendas_60d, Estoque_Full, Em_Transito
+    fisico: pd.DataFrame      # SKU, Estoque_Fisico, Preco (texto "R$ 1.234,56")
+    vendas: pd.DataFrame      # Shopee: uma linha por pedido (SKU, Quantidade)
+
+    @property
+    def n_skus(self) -> int:
+        return len(self.catalogo)
+
+
+def _brl(valores: np.ndarray) -> np.ndarray:
+    """Formata como na exportação dos ERPs: R$ 1.234,56."""
+    txt = pd.Series(valores).map("{:,.2f}".format)
+    return ("R$ " + txt.str.replace(",", "_").str.replace(".", ",")
+            .str.replace("_", ".")).to_numpy()
+
+
+def _variar_grafia(skus: np.ndarray, rng, fracao=0.1) -> np.ndarray:
+    """Parte dos SKUs chega em minúsculas e com espaços (exercita a normalização)."""
+    out = skus.astype(object).copy()
+    idx = rng.random(len(out)) < fracao
+    out[idx] = [f" {s.lower()} " for s in out[idx]]
+    return out
+
+
+def _gerar_kits(componentes: np.ndarray, n_kits: int, rng) -> pd.DataFrame:
+    por_nivel = np.floor(np.asarray(PROFUNDIDADE) * n_kits).astype(int)
+    por_nivel[0] += n_kits - por_nivel.sum()
+
+    partes = []
+    anteriores = np.array([], dtype=object)
+    inicio = 0
+    for nivel, n in enumerate(por_nivel, start=1):
+        if n == 0 or (nivel > 1 and len(anteriores) == 0):
+            continue
+        kits = np.array([f"KIT-{i:07d}" for i in range(inicio, inicio + n)], dtype=object)
+        inicio += n
+
+        fanout = rng.integers(FANOUT[0], FANOUT[1] + 1, n)
+        kit_col = np.repeat(kits, fanout)
+        comp_col = componentes[rng.integers(0, len(componentes), fanout.sum())]
+        if nivel > 1:
+            # Primeiro filho de cada kit é um kit do nível anterior
+            primeiros = np.r_[0, np.cumsum(fanout)[:-1]]
+            comp_col[primeiros] = anteriores[rng.integers(0, len(anteriores), n)]
+
+        partes.append(pd.DataFrame({"kit_sku": kit_col, "componente": comp_col}))
+        anteriores = kits
+
+    kits_df = pd.concat(partes, ignore_index=True).drop_duplicates(["kit_sku", "componente"])
+    kits_df["qtd"] = rng.choice([1, 1, 1, 2, 2, 3, 4, 6], len(kits_df)).astype(str)
+    return kits_df.reset_index(drop=True)
+
+
+def gerar_dados(n_skus: int, semente: int = 0) -> DadosSinteticos:
+    """Conjunto completo para um catálogo de n_skus componentes."""
+    rng = np.random.default_rng(semente)
+
+    componentes = np.array([f"CMP-{i:07d}" for i in range(n_skus)], dtype=object)
+    n_fornecedores = max(1, n_skus // SKUS_POR_FORNECEDOR)
+    status = np.where(rng.random(n_skus) < 0.02, "nao_repor", "")
+    catalogo = pd.DataFrame({
+        "SKU": componentes,
+        "Fornecedor": np.char.add("FORN", rng.integers(0, n_fornecedores, n_skus).astype(str)),
+        "Status": status,
+    })
+
+    kits = _gerar_kits(componentes, int(n_skus * FRACAO_KITS), rng)
+    todos = np.concatenate([componentes, kits["kit_sku"].unique()])
+
+    # Demanda com cauda longa: poucos SKUs vendem muito
+    anuncios = todos[rng.random(len(todos)) < 0.6]
+    demanda = rng.gamma(0.6, 20, len(anuncios))
+    full = pd.DataFrame({
+        "SKU": _variar_grafia(anuncios, rng),
+        "Vendas_60d": rng.poisson(demanda),
+        "Estoque_Full": rng.poisson(demanda / 2),
+        "Em_Transito": np.where(rng.random(len(anuncios)) < 0.1,
+                                rng.integers(1, 50, len(anuncios)), 0),
+    })
+
+    fisico_skus = componentes[rng.random(n_skus) < 0.8]
+    fisico = pd.DataFrame({
+        "SKU": _variar_grafia(fisico_skus, rng),
+        "Estoque_Fisico": rng.poisson(15, len(fisico_skus)),
+        "Preco": _brl(np.round(rng.lognormal(3, 1, len(fisico_skus)), 2)),
+    })
+
+    pedidos = 2 * len(anuncios)
+    pesos = demanda / demanda.sum()
+    vendas = pd.DataFrame({
+        "SKU": _variar_grafia(anuncios[rng.choice(len(anuncios), pedidos, p=pesos)], rng),
+        "Quantidade": rng.integers(1, 4, pedidos),
+    })
+
+    return DadosSinteticos(catalogo, kits, full, fisico, vendas)
+
+
+def planilha_padrao(dados: DadosSinteticos) -> bytes:
+    """Planilha padrão (abas CATALOGO e KITS) como bytes de .xlsx."""
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as w:
+        dados.catalogo.to_excel(w, sheet_name="CATALOGO", index=False)
+        dados.kits.to_excel(w, sheet_name="KITS", index=False)
+    return buf.getvalue()
+
+
+def itens_oc(n_itens: int, semente: int = 0) -> pd.DataFrame:
+    """Itens de uma OC no formato de salvar_oc/gerar_pdf_oc."""
+    rng = np.random.default_rng(semente)
+    qtd = rng.integers(1, 500, n_itens)
+    preco = np.round(rng.lognormal(3, 1, n_itens), 2)
+    return pd.DataFrame({
+        "SKU": [f"CMP-{i:07d}" for i in range(n_itens)],
+        "Qtd_Ajustada": qtd,
+        "Preco_Custo": preco,
+        "Valor_Ajustado_R$": np.round(qtd * preco, 2),
+    })
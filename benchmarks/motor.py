@@ -0,0 +1,242 @@
+"""
+Mede o motor de reposição com dados sintéticos.
+
+    python -m benchmarks.motor [--escalas 1000 10000 ...] [--repeticoes N]
+                               [--saida atual.json] [--comparar anterior.json]
+
+Para cada tamanho de catálogo: tempo (mediana), vazão (itens/s) e pico de
+memória (tracemalloc, numa execução à parte) de cada etapa de
+calcular_reposicao, de explodir_kits, carregar_padrao_excel, salvar_oc
+e gerar_pdf_oc. Roda sem rede: o banco de OCs e o cache do catálogo
+ficam numa pasta temporária.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data.cache import impressao
+from engine import calculo, kits, oc_engine
+from engine.kits import Catalogo
+
+from .dados import gerar_dados, itens_oc, planilha_padrao
+
+ESCALAS = (1_000, 10_000, 50_000)
+ITENS_OC = 300
+
+
+def medir(func, itens: int, repeticoes: int = 3, preparar=None) -> dict:
+    """
+    Mediana de `repeticoes` execuções de func(); preparar() roda antes de
+    cada uma, fora do cronômetro. O pico de memória vem de uma execução
+    extra com tracemalloc ligado (que deixa o código mais lento).
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        t = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t)
+
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        func()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    segundos = statistics.median(tempos)
+    return {
+        "segundos": segundos,
+        "itens": itens,
+        "itens_por_s": itens / segundos if segundos > 0 else None,
+        "pico_bytes": pico,
+    }
+
+
+def _catalogo_novo(cat: Catalogo) -> Catalogo:
+    """Mesmo catálogo sem os caches (kits efetivos, matriz, dicionário)."""
+    return Catalogo(cat.catalogo_simples, cat.kits_reais)
+
+
+def medir_escala(n_skus: int, repeticoes: int, pasta: str) -> dict:
+    d = gerar_dados(n_skus)
+    xls = planilha_padrao(d)
+    cache_dir = os.path.join(pasta, "catalogo")
+    res = {"_dados": {"skus": n_skus, "kits": int(d.kits["kit_sku"].nunique()),
+                      "linhas_kits": len(d.kits), "full": len(d.full),
+                      "fisico": len(d.fisico), "vendas": len(d.vendas)}}
+
+    # -----------------------------
+    # Planilha padrão
+    # -----------------------------
+    res["carregar_padrao_excel"] = medir(
+        lambda: kits.carregar_padrao_excel(xls, usar_cache=False),
+        n_skus + len(d.kits), repeticoes)
+    kits.carregar_padrao_excel(xls, cache_dir=cache_dir)
+    res["carregar_padrao_excel_cache"] = medir(
+        lambda: kits.carregar_padrao_excel(xls, cache_dir=cache_dir),
+        n_skus + len(d.kits), repeticoes)
+
+    cat = kits.carregar_padrao_excel(xls, usar_cache=False)
+
+    # -----------------------------
+    # Catálogo compilado
+    # -----------------------------
+    estado = {}
+
+    def novo():
+        estado["cat"] = _catalogo_novo(cat)
+
+    res["construir_kits_efetivo"] = medir(
+        lambda: kits.construir_kits_efetivo(estado["cat"]),
+        len(cat.kits_reais), repeticoes, preparar=novo)
+    efetivo = kits.construir_kits_efetivo(cat)
+    res["compilar_kits"] = medir(lambda: kits.compilar_kits(efetivo),
+                                 len(efetivo), repeticoes)
+    matriz = kits.matriz_kits(cat)
+    res["explodir_kits"] = medir(
+        lambda: kits.explodir_kits(d.full, matriz, "SKU", "Vendas_60d"),
+        len(d.full), repeticoes)
+
+    # -----------------------------
+    # Etapas de calcular_reposicao
+    # -----------------------------
+    res["preparar_full"] = medir(lambda: calculo.preparar_full(d.full),
+                                 len(d.full), repeticoes)
+    res["preparar_fisico"] = medir(lambda: calculo.preparar_fisico(d.fisico),
+                                   len(d.fisico), repeticoes)
+    res["preparar_vendas"] = medir(lambda: calculo.preparar_vendas(d.vendas),
+                                   len(d.vendas), repeticoes)
+
+    full = calculo.preparar_full(d.full)
+    fisico = calculo.preparar_fisico(d.fisico)
+    vendas = calculo.preparar_vendas(d.vendas)
+    res["montar_base"] = medir(lambda: calculo._montar_base(full, fisico, vendas, cat),
+                               len(cat.catalogo_simples), repeticoes)
+
+    b = calculo._montar_base(full, fisico, vendas, cat)
+    res["aplicar_parametros"] = medir(
+        lambda: calculo.aplicar_parametros(b, horizonte=45, lead_time=15, crescimento=5),
+        len(b.base), repeticoes)
+
+    def frio():
+        calculo.limpar_etapas()
+        novo()
+
+    res["calcular_reposicao_frio"] = medir(
+        lambda: calculo.calcular_reposicao(d.full, d.fisico, d.vendas, estado["cat"]),
+        len(d.full) + len(d.fisico) + len(d.vendas), repeticoes, preparar=frio)
+
+    calculo.calcular_reposicao(d.full, d.fisico, d.vendas, cat)
+    res["calcular_reposicao_parametros"] = medir(
+        lambda: calculo.calcular_reposicao(d.full, d.fisico, d.vendas, cat, horizonte=30),
+        len(cat.catalogo_simples), repeticoes)
+    # Impressões calculadas no upload (data.storage): nada é re-hasheado
+    impressoes = {"full": impressao(d.full), "fisico": impressao(d.fisico),
+                  "vendas": impressao(d.vendas), "catalogo": kits.impressao_catalogo(cat)}
+    res["calcular_reposicao_parametros_impressoes"] = medir(
+        lambda: calculo.calcular_reposicao(d.full, d.fisico, d.vendas, cat, horizonte=30,
+                                           impressoes=impressoes),
+        len(cat.catalogo_simples), repeticoes)
+    calculo.limpar_etapas()
+
+    # -----------------------------
+    # OCs
+    # -----------------------------
+    itens = itens_oc(ITENS_OC)
+    res["salvar_oc"] = medir(lambda: oc_engine.salvar_oc(None, "FORN0", "BENCH", itens),
+                             len(itens), repeticoes)
+    res["gerar_pdf_oc"] = medir(
+        lambda: oc_engine.renderizar_pdf_oc("OC-BENCH", "FORN0", "BENCH", itens),
+        len(itens), repeticoes)
+    return res
+
+
+def _metadados() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "data": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+def executar(escalas=ESCALAS, repeticoes: int = 3) -> dict:
+    resultado = {"meta": _metadados(), "escalas": {}}
+    db_original = oc_engine.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        oc_engine.fechar_conexoes()
+        oc_engine.DB_PATH = os.path.join(pasta, "bench.db")
+        try:
+            oc_engine.init_db()
+            for n in escalas:
+                resultado["escalas"][str(n)] = medir_escala(n, repeticoes, pasta)
+        finally:
+            oc_engine.fechar_conexoes()
+            oc_engine.DB_PATH = db_original
+    return resultado
+
+
+def imprimir(resultado: dict, anterior: dict = None):
+    for n, etapas in resultado["escalas"].items():
+        d = etapas["_dados"]
+        print(f"\n== {int(n):,} SKUs ({d['kits']:,} kits, {d['full']:,} FULL, "
+              f"{d['vendas']:,} pedidos)")
+        base = (anterior or {}).get("escalas", {}).get(n, {})
+        for nome, m in etapas.items():
+            if nome.startswith("_"):
+                continue
+            linha = (f"{nome:<32} {m['segundos'] * 1000:10.1f} ms "
+                     f"{m['itens_por_s'] or 0:14,.0f} it/s "
+                     f"{m['pico_bytes'] / 2**20:9.1f} MB")
+            if nome in base:
+                linha += f"   x{base[nome]['segundos'] / m['segundos']:.2f}"
+            print(linha)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS),
+                        help="tamanhos de catálogo (SKUs)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior "
+                                           "(mostra o ganho de velocidade)")
+    args = parser.parse_args(argv)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+
+    resultado = executar(args.escalas, args.repeticoes)
+    imprimir(resultado, anterior)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Mede o tempo de carregamento do app.
+
+    python -m benchmarks.startup [--repeticoes N] [--saida arquivo.json]
+
+- import a frio de cada módulo (processo novo a cada medição) e quais
+  dependências pesadas ele puxa;
+- partida a frio do streamlit_app e latência de rerun por página
+  (streamlit.testing.AppTest, sem servidor).
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = [
+    "engine.normalizador", "engine.kits", "engine.calculo",
+    "engine.oc_engine", "engine.db",
+    "ui.upload", "ui.calculo", "ui.pre_oc", "ui.oc_oficial",
+    "ui.historico", "ui.alocacao",
+]
+
+PESADOS = ["pandas", "numpy", "unidecode", "reportlab", "supabase", "streamlit"]
+
+_IMPORT = """
+import json, sys, time
+t = time.perf_counter()
+import {modulo}
+dt = time.perf_counter() - t
+print(json.dumps({{"segundos": dt,
+                   "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+_APP = """
+import json, time
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file("streamlit_app.py", default_timeout=120)
+at.run()
+partida = time.perf_counter() - t
+reruns = {{}}
+for pagina in {paginas!r}:
+    at.sidebar.radio[0].set_value(pagina).run()
+    t = time.perf_counter()
+    at.run()
+    reruns[pagina] = time.perf_counter() - t
+print(json.dumps({{"partida": partida, "reruns": reruns}}))
+"""
+
+
+def _rodar(codigo: str) -> dict:
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ,
+                           capture_output=True, text=True)
+    if saida.returncode != 0:
+        return {"erro": saida.stderr.strip().splitlines()[-1]}
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def medir_imports(repeticoes: int = 3) -> dict:
+    out = {}
+    for modulo in MODULOS:
+        medidas = [_rodar(_IMPORT.format(modulo=modulo, pesados=PESADOS))
+                   for _ in range(repeticoes)]
+        if "erro" in medidas[-1]:
+            out[modulo] = {"segundos": None, "pesados": [], "erro": medidas[-1]["erro"]}
+            continue
+        out[modulo] = {
+            "segundos": statistics.median(m["segundos"] for m in medidas),
+            "pesados": medidas[-1]["pesados"],
+        }
+    return out
+
+
+def _paginas() -> list:
+    """Nomes das páginas lidos do registro em streamlit_app.py."""
+    with open(os.path.join(RAIZ, "streamlit_app.py"), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and getattr(no.targets[0], "id", None) == "PAGINAS":
+            return list(ast.literal_eval(no.value))
+    return []
+
+
+def medir_app(repeticoes: int = 3) -> dict:
+    medidas = [_rodar(_APP.format(paginas=_paginas())) for _ in range(repeticoes)]
+    if "erro" in medidas[-1]:
+        return {"erro": medidas[-1]["erro"]}
+    return {
+        "partida": statistics.median(m["partida"] for m in medidas),
+        "reruns": {p: statistics.median(m["reruns"][p] for m in medidas)
+                   for p in medidas[0]["reruns"]},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--sem-app", action="store_true",
+                        help="mede só os imports (sem AppTest)")
+    args = parser.parse_args(argv)
+
+    resultado = {"imports": medir_imports(args.repeticoes)}
+    if not args.sem_app:
+        resultado["app"] = medir_app(args.repeticoes)
+
+    for modulo, m in resultado["imports"].items():
+        if m["segundos"] is None:
+            print(f"{modulo:<22}    falhou  {m['erro']}")
+            continue
+        print(f"{modulo:<22} {m['segundos'] * 1000:8.1f} ms  {', '.join(m['pesados'])}")
+    if "erro" in resultado.get("app", {}):
+        print(f"{'app':<22}    falhou  {resultado['app']['erro']}")
+    elif "app" in resultado:
+        print(f"{'partida a frio':<22} {resultado['app']['partida'] * 1000:8.1f} ms")
+        for pagina, t in resultado["app"]["reruns"].items():
+            print(f"{'rerun ' + pagina:<22} {t * 1000:8.1f} ms")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
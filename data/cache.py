@@ -1,10 +1,270 @@
 # data/cache.py
-import streamlit as st
+import copy
+import dataclasses
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# =====================================================
+# 1 — IMPRESSÃO DIGITAL (endereçamento por conteúdo)
+# =====================================================
+
+# Sempre recalculada a partir do conteúdo atual: guardar a impressão por
+# objeto (id/weakref) devolveria resultados velhos se o frame fosse
+# alterado no lugar. Para não pagar o hash a cada consulta, calcule-a uma
+# vez na entrada (ver data.storage.impressao_salva) e passe-a adiante.
+
+def _impressao_pandas(obj) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+    else:
+        h.update(repr(obj.name).encode())
+    h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def impressao(obj) -> str:
+    """
+    Impressão digital do conteúdo de obj: DataFrame/Series (colunas +
+    valores), ndarray (dtype + forma + bytes), tuplas/listas/dicts de
+    qualquer um deles e escalares.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return _impressao_pandas(obj)
+
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype.str}{obj.shape}".encode())
+        if obj.dtype == object:
+            h.update(pd.util.hash_array(obj.ravel()).tobytes())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (tuple, list)):
+        h.update(type(obj).__name__.encode())
+        for parte in obj:
+            h.update(impressao(parte).encode())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=repr):
+            h.update(repr(k).encode())
+            h.update(impressao(obj[k]).encode())
+    else:
+        h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+def chave_conteudo(*partes, **parametros) -> str:
+    """Chave única para (entradas, parâmetros): impressão de tudo junto."""
+    return impressao((partes, parametros))
+
+
+# =====================================================
+# 2 — TAMANHO DAS ENTRADAS
+# =====================================================
+
+def tamanho_bytes(valor) -> int:
+    """Estimativa do espaço ocupado por valor (DataFrames com deep=True)."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return sum(tamanho_bytes(getattr(valor, f.name))
+                   for f in dataclasses.fields(valor))
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+# =====================================================
+# 3 — VALORES GUARDADOS SÃO SOMENTE LEITURA
+# O cache entrega o mesmo conteúdo a todas as sessões: os arrays são
+# travados ao guardar e cada consulta recebe cópias rasas dos frames.
+# Alterar valores no lugar levanta ValueError ("read-only"); trocar ou
+# criar colunas só afeta a cópia de quem chamou.
+# =====================================================
+
+def _travar(arr):
+    if isinstance(arr, np.ndarray):
+        arr.flags.writeable = False
+        return
+    # ExtensionArrays: Categorical/datetime (_ndarray), inteiros com NA (_data/_mask)
+    for nome in ("_ndarray", "_data", "_mask"):
+        interno = getattr(arr, nome, None)
+        if isinstance(interno, np.ndarray):
+            interno.flags.writeable = False
+
+
+def selar(valor):
+    """Trava no lugar os arrays de valor (frames, séries, dataclasses, tuplas)."""
+    if isinstance(valor, pd.DataFrame):
+        for bloco in valor._mgr.blocks:
+            _travar(bloco.values)
+    elif isinstance(valor, pd.Series):
+        _travar(valor._values)
+    elif isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        for f in dataclasses.fields(valor):
+            selar(getattr(valor, f.name))
+    elif isinstance(valor, (tuple, list)):
+        for v in valor:
+            selar(v)
+    return valor
+
+
+def entregar(valor):
+    """Cópia rasa de um valor selado: mesmos arrays, colunas próprias."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=False)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        novo = copy.copy(valor)
+        for f in dataclasses.fields(valor):
+            object.__setattr__(novo, f.name, entregar(getattr(valor, f.name)))
+        return novo
+    if isinstance(valor, tuple):
+        return tuple(entregar(v) for v in valor)
+    if isinstance(valor, list):
+        return [entregar(v) for v in valor]
+    return valor
+
+
+# =====================================================
+# 4 — CACHE LRU COM ORÇAMENTO DE MEMÓRIA
+# =====================================================
+
+ORCAMENTO_PADRAO = 512 * 1024 * 1024   # 512 MB
+
+
+class CacheLRU:
+    """
+    Cache em memória limitado por bytes. Ao passar do orçamento, descarta
+    as entradas usadas há mais tempo. Entradas maiores que o orçamento
+    inteiro não são guardadas. Seguro para uso entre threads (cada sessão
+    do Streamlit roda na sua). Valores guardados são selados e entregues
+    como cópias rasas (ver selar/entregar).
+    """
+
+    def __init__(self, orcamento_bytes: int = ORCAMENTO_PADRAO):
+        self.orcamento_bytes = orcamento_bytes
+        self._entradas: "OrderedDict[object, tuple]" = OrderedDict()  # chave → (valor, bytes)
+        self._bytes = 0
+        self._trava = threading.RLock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, chave):
+        return chave in self._entradas
+
+    @property
+    def bytes_usados(self) -> int:
+        return self._bytes
+
+    def obter(self, chave, padrao=None):
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return padrao
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entregar(entrada[0])
+
+    def guardar(self, chave, valor, tamanho: int = None):
+        if tamanho is None:
+            tamanho = tamanho_bytes(valor)
+        selar(valor)
+        with self._trava:
+            self._remover(chave)
+            if tamanho > self.orcamento_bytes:
+                return
+            self._entradas[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            self._ajustar()
+
+    def obter_ou_calcular(self, chave, func):
+        """Devolve o valor guardado em chave ou calcula func() e guarda."""
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entregar(self._entradas[chave][0])
+            self.falhas += 1
+
+        # Calcula fora da trava: outra sessão não espera por este cálculo
+        valor = func()
+        self.guardar(chave, valor)
+        return entregar(valor)
+
+    def descartar(self, chave):
+        with self._trava:
+            self._remover(chave)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def redimensionar(self, orcamento_bytes: int):
+        with self._trava:
+            self.orcamento_bytes = orcamento_bytes
+            self._ajustar()
+
+    def estatisticas(self) -> dict:
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "orcamento_bytes": self.orcamento_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "descartes": self.descartes,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            }
+
+    def zerar_contadores(self):
+        with self._trava:
+            self.acertos = self.falhas = self.descartes = 0
+
+    def _remover(self, chave):
+        entrada = self._entradas.pop(chave, None)
+        if entrada is not None:
+            self._bytes -= entrada[1]
+
+    def _ajustar(self):
+        while self._bytes > self.orcamento_bytes and self._entradas:
+            _, (_, tamanho) = self._entradas.popitem(last=False)
+            self._bytes -= tamanho
+            self.descartes += 1
+
+
+# Cache compartilhado do processo (etapas do motor, resultados da UI)
+CACHE = CacheLRU()
+
+
+# =====================================================
+# 5 — ESTADO DA SESSÃO (UI)
+# =====================================================
 
-@st.cache_data
 def get_cache(key):
+    import streamlit as st
     return st.session_state.get(key)
 
-@st.cache_data
+
 def set_cache(key, value):
+    import streamlit as st
     st.session_state[key] = value
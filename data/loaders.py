@@ -1,11 +1,636 @@
 # data/loaders.py
+import codecs
+import datetime as dt
+import html
+import io
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
-def load_sales(df):
-    return df
+from engine.normalizador import norm_header, norm_sku_series, br_to_float_avisando
+
+
+# =====================================================
+# 1 — COLUNAS QUE O MOTOR USA
+# Cada loader declara o que precisa; o resto do arquivo nem é lido.
+# =====================================================
+
+@dataclass(frozen=True)
+class Coluna:
+    nome: str                  # nome no DataFrame devolvido
+    aceitos: tuple             # cabeçalhos aceitos (após norm_header), por prioridade
+    tipo: str                  # "texto" | "int" | "float" | "data"
+    obrigatoria: bool = True   # ausente → ValueError; senão coluna de zeros
+
+
+COLUNAS_FULL = (
+    Coluna("SKU", ("sku", "codigo", "sku_anuncio", "codigo_sku"), "texto"),
+    Coluna("Vendas_60d", ("vendas_60d", "vendas_60_dias", "vendas", "qtd_vendida"), "int"),
+    Coluna("Estoque_Full", ("estoque_full", "estoque_disponivel", "estoque"), "int"),
+    Coluna("Em_Transito", ("em_transito", "transito", "a_caminho"), "int", obrigatoria=False),
+)
+
+COLUNAS_FISICO = (
+    Coluna("SKU", ("sku", "codigo", "codigo_sku", "produto"), "texto"),
+    Coluna("Estoque_Fisico", ("estoque_fisico", "estoque", "saldo", "quantidade"), "int"),
+    Coluna("Preco", ("preco", "preco_custo", "custo", "valor_unitario"), "float",
+           obrigatoria=False),
+)
+
+COLUNAS_VENDAS = (
+    Coluna("SKU", ("sku", "codigo", "sku_vendedor", "codigo_sku"), "texto"),
+    Coluna("Quantidade", ("quantidade", "qtd", "qty", "unidades"), "int"),
+)
+
+
+def _mapear(cabecalho, colunas) -> dict:
+    """{cabeçalho original: Coluna} para as colunas pedidas."""
+    por_nome = {}
+    for c in cabecalho:
+        por_nome.setdefault(norm_header(str(c)), c)
+
+    mapa = {}
+    for col in colunas:
+        achado = next((por_nome[a] for a in col.aceitos if a in por_nome), None)
+        if achado is not None:
+            mapa[achado] = col
+        elif col.obrigatoria:
+            raise ValueError(f"Coluna {col.nome} não encontrada "
+                             f"(aceitos: {', '.join(col.aceitos)}).")
+    return mapa
+
+
+# =====================================================
+# 2 — LEITURA DO ARQUIVO (só as colunas pedidas)
+# =====================================================
+
+def _conteudo(arquivo):
+    """(nome, bytes) de caminho, bytes ou arquivo enviado (UploadedFile)."""
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as f:
+            return os.fspath(arquivo), f.read()
+    if isinstance(arquivo, (bytes, bytearray)):
+        return "", bytes(arquivo)
+    nome = getattr(arquivo, "name", "") or ""
+    if hasattr(arquivo, "getvalue"):
+        return nome, arquivo.getvalue()
+    return nome, arquivo.read()
+
+
+def _eh_csv(nome: str, dados: bytes) -> bool:
+    ext = os.path.splitext(nome.lower())[1]
+    if ext in (".csv", ".txt"):
+        return True
+    if ext in (".xlsx", ".xlsm", ".xls"):
+        return False
+    return not dados.startswith(b"PK") and not dados.startswith(b"\xd0\xcf")
+
+
+def _separador(primeira_linha: bytes) -> str:
+    return max([";", ",", "\t"], key=lambda s: primeira_linha.count(s.encode()))
+
+
+def _codificacao(f) -> str:
+    """
+    UTF-8 (com ou sem BOM) quando o arquivo binário f decodifica inteiro;
+    senão cp1252, o padrão dos exports do Excel/ERPs brasileiros. Lido
+    em pedaços: um acento no fim do arquivo também conta.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for pedaco in iter(lambda: f.read(1 << 20), b""):
+            decodificador.decode(pedaco)
+        decodificador.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+
+def _opcoes_csv(primeira_linha: bytes, colunas, encoding: str = "utf-8-sig") -> tuple:
+    """(mapa, kwargs de read_csv, separador decimal) a partir da linha de cabeçalho."""
+    sep = _separador(primeira_linha)
+    # CSV brasileiro (;) usa vírgula decimal; separado por vírgula, ponto
+    decimal = "," if sep == ";" else "."
+
+    cabecalho = pd.read_csv(io.BytesIO(primeira_linha), sep=sep, nrows=0,
+                            encoding=encoding).columns
+    mapa = _mapear(cabecalho, colunas)
+    # Tudo como texto: números passam por br_to_float, que conta (e avisa)
+    # as células inválidas em vez de abortar a leitura
+    dtype = {orig: str for orig in mapa}
+    return mapa, dict(sep=sep, usecols=list(mapa), dtype=dtype, encoding=encoding), decimal
+
+
+def _ler_csv(dados: bytes, colunas) -> tuple:
+    """(frame com as colunas originais pedidas, mapa, separador decimal)."""
+    primeira = dados[:dados.find(b"\n")] if b"\n" in dados else dados
+    mapa, opcoes, decimal = _opcoes_csv(primeira, colunas, _codificacao(io.BytesIO(dados)))
+    return pd.read_csv(io.BytesIO(dados), **opcoes), mapa, decimal
+
+
+# --- xlsx -------------------------------------------------------------
+# O openpyxl cria um objeto por célula de todas as colunas, mesmo com
+# usecols. Aqui o XML da planilha é varrido uma vez com uma regex que só
+# casa as células das colunas pedidas. Só vale para o formato que o
+# Excel/openpyxl gravam (<c r="A1" ...>, r como primeiro atributo);
+# qualquer outra coisa cai no pd.read_excel.
+
+_NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+       "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+       "rel": "http://schemas.openxmlformats.org/package/2006/relationships"}
+
+_RE_LINHA = re.compile(rb"<row\b[^>]*>(.*?)</row>", re.S)
+_RE_TAG_CELULA = re.compile(rb"<(?:\w+:)?c[\s/>]")
+_RE_CELULA_CANONICA = re.compile(rb'<c r="[A-Z]+\d+"')
+_RE_TIPO = re.compile(rb'\bt="([a-zA-Z]+)"')
+_RE_TEXTO = re.compile(rb"<t(?:\s[^>]*)?>([^<]*)</t>")
+_RE_SI = re.compile(rb"<si>(?:<t(?:\s[^>]*)?>([^<]*)</t></si>|(.*?)</si>)", re.S)
+
+
+def _re_celulas(letras=rb"[A-Z]+"):
+    return re.compile(
+        rb'<c r="(' + letras + rb')(\d+)"([^>]*?)(?:/>|>'
+        rb"(?:<f\b[^>]*?(?:/>|>[^<]*</f>))?"
+        rb"(?:<v>([^<]*)</v>|<is>(.*?)</is>)?</c>)", re.S)
+
+
+class _FormatoNaoSuportado(Exception):
+    pass
+
+
+def _primeira_aba(z: zipfile.ZipFile) -> str:
+    wb = ET.fromstring(z.read("xl/workbook.xml"))
+    aba = wb.find("m:sheets/m:sheet", _NS)
+    rid = aba.get(f"{{{_NS['r']}}}id")
+    rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.findall("rel:Relationship", _NS):
+        if rel.get("Id") == rid:
+            alvo = rel.get("Target")
+            return alvo.lstrip("/") if alvo.startswith("/") else posixpath.normpath("xl/" + alvo)
+    raise _FormatoNaoSuportado("aba não encontrada")
+
+
+def _textos_compartilhados(z: zipfile.ZipFile) -> np.ndarray:
+    if "xl/sharedStrings.xml" not in z.namelist():
+        return np.array([], dtype=object)
+    dados = z.read("xl/sharedStrings.xml")
+    # <si><t>texto</t></si> direto ou com vários trechos formatados (<r>)
+    textos = [_texto(simples if rico == b"" else b"".join(_RE_TEXTO.findall(rico)))
+              for simples, rico in _RE_SI.findall(dados)]
+    if not textos and b"si>" in dados:
+        raise _FormatoNaoSuportado("sharedStrings com prefixo de namespace")
+    return np.array(textos, dtype=object)
+
+
+def _tipo_celula(attrs: bytes) -> bytes:
+    m = _RE_TIPO.search(attrs)
+    return m.group(1) if m else b"n"
+
+
+def _texto(b: bytes) -> str:
+    s = b.decode("utf-8")
+    return html.unescape(s) if "&" in s else s
+
+
+def _valores(tipos: np.ndarray, v: np.ndarray, inline, compartilhados) -> np.ndarray:
+    """Valor de cada célula conforme o tipo (texto compartilhado, número, ...)."""
+    out = np.full(len(v), None, dtype=object)
+    vazio = v == b""
+
+    numero = ((tipos == b"n") | (tipos == b"b")) & ~vazio
+    out[numero] = v[numero].astype(float)
+
+    comp = (tipos == b"s") & ~vazio
+    out[comp] = compartilhados[v[comp].astype(np.int64)]
+
+    for i in np.flatnonzero(np.isin(tipos, [b"str", b"d", b"inlineStr"])):
+        if tipos[i] == b"inlineStr":
+            out[i] = _texto(b"".join(_RE_TEXTO.findall(inline[i])))
+        else:
+            out[i] = _texto(v[i])
+    return out
+
+
+def _ler_xlsx(dados: bytes, colunas) -> tuple:
+    try:
+        z = zipfile.ZipFile(io.BytesIO(dados))
+        folha = z.read(_primeira_aba(z))
+    except (zipfile.BadZipFile, KeyError, AttributeError, ET.ParseError) as e:
+        raise _FormatoNaoSuportado(str(e))
+
+    primeira = _RE_LINHA.search(folha)
+    if primeira is None or b"<c " not in folha or b'<c r="' not in primeira.group(1):
+        raise _FormatoNaoSuportado("layout de células inesperado")
+    # Toda célula tem de estar no formato da regex; senão linhas somem
+    if len(_RE_TAG_CELULA.findall(folha)) != len(_RE_CELULA_CANONICA.findall(folha)):
+        raise _FormatoNaoSuportado("células fora do formato <c r=...>")
+
+    compartilhados = _textos_compartilhados(z)
+    tipos = {}
+
+    def colunas_celulas(celulas):
+        letra, linha, attrs, v, inline = (list(c) for c in zip(*celulas))
+        tipo = [tipos.get(a) or tipos.setdefault(a, _tipo_celula(a)) for a in attrs]
+        valores = _valores(np.array(tipo), np.array(v, dtype=object), inline,
+                           compartilhados)
+        return np.array(letra, dtype=object), np.array(linha).astype(np.int64), valores
+
+    # Cabeçalho = primeira linha com células
+    celulas = _re_celulas().findall(primeira.group(1))
+    if not celulas:
+        raise _FormatoNaoSuportado("cabeçalho vazio")
+    letras_cab, linhas_cab, nomes = colunas_celulas(celulas)
+    linha_cab = int(linhas_cab[0])
+    cab = {l: (n if isinstance(n, str) else f"{n:g}")
+           for l, n in zip(letras_cab, nomes) if n is not None}
+
+    mapa = _mapear(list(cab.values()), colunas)
+    letra_de = {nome: letra for letra, nome in cab.items()}
+    letras = [letra_de[orig] for orig in mapa]
+    if not letras:
+        return pd.DataFrame(), mapa
+
+    celulas = _re_celulas(b"|".join(letras)).findall(folha, primeira.end())
+    if not celulas:
+        return pd.DataFrame(columns=list(mapa)), mapa
+    letra_cel, linha_cel, valor_cel = colunas_celulas(celulas)
+    n_linhas = int(linha_cel.max()) - linha_cab
+
+    df = {}
+    for letra in letras:
+        sel = letra_cel == letra
+        col = np.full(n_linhas, None, dtype=object)
+        col[linha_cel[sel] - linha_cab - 1] = valor_cel[sel]
+        df[cab[letra]] = col
+
+    df = pd.DataFrame(df)
+    return df.dropna(how="all").reset_index(drop=True), mapa
+
+
+def _ler_excel_pandas(dados: bytes, colunas) -> tuple:
+    cabecalho = pd.read_excel(io.BytesIO(dados), nrows=0).columns
+    mapa = _mapear(cabecalho, colunas)
+    dtype = {orig: object for orig, col in mapa.items() if col.tipo == "texto"}
+    df = pd.read_excel(io.BytesIO(dados), usecols=lambda c: c in mapa, dtype=dtype)
+    return df.dropna(how="all").reset_index(drop=True), mapa
+
+
+def _tipar(df: pd.DataFrame, mapa: dict, colunas, decimal: str = ",") -> pd.DataFrame:
+    """Renomeia para os nomes do motor e fixa os tipos."""
+    por_col = {col.nome: orig for orig, col in mapa.items()}
+    out = {}
+    for col in colunas:
+        if col.nome not in por_col:
+            if col.tipo == "texto":
+                out[col.nome] = np.full(len(df), "", dtype=object)
+            else:
+                out[col.nome] = np.zeros(len(df), dtype=np.int64 if col.tipo == "int" else float)
+            continue
+
+        s = df[por_col[col.nome]]
+        if col.tipo == "texto":
+            codigos, unicos = pd.factorize(s.to_numpy(dtype=object), use_na_sentinel=True)
+            unicos = np.asarray(unicos, dtype=object)
+            num = np.fromiter((isinstance(v, (float, int, np.number)) for v in unicos),
+                              dtype=bool, count=len(unicos))
+            # Código numérico no Excel (12345.0) vira "12345"
+            unicos[num] = [f"{v:.15g}" for v in unicos[num]]
+            # Último elemento representa os ausentes (código -1 do factorize)
+            out[col.nome] = np.append(unicos, "")[codigos]
+        elif col.tipo == "int":
+            out[col.nome] = (br_to_float_avisando(s, col.nome, decimal).fillna(0).round()
+                                .astype(np.int64).to_numpy())
+        elif col.tipo == "data":
+            out[col.nome] = _para_data(s)
+        else:
+            out[col.nome] = (br_to_float_avisando(s, col.nome, decimal).fillna(0.0)
+                                .astype(float).to_numpy())
+    return pd.DataFrame(out)
+
+
+_ORIGEM_EXCEL = pd.Timestamp("1899-12-30")
+FORMATOS_DATA = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%Y/%m/%d")
+
+
+def _para_data(s: pd.Series) -> np.ndarray:
+    """
+    Dia (datetime64, sem hora) de cada célula: datas já tipadas, número
+    de série do Excel ou texto ("31/12/2024 10:00", "2024-12-31").
+    Convertidos só os valores distintos; inválidos viram NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.normalize().to_numpy()
+
+    valores = s.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(valores, skipna=True) == "string":
+        # Sem a hora sobram poucos valores distintos para converter
+        valores = s.str.slice(0, 10).to_numpy(dtype=object)
+
+    codigos, unicos = pd.factorize(valores, use_na_sentinel=True)
+    unicos = np.asarray(unicos, dtype=object)
+    dias = np.full(len(unicos) + 1, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    num = np.fromiter((isinstance(v, (int, float, np.number)) for v in unicos),
+                      dtype=bool, count=len(unicos))
+    if num.any():
+        dias[:-1][num] = (_ORIGEM_EXCEL + pd.to_timedelta(
+            unicos[num].astype(float), unit="D")).to_numpy()
+
+    txt = ~num & np.fromiter((isinstance(v, (str, pd.Timestamp, dt.date)) for v in unicos),
+                             dtype=bool, count=len(unicos))
+    if txt.any():
+        # Só a parte da data ("31/12/2024 10:00" → "31/12/2024"); poucos dias distintos
+        so_data = (pd.Series(unicos[txt]).astype(str).str.strip()
+                   .str.split(r"[ T]", n=1, regex=True).str[0])
+        cod_dia, dias_txt = pd.factorize(so_data)
+        convertidos = pd.Series(pd.NaT, index=range(len(dias_txt)), dtype="datetime64[ns]")
+        for formato in FORMATOS_DATA:
+            falta = convertidos.isna().to_numpy()
+            if not falta.any():
+                break
+            convertidos[falta] = pd.to_datetime(dias_txt[falta], format=formato,
+                                                errors="coerce")
+        dias[:-1][txt] = convertidos.to_numpy()[cod_dia]
+
+    return dias[codigos].astype("datetime64[D]").astype("datetime64[ns]")
+
+
+def carregar_tabela(arquivo, colunas) -> pd.DataFrame:
+    """
+    Lê de arquivo (caminho, bytes, UploadedFile ou DataFrame) só as
+    colunas declaradas e devolve-as com os nomes e tipos do motor.
+    """
+    if isinstance(arquivo, pd.DataFrame):
+        mapa = _mapear(arquivo.columns, colunas)
+        return _tipar(arquivo[list(mapa)], mapa, colunas)
+
+    nome, dados = _conteudo(arquivo)
+    decimal = ","
+    if _eh_csv(nome, dados):
+        df, mapa, decimal = _ler_csv(dados, colunas)
+    else:
+        try:
+            df, mapa = _ler_xlsx(dados, colunas)
+        except _FormatoNaoSuportado:
+            df, mapa = _ler_excel_pandas(dados, colunas)
+    return _tipar(df, mapa, colunas, decimal)
+
+
+def carregar_full(arquivo) -> pd.DataFrame:
+    """FULL → SKU, Vendas_60d, Estoque_Full, Em_Transito."""
+    return carregar_tabela(arquivo, COLUNAS_FULL)
+
+
+def carregar_fisico(arquivo) -> pd.DataFrame:
+    """Estoque físico → SKU, Estoque_Fisico, Preco."""
+    return carregar_tabela(arquivo, COLUNAS_FISICO)
+
+
+def carregar_vendas(arquivo) -> pd.DataFrame:
+    """Vendas Shopee → SKU, Quantidade."""
+    return carregar_tabela(arquivo, COLUNAS_VENDAS)
+
+
+# =====================================================
+# 3 — PEDIDOS (exportações linha a linha)
+# Lidas em blocos; só as somas por (empresa, SKU, dia) da janela ficam
+# em memória.
+# =====================================================
+
+COLUNAS_PEDIDOS = (
+    Coluna("SKU", ("sku", "sku_vendedor", "codigo_sku", "sku_da_variacao",
+                   "numero_de_referencia_sku", "no_de_referencia_do_sku_principal",
+                   "codigo"), "texto"),
+    Coluna("Quantidade", ("quantidade", "qtd", "qty", "unidades"), "int"),
+    Coluna("Data", ("data", "data_do_pedido", "data_de_criacao_do_pedido",
+                    "data_da_venda", "data_pedido", "criado_em"), "data"),
+    Coluna("Empresa", ("empresa", "loja", "conta", "nome_da_loja"), "texto",
+           obrigatoria=False),
+    Coluna("Status", ("status", "status_do_pedido", "estado"), "texto",
+           obrigatoria=False),
+)
+
+LINHAS_POR_BLOCO = 250_000
+JANELA_DIAS = 60
+
+# Pedidos com status contendo estes trechos (sem acento, minúsculas) não contam
+STATUS_EXCLUIDOS = ("cancel", "devolv", "reembols")
+
+
+def _blocos_pedidos(arquivo, linhas_por_bloco: int):
+    """Blocos já tipados (SKU, Quantidade, Data, Empresa, Status)."""
+    if isinstance(arquivo, pd.DataFrame):
+        mapa = _mapear(arquivo.columns, COLUNAS_PEDIDOS)
+        for i in range(0, len(arquivo), linhas_por_bloco):
+            yield _tipar(arquivo.iloc[i:i + linhas_por_bloco][list(mapa)], mapa,
+                         COLUNAS_PEDIDOS)
+        return
+
+    # Caminho: lido do disco em blocos, sem carregar o arquivo inteiro
+    if isinstance(arquivo, (str, os.PathLike)):
+        nome = os.fspath(arquivo)
+        with open(arquivo, "rb") as f:
+            inicio = f.read(8192)
+        fonte = lambda: open(arquivo, "rb")
+    else:
+        nome, dados = _conteudo(arquivo)
+        inicio = dados[:8192]
+        fonte = lambda: io.BytesIO(dados)
+
+    if not _eh_csv(nome, inicio):
+        # xlsx não tem leitura em blocos: lê só as colunas e agrega em blocos
+        df = carregar_tabela(arquivo, COLUNAS_PEDIDOS)
+        for i in range(0, len(df), linhas_por_bloco):
+            yield df.iloc[i:i + linhas_por_bloco]
+        return
+
+    primeira = inicio.split(b"\n", 1)[0]
+    with fonte() as f:
+        codificacao = _codificacao(f)
+    mapa, opcoes, decimal = _opcoes_csv(primeira, COLUNAS_PEDIDOS, codificacao)
+    with fonte() as f:
+        for bloco in pd.read_csv(f, chunksize=linhas_por_bloco, **opcoes):
+            yield _tipar(bloco, mapa, COLUNAS_PEDIDOS, decimal)
+
+
+class AcumuladorDiario:
+    """
+    Somas por (empresa, SKU) × dia dos últimos `dias` dias, numa matriz
+    densa em anel: a coluna de um dia é reaproveitada quando ele sai da
+    janela. A memória depende só de chaves × dias, não do arquivo.
+    Sem data_ref a janela termina no dia mais recente já visto.
+    """
+
+    def __init__(self, dias: int = JANELA_DIAS, data_ref=None):
+        self.dias = dias
+        self.fim = None if data_ref is None else _dia(pd.Timestamp(data_ref))
+        self._fixo = self.fim is not None
+        self.chaves = pd.Index([], dtype=object)        # "empresa\x1fSKU"
+        self.somas = np.zeros((0, dias), dtype=np.int64)
+        self.dia_da_coluna = np.full(dias, np.iinfo(np.int64).min)
+
+    def adicionar(self, empresa, sku, data, qtd):
+        dia = _dia(data)
+        if len(dia) == 0:
+            return
+        if not self._fixo:
+            maior = int(dia.max())
+            self.fim = maior if self.fim is None else max(self.fim, maior)
+        ini = self.fim - self.dias + 1
+        ok = (dia >= ini) & (dia <= self.fim)
+        self._girar(ini)
+
+        chave = pd.Index(np.asarray(empresa, dtype=object)[ok] + "\x1f"
+                         + np.asarray(sku, dtype=object)[ok])
+        pos = self._posicoes(chave)
+        col = dia[ok] % self.dias
+        np.add.at(self.somas.reshape(-1), pos * self.dias + col,
+                  np.asarray(qtd, dtype=np.int64)[ok])
+
+    def _girar(self, ini: int):
+        # Cada coluna passa a ser do único dia em [ini, fim] com o mesmo resto
+        col = np.arange(self.dias)
+        esperado = ini + (col - ini) % self.dias
+        velho = self.dia_da_coluna != esperado
+        self.somas[:, velho] = 0
+        self.dia_da_coluna = esperado
+
+    def _posicoes(self, chave: pd.Index) -> np.ndarray:
+        pos = self.chaves.get_indexer(chave)
+        novas = chave[pos < 0].unique()
+        if len(novas):
+            self.chaves = self.chaves.append(novas)
+            self.somas = np.vstack([self.somas,
+                                    np.zeros((len(novas), self.dias), dtype=np.int64)])
+            pos = self.chaves.get_indexer(chave)
+        return pos
+
+    def diario(self) -> pd.DataFrame:
+        """Empresa, SKU, Data, Quantidade (só células com venda)."""
+        linha, col = np.nonzero(self.somas)
+        empresa, sku = self._separar(self.chaves[linha])
+        return pd.DataFrame({
+            "Empresa": empresa,
+            "SKU": sku,
+            "Data": (self.dia_da_coluna[col].astype("datetime64[D]")
+                     .astype("datetime64[ns]")),
+            "Quantidade": self.somas[linha, col],
+        })
+
+    @staticmethod
+    def _separar(chaves: pd.Index):
+        if len(chaves) == 0:
+            return np.array([], dtype=object), np.array([], dtype=object)
+        partes = chaves.str.split("\x1f", n=1, expand=True)
+        return (partes.get_level_values(0).to_numpy(dtype=object),
+                partes.get_level_values(1).to_numpy(dtype=object))
+
+    def total(self, por_empresa: bool = False):
+        """Soma da janela no formato de vendas_df (SKU, Quantidade)."""
+        empresa, sku = self._separar(self.chaves)
+        df = pd.DataFrame({"Empresa": empresa, "SKU": sku,
+                           "Quantidade": self.somas.sum(axis=1)})
+        df = df[df["Quantidade"] != 0]
+
+        def somar(d):
+            return (d.groupby("SKU", as_index=False, sort=True)["Quantidade"].sum()
+                     .astype({"SKU": object, "Quantidade": np.int64}))
+
+        if not por_empresa:
+            return somar(df)
+        return {empresa: somar(d) for empresa, d in df.groupby("Empresa", sort=True)}
+
+
+def _dia(datas) -> np.ndarray:
+    """Dias desde 1970 (int64); NaT fica muito negativo e cai fora da janela."""
+    return np.asarray(datas, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def acumular_pedidos(arquivo, dias: int = JANELA_DIAS, data_ref=None,
+                     status_excluidos=STATUS_EXCLUIDOS,
+                     linhas_por_bloco: int = LINHAS_POR_BLOCO) -> AcumuladorDiario:
+    """
+    Lê o arquivo de pedidos em blocos e acumula as quantidades por
+    (empresa, SKU normalizado, dia) dos últimos `dias` dias.
+    Linhas sem SKU ou data, ou com status excluído, são descartadas.
+    """
+    acc = AcumuladorDiario(dias, data_ref)
+    for bloco in _blocos_pedidos(arquivo, linhas_por_bloco):
+        ok = pd.notna(bloco["Data"]).to_numpy() & (bloco["SKU"].to_numpy() != "")
+        if status_excluidos:
+            cod, unicos = pd.factorize(bloco["Status"])
+            excluido = np.array([any(x in norm_header(u) for x in status_excluidos)
+                                 for u in unicos] + [False], dtype=bool)
+            ok &= ~excluido[cod]
+
+        b = bloco[ok]
+        acc.adicionar(b["Empresa"].to_numpy(), norm_sku_series(b["SKU"]).to_numpy(),
+                      b["Data"].to_numpy(), b["Quantidade"].to_numpy())
+    return acc
+
+
+def agregar_pedidos_diario(arquivo, dias: int = JANELA_DIAS, data_ref=None,
+                           status_excluidos=STATUS_EXCLUIDOS,
+                           linhas_por_bloco: int = LINHAS_POR_BLOCO) -> pd.DataFrame:
+    """Empresa, SKU, Data, Quantidade por dia dos últimos `dias` dias."""
+    return acumular_pedidos(arquivo, dias, data_ref, status_excluidos,
+                            linhas_por_bloco).diario()
+
+
+def agregar_pedidos(arquivo, dias: int = JANELA_DIAS, data_ref=None,
+                    por_empresa: bool = False,
+                    status_excluidos=STATUS_EXCLUIDOS,
+                    linhas_por_bloco: int = LINHAS_POR_BLOCO):
+    """
+    Vendas dos últimos `dias` até data_ref (inclusive) no formato de
+    vendas_df do calcular_reposicao: SKU, Quantidade.
+    Sem data_ref, usa o dia mais recente do arquivo.
+    Com por_empresa=True retorna {empresa: DataFrame}.
+    """
+    return acumular_pedidos(arquivo, dias, data_ref, status_excluidos,
+                            linhas_por_bloco).total(por_empresa)
+
+
+# =====================================================
+# 4 — OS QUATRO UPLOADS
+# =====================================================
+
+def _carregar(tipo: str, arquivo):
+    if tipo == "kits":
+        from engine.kits import carregar_padrao_excel
+        return carregar_padrao_excel(arquivo)
+    return {"full": carregar_full, "fisico": carregar_fisico,
+            "vendas": carregar_vendas}[tipo](arquivo)
+
+
+def carregar_arquivos(full, fisico, vendas, kits, max_workers=None,
+                      processos: bool = False):
+    """
+    Carrega FULL, físico, vendas e a planilha padrão.
+    Retorna (df_full, df_fisico, df_vendas, catalogo).
+    Por padrão um arquivo depois do outro: o leitor de xlsx é Python e
+    segura o GIL, então threads não encurtam o total. processos=True lê
+    os quatro em processos (tempo total ≈ o do maior); só para o runner
+    sem interface, dentro do Streamlit o fork duplicaria o servidor.
+    """
+    tarefas = {
+        "full": full, "fisico": fisico, "vendas": vendas, "kits": kits,
+    }
+    tarefas = {t: (a if isinstance(a, pd.DataFrame) else _conteudo(a)[1])
+               for t, a in tarefas.items()}
 
-def load_stock(df):
-    return df
+    if not processos:
+        res = {t: _carregar(t, a) for t, a in tarefas.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or len(tarefas)) as ex:
+            futuros = {t: ex.submit(_carregar, t, a) for t, a in tarefas.items()}
+            res = {t: f.result() for t, f in futuros.items()}
 
-def load_kits(df):
-    return df
+    return res["full"], res["fisico"], res["vendas"], res["kits"]
@@ -1,8 +1,249 @@
 # data/storage.py
-import streamlit as st
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
 
-def save_dataframe(name, df):
-    st.session_state[name] = df
+import numpy as np
+import pandas as pd
 
-def load_dataframe(name):
-    return st.session_state.get(name)
+from data.cache import CACHE, entregar, impressao, selar, tamanho_bytes
+from engine.normalizador import norm_header
+
+
+# =====================================================
+# 1 — COMPACTAÇÃO
+# Inteiros no menor tipo a partir de int32 (estoques e quantidades são
+# somados depois; int8/int16 estourariam em silêncio), floats em float32
+# quando não perde nada, textos repetitivos como category.
+# =====================================================
+
+# Colunas candidatas a category pelo nome (após norm_header), mesmo sem
+# dtype object (p.ex. string)
+COLUNAS_CATEGORICAS = ("sku", "fornecedor", "empresa", "kit_sku", "component_sku")
+
+# Texto vira category só se distintos/linhas ≤ este valor: com valores
+# quase todos únicos, códigos + categorias ocupam mais que o original
+RAZAO_CATEGORICA = 0.5
+
+# Menor inteiro usado na compactação
+INTEIRO_MINIMO = np.int32
+
+
+def _categorica(nome) -> bool:
+    h = norm_header(str(nome))
+    return any(h == c or h.startswith(c + "_") or h.endswith("_" + c)
+               for c in COLUNAS_CATEGORICAS)
+
+
+def compactar_coluna(s: pd.Series, categorica: bool = False) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+
+    if pd.api.types.is_integer_dtype(s):
+        out = pd.to_numeric(s, downcast="integer")
+        if out.dtype.itemsize < np.dtype(INTEIRO_MINIMO).itemsize:
+            out = out.astype(INTEIRO_MINIMO)
+        return out
+
+    if pd.api.types.is_float_dtype(s):
+        valores = s.to_numpy()
+        f32 = valores.astype(np.float32)
+        if np.array_equal(f32.astype(valores.dtype), valores, equal_nan=True):
+            return pd.Series(f32, index=s.index, name=s.name)
+        return s
+
+    if (s.dtype == object or categorica) and len(s):
+        distintos = s.nunique(dropna=False)
+        if distintos / len(s) <= RAZAO_CATEGORICA:
+            return s.astype("category")
+    return s
+
+
+def compactar(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia de df com tipos compactos (mesmos valores)."""
+    return pd.DataFrame(
+        {c: compactar_coluna(df[c], _categorica(c)) for c in df.columns},
+        index=df.index,
+    )
+
+
+# =====================================================
+# 2 — ARQUIVOS EM DISCO (frames grandes)
+# =====================================================
+
+STORAGE_DIR = os.path.join("cache", "sessoes")
+LIMIAR_DISCO = 32 * 1024 * 1024      # acima disso o frame vai para disco
+IDADE_MAX_SESSAO = 24 * 3600         # pastas de sessões abandonadas
+
+
+@dataclass(frozen=True)
+class DataFrameEmDisco:
+    """O que fica na sessão quando o frame foi para disco."""
+    caminho: str
+    linhas: int
+    colunas: int
+    bytes_memoria: int    # tamanho do frame compactado quando carregado
+
+    def carregar(self) -> pd.DataFrame:
+        # Leitura mapeada em memória; o frame lido entra no cache LRU do
+        # processo (sai de lá sob pressão de memória e é relido do disco)
+        return CACHE.obter_ou_calcular(
+            ("storage", self.caminho),
+            lambda: pd.read_parquet(self.caminho, memory_map=True),
+        )
+
+
+def _gravar_parquet(df: pd.DataFrame, caminho: str):
+    tmp = f"{caminho}.tmp-{uuid.uuid4().hex}"
+    df.to_parquet(tmp)
+    os.replace(tmp, caminho)
+
+
+def _tocar(pasta: str):
+    """Marca a pasta da sessão como em uso (mtime = agora)."""
+    try:
+        os.utime(pasta)
+    except OSError:
+        pass
+
+
+def descartar_sessoes_antigas(storage_dir: str = STORAGE_DIR,
+                              idade_max: float = IDADE_MAX_SESSAO,
+                              manter: str = None):
+    """
+    Remove pastas de sessões sem uso há mais de idade_max segundos.
+    Gravar ou ler um frame da sessão renova o mtime da pasta; a pasta
+    `manter` (a da sessão atual) nunca é removida.
+    """
+    if not os.path.exists(storage_dir):
+        return
+    limite = time.time() - idade_max
+    for e in os.scandir(storage_dir):
+        if e.name != manter and e.is_dir() and e.stat().st_mtime < limite:
+            shutil.rmtree(e.path, ignore_errors=True)
+
+
+# =====================================================
+# 3 — API DA SESSÃO
+# =====================================================
+
+_REGISTRO = "_storage"           # nome → metadados do que foi salvo
+_SESSAO = "_storage_sessao"      # id da pasta desta sessão
+
+
+def _estado(estado):
+    if estado is not None:
+        return estado
+    import streamlit as st
+    return st.session_state
+
+
+def _pasta_sessao(estado, storage_dir: str) -> str:
+    if _SESSAO not in estado:
+        estado[_SESSAO] = uuid.uuid4().hex
+    pasta = os.path.join(storage_dir, estado[_SESSAO])
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def save_dataframe(name, df, estado=None, limiar: int = LIMIAR_DISCO,
+                   storage_dir: str = STORAGE_DIR):
+    """
+    Guarda df compactado na sessão. Se passar de limiar bytes, grava em
+    parquet e deixa na sessão só um DataFrameEmDisco. A impressão digital
+    do conteúdo é calculada aqui, uma vez (ver impressao_salva), e o frame
+    guardado fica somente leitura para que ela continue valendo.
+    """
+    estado = _estado(estado)
+    remove_dataframe(name, estado)
+
+    bytes_original = tamanho_bytes(df)
+    compacto = compactar(df)
+    bytes_compacto = tamanho_bytes(compacto)
+    imp = impressao(compacto)
+
+    caminho = None
+    if bytes_compacto > limiar:
+        pasta = _pasta_sessao(estado, storage_dir)
+        descartar_sessoes_antigas(storage_dir, manter=estado[_SESSAO])
+        caminho = os.path.join(pasta, f"{uuid.uuid4().hex}.parquet")
+        _gravar_parquet(compacto, caminho)
+        _tocar(pasta)
+        estado[name] = DataFrameEmDisco(caminho, len(compacto),
+                                        compacto.shape[1], bytes_compacto)
+    else:
+        estado[name] = selar(compacto)
+
+    estado.setdefault(_REGISTRO, {})[name] = {
+        "linhas": len(compacto),
+        "bytes_original": bytes_original,
+        "bytes_compacto": bytes_compacto,
+        "arquivo": caminho,
+        "impressao": imp,
+    }
+
+
+def load_dataframe(name, estado=None):
+    """
+    Frame salvo em name (None se não houver). Os valores são somente
+    leitura; colunas novas ou trocadas ficam só na cópia devolvida.
+    """
+    valor = _estado(estado).get(name)
+    if isinstance(valor, DataFrameEmDisco):
+        _tocar(os.path.dirname(valor.caminho))
+        return valor.carregar()
+    return entregar(valor)
+
+
+def impressao_salva(name, estado=None):
+    """
+    Impressão digital do frame salvo em name, calculada em save_dataframe
+    (None se não houver). Serve de chave para o motor sem refazer o hash:
+    calculo.calcular_reposicao(..., impressoes={"full": ...}).
+    """
+    r = _estado(estado).get(_REGISTRO, {}).get(name)
+    return r["impressao"] if r else None
+
+
+def remove_dataframe(name, estado=None):
+    estado = _estado(estado)
+    valor = estado.pop(name, None)
+    estado.get(_REGISTRO, {}).pop(name, None)
+    if isinstance(valor, DataFrameEmDisco):
+        CACHE.descartar(("storage", valor.caminho))
+        try:
+            os.remove(valor.caminho)
+        except OSError:
+            pass
+
+
+def limpar_sessao(estado=None, storage_dir: str = STORAGE_DIR):
+    """Remove tudo o que esta sessão salvou (inclusive os arquivos)."""
+    estado = _estado(estado)
+    for name in list(estado.get(_REGISTRO, {})):
+        remove_dataframe(name, estado)
+    if _SESSAO in estado:
+        shutil.rmtree(os.path.join(storage_dir, estado[_SESSAO]), ignore_errors=True)
+
+
+def relatorio_memoria(estado=None) -> pd.DataFrame:
+    """Uso de memória dos frames salvos nesta sessão."""
+    registro = _estado(estado).get(_REGISTRO, {})
+    linhas = [
+        {
+            "nome": name,
+            "linhas": r["linhas"],
+            "bytes_original": r["bytes_original"],
+            "bytes_compacto": r["bytes_compacto"],
+            "bytes_em_memoria": 0 if r["arquivo"] else r["bytes_compacto"],
+            "local": "disco" if r["arquivo"] else "memória",
+            "arquivo": r["arquivo"],
+        }
+        for name, r in registro.items()
+    ]
+    return pd.DataFrame(linhas, columns=[
+        "nome", "linhas", "bytes_original", "bytes_compacto",
+        "bytes_em_memoria", "local", "arquivo",
+    ])
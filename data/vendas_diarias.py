@@ -0,0 +1,229 @@
+# data/vendas_diarias.py
+import datetime as dt
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from data.cache import CACHE
+from engine.normalizador import norm_sku_series
+
+
+# =====================================================
+# 1 — HISTÓRICO DIÁRIO DE VENDAS (SKU × dia × canal)
+# Um Parquet por canal e dia: um upload diário só grava os dias que
+# trouxe, e a leitura só abre os dias da maior janela pedida.
+# =====================================================
+
+VENDAS_DIR = os.path.join("db", "vendas")
+
+# Canais que o motor de reposição lê (anúncios FULL e pedidos Shopee)
+CANAL_FULL = "ML"
+CANAL_SHOPEE = "Shopee"
+
+JANELAS = (7, 30, 60, 90)
+JANELA_TENDENCIA = 30
+
+
+def _data(valor) -> dt.date:
+    return pd.Timestamp(valor).date()
+
+
+class VendasDiarias:
+    """
+    Vendas por SKU normalizado, dia e canal, em raiz/<canal>/<AAAA-MM-DD>.parquet.
+    Os dias já lidos ficam no cache LRU do processo (chave = caminho +
+    mtime), então depois de um upload diário só o arquivo novo é lido.
+    """
+
+    def __init__(self, raiz: str = VENDAS_DIR):
+        self.raiz = raiz
+
+    # -----------------------------
+    # Gravação
+    # -----------------------------
+    def _pasta(self, canal: str) -> str:
+        canal = str(canal)
+        if not canal or canal in (".", "..") or any(s in canal for s in ("/", "\\")):
+            raise ValueError(f"Canal inválido: {canal!r}")
+        return os.path.join(self.raiz, canal)
+
+    def _caminho(self, canal: str, dia: dt.date) -> str:
+        return os.path.join(self._pasta(canal), f"{dia.isoformat()}.parquet")
+
+    def registrar(self, diario: pd.DataFrame, canal: str,
+                  substituir: bool = True) -> list:
+        """
+        Grava vendas diárias (colunas SKU, Data, Quantidade; outras são
+        ignoradas e linhas repetidas somadas). Datas em texto são lidas
+        como nos uploads (DD/MM/AAAA ou ISO); inválidas são descartadas. Cada dia presente em
+        `diario` substitui o que havia gravado para o canal, ou é somado
+        a ele com substituir=False. Retorna os dias gravados.
+        """
+        faltando = [c for c in ("SKU", "Data", "Quantidade") if c not in diario.columns]
+        if faltando:
+            raise ValueError(f"Colunas ausentes nas vendas diárias: {faltando}")
+
+        # Mesma leitura de datas dos uploads: dia primeiro ("01/02/2025" é
+        # 1º de fevereiro), ISO, número de série do Excel ou datas tipadas
+        from data.loaders import _para_data
+        df = pd.DataFrame({
+            "SKU": norm_sku_series(diario["SKU"]).to_numpy(),
+            "Data": _para_data(diario["Data"]),
+            "Quantidade": pd.to_numeric(diario["Quantidade"], errors="coerce")
+                            .fillna(0).astype(np.int64).to_numpy(),
+        })
+        df = df[(df["SKU"] != "") & df["Data"].notna()]
+
+        pasta = self._pasta(canal)
+        os.makedirs(pasta, exist_ok=True)
+        gravados = []
+        for data, d in df.groupby("Data", sort=True):
+            dia = _data(data)
+            caminho = self._caminho(canal, dia)
+            d = d[["SKU", "Quantidade"]]
+            if not substituir and os.path.exists(caminho):
+                d = pd.concat([self._ler_dia(caminho), d], ignore_index=True)
+            d = d.groupby("SKU", as_index=False, sort=True, observed=True)["Quantidade"].sum()
+            d = d[d["Quantidade"] != 0].astype({"SKU": "category"})
+
+            tmp = f"{caminho}.tmp-{uuid.uuid4().hex}"
+            d.to_parquet(tmp, index=False)
+            os.replace(tmp, caminho)
+            gravados.append(dia)
+        return gravados
+
+    def importar_pedidos(self, arquivo, canal: str, dias: int = None,
+                         substituir: bool = True) -> list:
+        """
+        Lê um export de pedidos (ver data.loaders.agregar_pedidos_diario)
+        e grava os seus dias. Por padrão guarda até os JANELAS[-1] dias
+        mais recentes do arquivo.
+        """
+        from data.loaders import agregar_pedidos_diario
+        diario = agregar_pedidos_diario(arquivo, dias or max(JANELAS))
+        return self.registrar(diario, canal, substituir)
+
+    def remover(self, canal: str, dias) -> int:
+        """Apaga os dias informados do canal; retorna quantos existiam."""
+        n = 0
+        for d in dias:
+            caminho = self._caminho(canal, _data(d))
+            if os.path.exists(caminho):
+                os.remove(caminho)
+                n += 1
+        return n
+
+    # -----------------------------
+    # Leitura
+    # -----------------------------
+    def canais(self) -> list:
+        if not os.path.isdir(self.raiz):
+            return []
+        return sorted(e.name for e in os.scandir(self.raiz) if e.is_dir())
+
+    def dias(self, canal: str) -> list:
+        """Dias gravados do canal, em ordem."""
+        pasta = self._pasta(canal)
+        if not os.path.isdir(pasta):
+            return []
+        return sorted(dt.date.fromisoformat(e.name[:-len(".parquet")])
+                      for e in os.scandir(pasta) if e.name.endswith(".parquet"))
+
+    def ultimo_dia(self, canal: str):
+        d = self.dias(canal)
+        return d[-1] if d else None
+
+    @staticmethod
+    def _ler_dia(caminho: str) -> pd.DataFrame:
+        st = os.stat(caminho)
+        return CACHE.obter_ou_calcular(
+            ("vendas_dia", caminho, st.st_mtime_ns, st.st_size),
+            lambda: pd.read_parquet(caminho),
+        )
+
+    def matriz(self, canal: str, fim=None, n_dias: int = 90):
+        """
+        Matriz densa SKU × dia (int64) dos n_dias terminando em `fim`
+        (padrão: último dia gravado), mais o índice de SKUs e o primeiro
+        dia. Dias sem arquivo ficam zerados.
+        """
+        fim = _data(fim) if fim is not None else self.ultimo_dia(canal)
+        if fim is None:
+            return pd.Index([], dtype=object), np.zeros((0, n_dias), dtype=np.int64), None
+        inicio = fim - dt.timedelta(days=n_dias - 1)
+
+        partes, colunas = [], []
+        for j in range(n_dias):
+            caminho = self._caminho(canal, inicio + dt.timedelta(days=j))
+            if os.path.exists(caminho):
+                d = self._ler_dia(caminho)
+                partes.append(d)
+                colunas.append(np.full(len(d), j, dtype=np.int64))
+
+        if not partes:
+            return pd.Index([], dtype=object), np.zeros((0, n_dias), dtype=np.int64), inicio
+
+        sku = np.concatenate([d["SKU"].to_numpy(dtype=object) for d in partes])
+        cod, skus = pd.factorize(sku)
+        m = np.zeros((len(skus), n_dias), dtype=np.int64)
+        np.add.at(m, (cod, np.concatenate(colunas)),
+                  np.concatenate([d["Quantidade"].to_numpy(dtype=np.int64) for d in partes]))
+        return pd.Index(skus, dtype=object), m, inicio
+
+    # -----------------------------
+    # Janelas móveis (somas acumuladas)
+    # -----------------------------
+    def demanda(self, canal: str, data_ref=None, janelas=JANELAS,
+                janela_tendencia: int = JANELA_TENDENCIA) -> pd.DataFrame:
+        """
+        Por SKU: Vendas_<n>d de cada janela terminando em data_ref
+        (padrão: último dia do canal) e Tendencia_% — inclinação da reta
+        de mínimos quadrados das vendas diárias dos últimos
+        janela_tendencia dias, em % da média por 30 dias (mesma escala do
+        parâmetro crescimento). Tudo sai de duas somas acumuladas sobre a
+        matriz SKU × dia.
+        """
+        n_dias = max(max(janelas), janela_tendencia)
+        skus, m, _ = self.matriz(canal, data_ref, n_dias)
+
+        # c[:, k] = soma dos k primeiros dias; soma de (a, b] = c[:, b] - c[:, a]
+        c = np.zeros((len(skus), n_dias + 1), dtype=np.int64)
+        np.cumsum(m, axis=1, out=c[:, 1:])
+        t = np.arange(n_dias, dtype=np.int64)
+        ct = np.zeros_like(c)
+        np.cumsum(m * t, axis=1, out=ct[:, 1:])
+
+        out = pd.DataFrame({"SKU": skus.to_numpy(dtype=object)})
+        for n in janelas:
+            out[f"Vendas_{n}d"] = c[:, n_dias] - c[:, n_dias - n]
+
+        n = janela_tendencia
+        sy = (c[:, n_dias] - c[:, n_dias - n]).astype(float)
+        sty = (ct[:, n_dias] - ct[:, n_dias - n]) - (n_dias - n) * sy   # t local 0..n-1
+        st = n * (n - 1) / 2
+        stt = (n - 1) * n * (2 * n - 1) / 6
+        inclinacao = (n * sty - st * sy) / (n * stt - st ** 2) if n > 1 else np.zeros(len(sy))
+        media = sy / n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tendencia = np.where(media > 0, inclinacao * 30 / media * 100, 0.0)
+        out["Tendencia_%"] = np.round(tendencia, 1)
+        return out
+
+    def total(self, canal: str, dias: int, data_ref=None) -> pd.DataFrame:
+        """Soma dos últimos `dias` dias no formato de vendas_df (SKU, Quantidade)."""
+        skus, m, _ = self.matriz(canal, data_ref, dias)
+        out = pd.DataFrame({"SKU": skus.to_numpy(dtype=object),
+                            "Quantidade": m.sum(axis=1)})
+        return out[out["Quantidade"] != 0].sort_values("SKU", ignore_index=True)
+
+    def movel(self, canal: str, janela: int, fim=None, n_dias: int = 90) -> pd.DataFrame:
+        """Soma móvel de `janela` dias para cada um dos n_dias (SKU × data)."""
+        skus, m, inicio = self.matriz(canal, fim, n_dias + janela - 1)
+        if inicio is None:
+            return pd.DataFrame(index=skus, dtype=np.int64)
+        c = np.zeros((len(skus), m.shape[1] + 1), dtype=np.int64)
+        np.cumsum(m, axis=1, out=c[:, 1:])
+        datas = pd.date_range(inicio + dt.timedelta(days=janela - 1), periods=n_dias)
+        return pd.DataFrame(c[:, janela:] - c[:, :-janela], index=skus, columns=datas)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from .normalizador import norm_sku_series, br_to_float_series
+
+
+# =====================================================
+# ALOCAÇÃO DE ESTOQUE RECEBIDO ENTRE EMPRESAS
+# Proporcional às vendas 60d de cada empresa, com arredondamento pelo
+# maior resto (a soma por SKU bate exatamente com o recebido).
+# =====================================================
+
+PREFIXO_VENDAS = "Vendas_"
+
+# SKUs sem vendas em nenhuma empresa:
+#   "igual" → divide igualmente
+#   "geral" → proporcional às vendas totais de cada empresa no período
+#   dict/lista de pesos por empresa
+REGRA_SEM_VENDAS = "igual"
+
+
+def empresas_das_vendas(vendas: pd.DataFrame) -> list:
+    """Empresas presentes como colunas Vendas_<Empresa>."""
+    return [c[len(PREFIXO_VENDAS):] for c in vendas.columns
+            if c.startswith(PREFIXO_VENDAS) and len(c) > len(PREFIXO_VENDAS)]
+
+
+def indexar_vendas(vendas: pd.DataFrame, empresas=None) -> pd.DataFrame:
+    """
+    Vendas por SKU (normalizado, índice único) com uma coluna por
+    empresa. É a tabela de consulta usada pela alocação; guardá-la
+    evita reprocessar o arquivo de vendas a cada consulta.
+    """
+    if empresas is None:
+        empresas = empresas_das_vendas(vendas)
+    if not empresas:
+        raise ValueError("Nenhuma coluna Vendas_<Empresa> encontrada.")
+
+    faltando = [e for e in empresas if PREFIXO_VENDAS + e not in vendas.columns]
+    if faltando:
+        raise ValueError(f"Colunas de vendas ausentes: {faltando}")
+
+    tabela = pd.DataFrame(
+        {e: br_to_float_series(vendas[PREFIXO_VENDAS + e]).fillna(0).clip(lower=0).to_numpy()
+         for e in empresas},
+        index=norm_sku_series(vendas["SKU"]).to_numpy(),
+    )
+    tabela = tabela.groupby(level=0, sort=False).sum()
+    tabela.index.name = "SKU"
+    return tabela
+
+
+def _pesos_sem_vendas(regra, tabela: pd.DataFrame) -> np.ndarray:
+    k = tabela.shape[1]
+    if isinstance(regra, str):
+        if regra == "igual":
+            return np.ones(k)
+        if regra == "geral":
+            pesos = tabela.to_numpy().sum(axis=0)
+            return pesos if pesos.sum() > 0 else np.ones(k)
+        raise ValueError(f"Regra para SKUs sem vendas desconhecida: {regra!r}")
+
+    if isinstance(regra, dict):
+        pesos = np.array([float(regra.get(e, 0)) for e in tabela.columns])
+    else:
+        pesos = np.asarray(regra, dtype=float)
+    if pesos.shape != (k,) or (pesos < 0).any() or pesos.sum() <= 0:
+        raise ValueError("Pesos para SKUs sem vendas inválidos.")
+    return pesos
+
+
+def maior_resto(quantidades: np.ndarray, pesos: np.ndarray) -> np.ndarray:
+    """
+    Divide cada quantidade (n,) entre k partes proporcionais às linhas
+    de pesos (n, k) pelo método do maior resto. Linhas de peso zero
+    devem ser tratadas antes. Empates vão para a parte de menor índice.
+    """
+    total = pesos.sum(axis=1, keepdims=True)
+    numerador = quantidades[:, None] * pesos
+    base = np.floor_divide(numerador, total)
+    resto = numerador - base * total
+    base = base.astype(np.int64)
+
+    faltam = quantidades - base.sum(axis=1)
+
+    # Posição de cada parte na ordem decrescente de resto, por linha
+    ordem = np.argsort(-resto, axis=1, kind="stable")
+    posicao = np.empty_like(ordem)
+    np.put_along_axis(posicao, ordem, np.arange(pesos.shape[1])[None, :], axis=1)
+
+    return base + (posicao < faltam[:, None])
+
+
+def alocar_estoque(recebido: pd.DataFrame, vendas: pd.DataFrame, empresas=None,
+                   regra_sem_vendas=REGRA_SEM_VENDAS,
+                   sku_col: str = "SKU", qtd_col: str = "Quantidade") -> pd.DataFrame:
+    """
+    Aloca todos os SKUs de `recebido` entre as empresas numa só passada.
+    vendas: arquivo com colunas SKU e Vendas_<Empresa>, ou a tabela já
+    indexada por indexar_vendas.
+    Retorna SKU, Quantidade, uma coluna por empresa e Criterio
+    ("vendas" ou "sem_vendas").
+    """
+    if vendas.index.name == "SKU" and vendas.index.is_unique:
+        tabela = vendas if empresas is None else vendas[list(empresas)]
+    else:
+        tabela = indexar_vendas(vendas, empresas)
+
+    qtd = br_to_float_series(recebido[qtd_col]).fillna(0)
+    if (qtd < 0).any() or (qtd != np.floor(qtd)).any():
+        raise ValueError("Quantidades recebidas devem ser inteiros não negativos.")
+
+    rec = (
+        pd.DataFrame({"SKU": norm_sku_series(recebido[sku_col]).to_numpy(),
+                      "Quantidade": qtd.astype(np.int64).to_numpy()})
+        .groupby("SKU", sort=False, as_index=False)["Quantidade"].sum()
+    )
+
+    # Vendas de cada SKU recebido (0 se o SKU não aparece nas vendas)
+    pos = tabela.index.get_indexer(rec["SKU"])
+    pesos = np.zeros((len(rec), tabela.shape[1]))
+    achou = pos >= 0
+    pesos[achou] = tabela.to_numpy(dtype=float)[pos[achou]]
+
+    sem_vendas = pesos.sum(axis=1) == 0
+    pesos[sem_vendas] = _pesos_sem_vendas(regra_sem_vendas, tabela)
+
+    alocado = maior_resto(rec["Quantidade"].to_numpy(), pesos)
+
+    out = rec.copy()
+    for j, empresa in enumerate(tabela.columns):
+        out[empresa] = alocado[:, j]
+    out["Criterio"] = np.where(sem_vendas, "sem_vendas", "vendas")
+    return out
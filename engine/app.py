@@ -1,14 +1,35 @@
+"""
+Funções do fluxo completo (upload → cálculo → pré-OC → OC) e execução
+em lote sem interface, para rodar agendada:
+
+    python -m engine.app --catalogo padrao.xlsx --entrada uploads/ \
+                         [--empresas Alivvia JCA] [--saida saida/2026-01-31]
+
+uploads/<empresa>/ contém os arquivos FULL, físico e vendas de cada
+empresa (reconhecidos pelo nome: full*, fisico*/estoque*, vendas*/shopee*).
+"""
+import argparse
+import datetime as dt
+import logging
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
-from normalizador import carregar_full, carregar_fisico, carregar_vendas
-from kits import explodir_kits
-from calculo import calcular_reposicao
-from oc_engine import (
-    init_db, gerar_numero_oc, salvar_oc,
+from data import loaders
+from data.vendas_diarias import VendasDiarias
+from .calculo import calcular_reposicao
+from .kits import carregar_padrao_excel, dicionario_skus, Catalogo
+from .normalizador import norm_header
+from .rastreio import Rastreador
+from .oc_engine import (
+    init_db, salvar_oc, salvar_ocs_lote,
     listar_ocs, marcar_recebida, gerar_pdf_oc
 )
 
+log = logging.getLogger(__name__)
+
 
 # =====================================================
 # 1 — INICIALIZAR MÓDULOS ESSENCIAIS
@@ -26,44 +47,36 @@ def iniciar_sistema():
 # 2 — CARREGAR UPLOADS
 # =====================================================
 
-def carregar_arquivos(full_path, fisico_path, vendas_path, kits_path):
+def carregar_arquivos(full_path, fisico_path, vendas_path, kits_path,
+                      processos: bool = False):
     """
-    Retorna todos os dataframes carregados.
+    Retorna (df_full, df_fisico, df_vendas, catalogo), só com as colunas
+    que o motor usa. processos=True lê os quatro em paralelo; só fora do
+    Streamlit (ver loaders.carregar_arquivos).
     """
-    df_full = carregar_full(full_path)
-    df_fisico = carregar_fisico(fisico_path)
-    df_vendas = carregar_vendas(vendas_path)
-
-    # Kits (já convertido para DF fora do módulo)
-    df_kits = pd.read_excel(kits_path)
-
-    return df_full, df_fisico, df_vendas, df_kits
+    return loaders.carregar_arquivos(full_path, fisico_path, vendas_path, kits_path,
+                                     processos=processos)
 
 
 # =====================================================
 # 3 — EXECUTAR CÁLCULO COMPLETO
 # =====================================================
 
-def executar_calculo(df_full, df_fisico, df_vendas, df_kits, horizonte, lead_time, crescimento):
+def executar_calculo(df_full, df_fisico, df_vendas, catalogo: Catalogo,
+                     horizonte=60, lead_time=0, crescimento=0.0, **opcoes):
     """
-    Pipeline completo:
-    1. Explode kits
-    2. Consolida vendas/estoque
-    3. Calcula quantidades sugeridas
+    Pipeline completo: explode kits, consolida vendas/estoques e calcula
+    as quantidades sugeridas (ver calculo.calcular_reposicao; opcoes vão
+    direto para ele: parametros, janela_vendas, dias_reserva, ...).
     """
-    vendas_exp = explodir_kits(df_vendas, df_kits)
-    fisico_exp = explodir_kits(df_fisico, df_kits)
-    full_exp = explodir_kits(df_full, df_kits)
-
-    df_final = calcular_reposicao(
-        vendas_exp, fisico_exp, full_exp,
+    return calcular_reposicao(
+        df_full, df_fisico, df_vendas, catalogo,
         horizonte=horizonte,
         lead_time=lead_time,
-        crescimento=crescimento
+        crescimento=crescimento,
+        **opcoes
     )
 
-    return df_final
-
 
 # =====================================================
 # 4 — CRIAR PRÉ OC
@@ -72,10 +85,17 @@ def executar_calculo(df_full, df_fisico, df_vendas, df_kits, horizonte, lead_tim
 def criar_pre_oc(df_calculo, fornecedor=None, empresa=None):
     """
     Filtra a sugestão de compra para preparar a OC final.
-    Permite filtro por fornecedor e empresa.
+    Permite filtro por fornecedor e empresa. Sem coluna Empresa no
+    cálculo (uma empresa por execução), a empresa informada é atribuída.
     """
 
-    df = df_calculo.copy()
+    df = df_calculo.rename(columns={
+        "fornecedor": "Fornecedor",
+        "Preco": "Preco_Custo",
+        "Valor_Compra_R$": "Valor_Total_R$",
+    })
+    if "Empresa" not in df.columns:
+        df["Empresa"] = empresa or ""
 
     if fornecedor:
         df = df[df["Fornecedor"] == fornecedor]
@@ -99,15 +119,13 @@ def gerar_oc(df_pre, fornecedor, empresa, logo_path=None):
     """
     Cria número, salva no banco e gera PDF.
     """
-    numero = gerar_numero_oc(fornecedor)
-
     df_pre = df_pre.rename(columns={
         "Compra_Sugerida": "Qtd_Ajustada",
         "Valor_Total_R$": "Valor_Ajustado_R$"
     })
 
-    # Salvar no banco
-    salvar_oc(numero, fornecedor, empresa, df_pre)
+    # Salvar no banco (número gerado na mesma transação)
+    numero = salvar_oc(None, fornecedor, empresa, df_pre)
 
     # Gerar PDF
     pdf = gerar_pdf_oc(numero, fornecedor, empresa, df_pre, logo_path=logo_path)
@@ -115,6 +133,49 @@ def gerar_oc(df_pre, fornecedor, empresa, logo_path=None):
     return numero, pdf
 
 
+def gerar_ocs_lote(df_pre, logo_path=None, processos: bool = False, max_workers=None):
+    """
+    Gera todas as OCs da pré-OC de uma vez: uma por Fornecedor/Empresa.
+    Grava tudo numa única transação e renderiza os PDFs um após o outro
+    (o ReportLab é Python puro; threads não ajudam). processos=True
+    renderiza em processos: só fora do Streamlit, onde o fork duplicaria
+    o servidor. Retorna o manifesto com número, totais e arquivo de cada OC.
+    """
+    df_pre = df_pre.rename(columns={
+        "Compra_Sugerida": "Qtd_Ajustada",
+        "Valor_Total_R$": "Valor_Ajustado_R$"
+    })
+
+    grupos = [
+        (fornecedor, empresa, itens.reset_index(drop=True))
+        for (fornecedor, empresa), itens in df_pre.groupby(["Fornecedor", "Empresa"])
+    ]
+    if not grupos:
+        return pd.DataFrame(columns=["numero", "fornecedor", "empresa",
+                                     "itens", "qtd_total", "valor_total", "pdf"])
+
+    numeros = salvar_ocs_lote(grupos)
+
+    tarefas = [(numero, forn, emp, itens, logo_path)
+               for numero, (forn, emp, itens) in zip(numeros, grupos)]
+
+    if not processos or len(tarefas) == 1 or max_workers == 1:
+        pdfs = [gerar_pdf_oc(*t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            pdfs = list(pool.map(gerar_pdf_oc, *zip(*tarefas)))
+
+    return pd.DataFrame({
+        "numero": numeros,
+        "fornecedor": [g[0] for g in grupos],
+        "empresa": [g[1] for g in grupos],
+        "itens": [len(g[2]) for g in grupos],
+        "qtd_total": [int(g[2]["Qtd_Ajustada"].sum()) for g in grupos],
+        "valor_total": [round(float(g[2]["Valor_Ajustado_R$"].sum()), 2) for g in grupos],
+        "pdf": pdfs,
+    })
+
+
 # =====================================================
 # 6 — LISTAR OCs
 # =====================================================
@@ -133,3 +194,214 @@ def listar_ocs_recebidas():
 
 def receber_oc(numero):
     marcar_recebida(numero)
+
+
+# =====================================================
+# 8 — EXECUÇÃO EM LOTE (várias empresas, sem interface)
+# =====================================================
+
+# Prefixos do nome do arquivo (após norm_header) → tipo de upload
+PREFIXOS_ARQUIVO = {
+    "full": ("full",),
+    "fisico": ("fisico", "estoque"),
+    "vendas": ("vendas", "shopee"),
+}
+EXTENSOES = (".xlsx", ".xls", ".csv", ".txt")
+
+COLUNAS_RESUMO = ["empresa", "status", "carregar_s", "calcular_s", "gravar_s",
+                  "total_s", "skus", "itens_compra", "qtd_compra", "valor_compra",
+                  "skus_desconhecidos", "erro"]
+
+
+def arquivos_da_empresa(pasta: str) -> dict:
+    """{"full": caminho, "fisico": ..., "vendas": ...} dos arquivos da pasta."""
+    achados = {}
+    for nome in sorted(os.listdir(pasta)):
+        base, ext = os.path.splitext(nome)
+        if ext.lower() not in EXTENSOES:
+            continue
+        h = norm_header(base)
+        for tipo, prefixos in PREFIXOS_ARQUIVO.items():
+            if tipo not in achados and h.startswith(prefixos):
+                achados[tipo] = os.path.join(pasta, nome)
+                break
+
+    faltando = [t for t in PREFIXOS_ARQUIVO if t not in achados]
+    if faltando:
+        raise ValueError(f"{pasta}: arquivo(s) ausente(s): {', '.join(faltando)}")
+    return achados
+
+
+def _ler_parametros(caminho: str) -> pd.DataFrame:
+    if caminho.lower().endswith((".csv", ".txt")):
+        return pd.read_csv(caminho, sep=None, engine="python", dtype=str)
+    return pd.read_excel(caminho, dtype=str)
+
+
+# Catálogo compartilhado pelos processos (enviado uma vez por processo)
+_CATALOGO = None
+
+
+def _iniciar_processo(catalogo: Catalogo):
+    global _CATALOGO
+    _CATALOGO = catalogo
+
+
+def _gravar_excel(caminho: str, abas: dict):
+    raiz, ext = os.path.splitext(caminho)
+    tmp = f"{raiz}.tmp-{os.getpid()}{ext}"
+    with pd.ExcelWriter(tmp, engine="xlsxwriter") as w:
+        for nome, df in abas.items():
+            df.to_excel(w, sheet_name=nome, index=False)
+    os.replace(tmp, caminho)
+
+
+def processar_empresa(empresa: str, arquivos: dict, saida: str,
+                      opcoes: dict, catalogo: Catalogo = None) -> dict:
+    """
+    Carrega os arquivos da empresa, calcula a reposição e grava
+    <saida>/<empresa>/resultado.xlsx e pre_oc.xlsx. Retorna a linha do
+    resumo (erros não interrompem as demais empresas).
+    """
+    cat = catalogo if catalogo is not None else _CATALOGO
+    linha = dict.fromkeys(COLUNAS_RESUMO)
+    linha.update(empresa=empresa, status="ok")
+    t0 = time.perf_counter()
+    try:
+        full = loaders.carregar_full(arquivos["full"])
+        fisico = loaders.carregar_fisico(arquivos["fisico"])
+        vendas = loaders.carregar_vendas(arquivos["vendas"])
+        t1 = time.perf_counter()
+
+        opcoes = dict(opcoes)
+        if opcoes.get("vendas_diarias"):
+            opcoes["vendas_diarias"] = VendasDiarias(os.path.join(opcoes["vendas_diarias"], empresa))
+        r = Rastreador(memoria=False)
+        out = executar_calculo(full, fisico, vendas, cat, rastreador=r, **opcoes)
+        pre = criar_pre_oc(out, empresa=empresa)
+        desconhecidos = out.attrs.get("skus_desconhecidos", pd.DataFrame())
+        t2 = time.perf_counter()
+
+        pasta = os.path.join(saida, empresa)
+        os.makedirs(pasta, exist_ok=True)
+        _gravar_excel(os.path.join(pasta, "resultado.xlsx"), {
+            "Reposicao": out,
+            "SKUs_Desconhecidos": desconhecidos,
+            "Etapas": r.tabela(),
+        })
+        por_fornecedor = (pre.groupby("Fornecedor", as_index=False)
+                             .agg(Itens=("SKU", "size"),
+                                  Qtd=("Compra_Sugerida", "sum"),
+                                  Valor_Total_R=("Valor_Total_R$", "sum"))
+                             .rename(columns={"Valor_Total_R": "Valor_Total_R$"}))
+        _gravar_excel(os.path.join(pasta, "pre_oc.xlsx"), {
+            "Pre_OC": pre,
+            "Por_Fornecedor": por_fornecedor,
+        })
+        t3 = time.perf_counter()
+
+        linha.update(carregar_s=t1 - t0, calcular_s=t2 - t1, gravar_s=t3 - t2,
+                     skus=len(out), itens_compra=len(pre),
+                     qtd_compra=int(pre["Compra_Sugerida"].sum()),
+                     valor_compra=round(float(pre["Valor_Total_R$"].sum()), 2),
+                     skus_desconhecidos=len(desconhecidos))
+    except Exception as e:
+        log.exception("Falha ao processar %s", empresa)
+        linha.update(status="erro", erro=f"{type(e).__name__}: {e}")
+    linha["total_s"] = time.perf_counter() - t0
+    return linha
+
+
+def executar_lote(catalogo_path: str, empresas: dict, saida: str,
+                  opcoes: dict = None, max_workers: int = None) -> pd.DataFrame:
+    """
+    empresas: {nome: {"full": ..., "fisico": ..., "vendas": ...}}.
+    Catálogo, matriz de kits e dicionário de SKUs são montados uma vez e
+    entregues a cada processo; as empresas rodam em paralelo.
+    Retorna o resumo (uma linha por empresa) e grava <saida>/resumo.csv.
+    """
+    opcoes = opcoes or {}
+    os.makedirs(saida, exist_ok=True)
+
+    t = time.perf_counter()
+    with open(catalogo_path, "rb") as f:
+        cat = carregar_padrao_excel(f.read())
+    dicionario_skus(cat)        # compila matriz de kits + dicionário
+    t_catalogo = time.perf_counter() - t
+    log.info("Catálogo: %d SKUs, %d kits em %.2f s", len(cat.catalogo_simples),
+             cat.kits_reais["kit_sku"].nunique(), t_catalogo)
+
+    workers = min(len(empresas), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        linhas = [processar_empresa(e, a, saida, opcoes, cat) for e, a in empresas.items()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo,
+                                 initargs=(cat,)) as pool:
+            futuros = [pool.submit(processar_empresa, e, a, saida, opcoes)
+                       for e, a in empresas.items()]
+            linhas = [f.result() for f in futuros]
+
+    resumo = pd.DataFrame(linhas, columns=COLUNAS_RESUMO).astype(
+        {c: "Int64" for c in ("skus", "itens_compra", "qtd_compra", "skus_desconhecidos")})
+    resumo.attrs["catalogo_s"] = t_catalogo
+    resumo.to_csv(os.path.join(saida, "resumo.csv"), index=False)
+    return resumo
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Reposição em lote para várias empresas (sem interface).")
+    parser.add_argument("--catalogo", required=True,
+                        help="planilha padrão (abas CATALOGO e KITS)")
+    parser.add_argument("--entrada", required=True,
+                        help="pasta com uma subpasta de arquivos por empresa")
+    parser.add_argument("--empresas", nargs="+",
+                        help="empresas a processar (padrão: todas as subpastas)")
+    parser.add_argument("--saida", default=os.path.join("saida", dt.date.today().isoformat()))
+    parser.add_argument("--horizonte", type=int, default=60)
+    parser.add_argument("--lead-time", type=int, default=0)
+    parser.add_argument("--crescimento", type=float, default=0.0)
+    parser.add_argument("--janela-vendas", type=int, default=60)
+    parser.add_argument("--dias-reserva", type=int, default=30)
+    parser.add_argument("--parametros", help="tabela por SKU/fornecedor (xlsx ou csv)")
+    parser.add_argument("--vendas-diarias",
+                        help="raiz do histórico diário (uma subpasta por empresa)")
+    parser.add_argument("--data-ref", help="último dia da janela de vendas (AAAA-MM-DD)")
+    parser.add_argument("--workers", type=int, help="processos (padrão: um por empresa)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    nomes = args.empresas or sorted(
+        e.name for e in os.scandir(args.entrada) if e.is_dir())
+    if not nomes:
+        parser.error(f"nenhuma empresa em {args.entrada}")
+    try:
+        empresas = {n: arquivos_da_empresa(os.path.join(args.entrada, n)) for n in nomes}
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    opcoes = dict(horizonte=args.horizonte, lead_time=args.lead_time,
+                  crescimento=args.crescimento, janela_vendas=args.janela_vendas,
+                  dias_reserva=args.dias_reserva)
+    if args.parametros:
+        opcoes["parametros"] = _ler_parametros(args.parametros)
+    if args.vendas_diarias:
+        opcoes["vendas_diarias"] = args.vendas_diarias
+        opcoes["data_ref"] = args.data_ref
+
+    t = time.perf_counter()
+    resumo = executar_lote(args.catalogo, empresas, args.saida, opcoes, args.workers)
+    total = time.perf_counter() - t
+
+    print(resumo.drop(columns="erro").to_string(index=False, float_format="{:.2f}".format))
+    for _, r in resumo[resumo["status"] != "ok"].iterrows():
+        print(f"✖ {r['empresa']}: {r['erro']}")
+    print(f"\nCatálogo {resumo.attrs['catalogo_s']:.2f} s | total {total:.2f} s | "
+          f"saída em {args.saida}")
+    return 0 if (resumo["status"] == "ok").all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,76 +1,200 @@
+import logging
+from dataclasses import dataclass
 import numpy as np
 import pandas as pd
-from .kits import construir_kits_efetivo, explodir_kits, Catalogo
-from .normalizador import norm_sku
+from data.cache import CACHE, impressao
+from data.vendas_diarias import CANAL_FULL, CANAL_SHOPEE
+from .rastreio import rastreador_ou_nulo
+from .kits import (matriz_kits, dicionario_skus, conferir_derivados,
+                   Catalogo, DicionarioSKU, MatrizKits)
+from .normalizador import norm_sku_series, br_to_float_avisando
 
+log = logging.getLogger(__name__)
 
-def preparar_full(df: pd.DataFrame) -> pd.DataFrame:
-    """Padroniza FULL → SKU, vendas_60d, estoque_full, em_transito."""
-    out = df.copy()
-    out["SKU"] = out["SKU"].map(norm_sku)
-    out["Vendas_60d"] = out["Vendas_60d"].astype(int)
-    out["Estoque_Full"] = out["Estoque_Full"].astype(int)
-    out["Em_Transito"] = out["Em_Transito"].astype(int)
+
+def _com_ids(out: pd.DataFrame, dicionario: DicionarioSKU = None) -> pd.DataFrame:
+    if dicionario is not None:
+        out["sku_id"] = dicionario.ids(out["SKU"])
     return out
 
 
-def preparar_fisico(df: pd.DataFrame) -> pd.DataFrame:
-    """Padroniza Estoque Físico → SKU, estoque, custo."""
+def preparar_full(df: pd.DataFrame, dicionario: DicionarioSKU = None) -> pd.DataFrame:
+    """Padroniza FULL → SKU, vendas_60d, estoque_full, em_transito (+ sku_id)."""
     out = df.copy()
-    out["SKU"] = out["SKU"].map(norm_sku)
-    out["Estoque_Fisico"] = out["Estoque_Fisico"].fillna(0).astype(int)
-    out["Preco"] = out["Preco"].fillna(0.0).astype(float)
-    return out
+    out["SKU"] = norm_sku_series(out["SKU"])
+    for col in ["Vendas_60d", "Estoque_Full", "Em_Transito"]:
+        out[col] = br_to_float_avisando(out[col]).fillna(0).astype(int)
+    return _com_ids(out, dicionario)
 
 
-def preparar_vendas(df: pd.DataFrame) -> pd.DataFrame:
-    """Padroniza Shopee → SKU, quantidade."""
+def preparar_fisico(df: pd.DataFrame, dicionario: DicionarioSKU = None) -> pd.DataFrame:
+    """Padroniza Estoque Físico → SKU, estoque, custo (+ sku_id)."""
     out = df.copy()
-    out["SKU"] = out["SKU"].map(norm_sku)
-    out["Quantidade"] = out["Quantidade"].astype(int)
-    return out
+    out["SKU"] = norm_sku_series(out["SKU"])
+    out["Estoque_Fisico"] = br_to_float_avisando(out["Estoque_Fisico"]).fillna(0).astype(int)
+    out["Preco"] = br_to_float_avisando(out["Preco"]).fillna(0.0)
+    return _com_ids(out, dicionario)
 
 
-def calcular_reposicao(full_df, fisico_df, vendas_df,
-                       cat: Catalogo, horizonte=60,
-                       crescimento=0.0, lead_time=0):
+def preparar_vendas(df: pd.DataFrame, dicionario: DicionarioSKU = None) -> pd.DataFrame:
+    """Padroniza Shopee → SKU, quantidade (+ sku_id)."""
+    out = df.copy()
+    out["SKU"] = norm_sku_series(out["SKU"])
+    out["Quantidade"] = br_to_float_avisando(out["Quantidade"]).fillna(0).astype(int)
+    return _com_ids(out, dicionario)
+
+
+# =====================================================
+# MEMO DAS ETAPAS (chave = impressão digital das entradas)
+# =====================================================
+
+# Cada etapa é guardada no cache LRU do processo, limitado por memória;
+# acertos/falhas/descartes em ETAPAS.estatisticas().
+ETAPAS = CACHE
+
+
+def _etapa(nome: str, chave: tuple, func, r=None):
+    """Executa func() uma vez por (nome, chave); reaproveita nas seguintes."""
+    k = (nome,) + chave
+    if not r:
+        return ETAPAS.obter_ou_calcular(k, func)
+
+    with r.etapa(nome) as m:
+        m.cache = k in ETAPAS
+        valor = ETAPAS.obter_ou_calcular(k, func)
+        m.linhas_saida = len(valor.base) if isinstance(valor, BaseReposicao) else len(valor)
+    return valor
+
+
+def limpar_etapas():
+    ETAPAS.limpar()
+
+
+@dataclass
+class BaseReposicao:
     """
-    Motor principal da reposição.
+    Tudo o que não depende de horizonte/lead_time/crescimento
+    (passos 1 a 8), pronto para a aritmética final.
+    """
+    base: pd.DataFrame          # nível componente (catálogo + vendas + estoques)
+    full: pd.DataFrame          # FULL preparado (nível anúncio/kit)
+    matriz: MatrizKits
+    full_kit_pos: np.ndarray    # linha FULL → posição do kit na matriz
+    base_comp_pos: np.ndarray   # linha da base → posição do componente na matriz
+    full_fornecedor: np.ndarray # fornecedor de cada linha FULL ("" se misto/desconhecido)
+    desconhecidos: pd.DataFrame # SKU, origens, quantidade por origem dos SKUs fora do catálogo (ou nao_repor)
+
+
+def montar_base(full_df, fisico_df, vendas_df, cat: Catalogo,
+                rastreador=None, impressoes: dict = None) -> BaseReposicao:
+    """
+    Passos 1 a 8 do motor. Cada etapa é guardada pela impressão digital
+    do conteúdo das suas entradas: reenviar ou alterar só um arquivo
+    refaz só o que depende dele.
+    impressoes: {"full", "fisico", "vendas", "catalogo"} já calculadas na
+    entrada (data.cache.impressao, kits.impressao_catalogo); as que
+    faltarem são calculadas aqui, o que custa uma passada pelos dados.
+    Quem passa uma impressão garante que ela é a do conteúdo atual.
     """
+    r = rastreador_ou_nulo(rastreador)
+    impressoes = impressoes or {}
+    imp_full = impressoes.get("full") or impressao(full_df)
+    imp_fisico = impressoes.get("fisico") or impressao(fisico_df)
+    imp_vendas = impressoes.get("vendas") or impressao(vendas_df)
+    imp_cat = conferir_derivados(cat, impressoes.get("catalogo"))
 
     # -----------------------------
-    # 1. Preparar dados
+    # Matriz de kits e dicionário de SKUs (compilados uma vez por catálogo)
     # -----------------------------
-    full = preparar_full(full_df)
-    fisico = preparar_fisico(fisico_df)
-    vendas = preparar_vendas(vendas_df)
+    with r.etapa("matriz_kits", len(cat.kits_reais)) as m:
+        m.cache = cat._matriz is not None and cat._dicionario is not None
+        matriz = matriz_kits(cat)
+        dic = dicionario_skus(cat)
+        m.linhas_saida = len(matriz.qty)
 
     # -----------------------------
-    # 2. Construir matriz de kits
+    # 1. Preparar dados (SKU → sku_id do catálogo)
     # -----------------------------
-    kits = construir_kits_efetivo(cat)
+    full = _etapa("full", (imp_full, imp_cat), lambda: preparar_full(full_df, dic), r)
+    fisico = _etapa("fisico", (imp_fisico, imp_cat), lambda: preparar_fisico(fisico_df, dic), r)
+    vendas = _etapa("vendas", (imp_vendas, imp_cat), lambda: preparar_vendas(vendas_df, dic), r)
+
+    return _etapa(
+        "base", (imp_full, imp_fisico, imp_vendas, imp_cat),
+        lambda: _montar_base(full, fisico, vendas, cat, r), r
+    )
+
+
+def _ids(df: pd.DataFrame, dic: DicionarioSKU) -> np.ndarray:
+    """sku_id do frame preparado (calculado aqui se veio sem a coluna)."""
+    if "sku_id" in df.columns:
+        return df["sku_id"].to_numpy()
+    return dic.ids(df["SKU"])
+
+
+def _por_id(ids: np.ndarray, valores, n: int) -> np.ndarray:
+    """Soma os valores por sku_id (scatter); ids -1 são ignorados."""
+    ok = ids >= 0
+    return np.bincount(ids[ok], weights=np.asarray(valores, dtype=float)[ok], minlength=n)
+
+
+def _desconhecidos(origens) -> pd.DataFrame:
+    """
+    Um SKU sem id no catálogo por linha: origens em que apareceu ("full,
+    vendas") e a quantidade somada em cada uma (0 onde não apareceu).
+    """
+    nomes = [o[0] for o in origens]
+    partes = []
+    for origem, df, ids, col in origens:
+        sku = df["SKU"].to_numpy()
+        fora = (ids < 0) & (sku != "")
+        if fora.any():
+            partes.append(pd.DataFrame({"origem": origem,
+                                        "SKU": sku[fora],
+                                        "Quantidade": df[col].to_numpy()[fora]}))
+    if not partes:
+        return pd.DataFrame({"SKU": pd.Series(dtype=object), "origens": pd.Series(dtype=object),
+                             **{o: pd.Series(dtype=np.int64) for o in nomes}})
+
+    por_origem = (pd.concat(partes, ignore_index=True)
+                    .pivot_table(index="SKU", columns="origem", values="Quantidade",
+                                 aggfunc="sum", sort=True)
+                    .reindex(columns=nomes))
+    presente = por_origem.notna().to_numpy()
+    origens_sku = [", ".join(o for o, p in zip(nomes, linha) if p) for linha in presente]
+    out = por_origem.fillna(0).astype(np.int64).reset_index()
+    out.insert(1, "origens", origens_sku)
+    out.columns.name = None
+    return out
+
+
+def _montar_base(full, fisico, vendas, cat: Catalogo, r=None) -> BaseReposicao:
+    r = rastreador_ou_nulo(r)
 
     # -----------------------------
-    # 3. Explodir as vendas FULL
+    # 2. Matriz de kits e dicionário de SKUs (já compilados em montar_base)
     # -----------------------------
-    full_exp = explodir_kits(
-        full[["SKU", "Vendas_60d"]].rename(columns={"SKU": "kit_sku",
-                                                    "Vendas_60d": "Qtd"}),
-        kits,
-        "kit_sku",
-        "Qtd"
-    ).rename(columns={"Quantidade": "ML_60d"})
+    matriz = matriz_kits(cat)
+    dic = dicionario_skus(cat)
+
+    n = len(dic)
+    ids_full = _ids(full, dic)
+    ids_fisico = _ids(fisico, dic)
+    ids_vendas = _ids(vendas, dic)
+    ids_base = dic.catalogo
 
     # -----------------------------
-    # 4. Explodir as vendas Shopee
+    # 3-4. Explodir vendas FULL e Shopee numa única passada
     # -----------------------------
-    shopee_exp = explodir_kits(
-        vendas[["SKU", "Quantidade"]].rename(columns={"SKU": "kit_sku",
-                                                      "Quantidade": "Qtd"}),
-        kits,
-        "kit_sku",
-        "Qtd"
-    ).rename(columns={"Quantidade": "Shopee_60d"})
+    with r.etapa("explodir_vendas", len(full) + len(vendas)) as m:
+        full_kit_pos = dic.kit_pos[ids_full]
+
+        vendas_kit = np.column_stack([
+            matriz.acumular(full_kit_pos, full["Vendas_60d"]),
+            matriz.acumular(dic.kit_pos[ids_vendas], vendas["Quantidade"]),
+        ])
+        vendas_comp = matriz.explodir(vendas_kit)
+        m.linhas_saida = len(vendas_comp)
 
     # -----------------------------
     # 5. Catálogo básico
@@ -78,99 +202,477 @@ def calcular_reposicao(full_df, fisico_df, vendas_df,
     cat_df = cat.catalogo_simples.rename(
         columns={"component_sku": "SKU"}
     ).copy()
+    cat_df["sku_id"] = ids_base
+    base_comp_pos = dic.comp_pos[ids_base]
 
     # -----------------------------
-    # 6. Anexar vendas ao catálogo
+    # 6. Anexar vendas ao catálogo (gather pela posição do componente)
     # -----------------------------
-    base = cat_df.merge(full_exp, on="SKU", how="left") \
-                 .merge(shopee_exp, on="SKU", how="left")
+    with r.etapa("juntar_vendas", len(cat_df)) as m:
+        base = cat_df
+        tem_comp = base_comp_pos >= 0
+        vendas_base = np.where(tem_comp[:, None],
+                               vendas_comp[np.where(tem_comp, base_comp_pos, 0)], 0)
 
-    base["ML_60d"] = base["ML_60d"].fillna(0).astype(int)
-    base["Shopee_60d"] = base["Shopee_60d"].fillna(0).astype(int)
-    base["Vendas_60d_Total"] = base["ML_60d"] + base["Shopee_60d"]
+        base["ML_60d"] = vendas_base[:, 0].astype(int)
+        base["Shopee_60d"] = vendas_base[:, 1].astype(int)
+        base["Vendas_60d_Total"] = base["ML_60d"] + base["Shopee_60d"]
+        m.linhas_saida = len(base)
 
     # -----------------------------
-    # 7. Juntar Estoque Físico
+    # 7. Juntar Estoque Físico (scatter por sku_id, gather pela base)
+    #    SKU repetido no arquivo: estoques somados, vale o último preço
     # -----------------------------
-    base = base.merge(fisico[["SKU", "Estoque_Fisico", "Preco"]],
-                      on="SKU",
-                      how="left")
+    with r.etapa("juntar_fisico", len(base)) as m:
+        estoque = _por_id(ids_fisico, fisico["Estoque_Fisico"], n + 1)
+        preco = np.zeros(n + 1)
+        ok = ids_fisico >= 0
+        preco[ids_fisico[ok]] = fisico["Preco"].to_numpy(dtype=float)[ok]
 
-    base["Estoque_Fisico"] = base["Estoque_Fisico"].fillna(0).astype(int)
-    base["Preco"] = base["Preco"].fillna(0.0).astype(float)
+        base["Estoque_Fisico"] = estoque[ids_base].astype(int)
+        base["Preco"] = preco[ids_base]
+        m.linhas_saida = len(base)
 
     # -----------------------------
     # 8. Juntar Estoque FULL
     # -----------------------------
-    base = base.merge(
-        full[["SKU", "Estoque_Full", "Em_Transito"]],
-        on="SKU",
-        how="left"
+    with r.etapa("juntar_full", len(base)) as m:
+        base["Estoque_Full"] = _por_id(ids_full, full["Estoque_Full"], n + 1)[ids_base].astype(int)
+        base["Em_Transito"] = _por_id(ids_full, full["Em_Transito"], n + 1)[ids_base].astype(int)
+        m.linhas_saida = len(base)
+
+    with r.etapa("fornecedor_kits", len(full)) as m:
+        full_fornecedor = _fornecedor_dos_kits(matriz, cat)[full_kit_pos]
+        m.linhas_saida = len(full_fornecedor)
+
+    desconhecidos = _desconhecidos([
+        ("full", full, ids_full, "Vendas_60d"),
+        ("fisico", fisico, ids_fisico, "Estoque_Fisico"),
+        ("vendas", vendas, ids_vendas, "Quantidade"),
+    ])
+    if len(desconhecidos):
+        log.warning("%d SKU(s) fora do catálogo de reposição ignorados: %s", len(desconhecidos),
+                    ", ".join(f"{sku} ({origens})" for sku, origens in
+                              desconhecidos[["SKU", "origens"]].head(10).itertuples(index=False)))
+
+    full_out = full[["SKU", "Vendas_60d", "Estoque_Full", "Em_Transito"]].copy()
+    full_out["sku_id"] = ids_full
+    return BaseReposicao(
+        base=base,
+        full=full_out,
+        matriz=matriz,
+        full_kit_pos=full_kit_pos,
+        base_comp_pos=base_comp_pos,
+        full_fornecedor=full_fornecedor,
+        desconhecidos=desconhecidos,
     )
 
-    base["Estoque_Full"] = base["Estoque_Full"].fillna(0).astype(int)
-    base["Em_Transito"] = base["Em_Transito"].fillna(0).astype(int)
 
-    # -----------------------------
-    # 9. Cálculo de alvo de FULL
-    # -----------------------------
-    fator_crescimento = (1 + crescimento / 100.0) ** (horizonte / 30.0)
+def _fornecedor_dos_kits(matriz: MatrizKits, cat: Catalogo) -> np.ndarray:
+    """
+    Fornecedor de cada kit da matriz: o dos seus componentes quando todos
+    são do mesmo fornecedor, "" caso contrário. A última posição (-1)
+    fica reservada para SKUs FULL desconhecidos.
+    """
+    forn_comp = (cat.catalogo_simples
+                 .drop_duplicates("component_sku", keep="last")
+                 .set_index("component_sku")["fornecedor"]
+                 .reindex(matriz.componentes))
+    cod, nomes = pd.factorize(forn_comp)
+    cod_entrada = cod[matriz.comp_pos]
 
-    full_calc = full.copy()
-    full_calc["vendas_dia"] = full_calc["Vendas_60d"] / 60.0
-    full_calc["alvo"] = np.round(
-        full_calc["vendas_dia"] * (horizonte + lead_time) * fator_crescimento
-    ).astype(int)
+    n = len(matriz.kits)
+    cod_min = np.full(n, np.iinfo(np.int64).max)
+    cod_max = np.full(n, -1)
+    np.minimum.at(cod_min, matriz.kit_pos, cod_entrada)
+    np.maximum.at(cod_max, matriz.kit_pos, cod_entrada)
 
-    full_calc["oferta"] = (full_calc["Estoque_Full"] +
-                           full_calc["Em_Transito"]).astype(int)
+    unico = (cod_min == cod_max) & (cod_min >= 0)
+    nomes = np.append(np.asarray(nomes, dtype=object), "")   # -1 → ""
+    return np.append(nomes[np.where(unico, cod_min, -1)], "")
 
-    full_calc["envio_desejado"] = \
-        (full_calc["alvo"] - full_calc["oferta"]).clip(lower=0).astype(int)
 
-    # Explode necessidades
-    necessidade = explodir_kits(
-        full_calc[["SKU", "envio_desejado"]].rename(
-            columns={"SKU": "kit_sku", "envio_desejado": "Qtd"}),
-        kits,
-        "kit_sku",
-        "Qtd"
-    ).rename(columns={"Quantidade": "Necessidade"})
+# =====================================================
+# PARÂMETROS POR SKU / FORNECEDOR
+# =====================================================
 
-    base = base.merge(necessidade, on="SKU", how="left")
-    base["Necessidade"] = base["Necessidade"].fillna(0).astype(int)
+PARAMETROS_PADRAO = {
+    "horizonte": 60,
+    "lead_time": 0,
+    "crescimento": 0.0,
+    "janela_vendas": 60,    # dias cobertos por Vendas_60d (ou somados do histórico diário)
+    "dias_reserva": 30,     # reserva mínima mantida no físico
+}
 
-    # -----------------------------
-    # 10. Cálculo de reserva física mínima
-    # -----------------------------
-    base["Demanda_dia"] = base["Vendas_60d_Total"] / 60.0
-    base["Reserva_30d"] = np.round(base["Demanda_dia"] * 30).astype(int)
 
-    # Quanto sobra no físico
-    base["Folga_Fisico"] = (base["Estoque_Fisico"] -
-                            base["Reserva_30d"]).clip(lower=0).astype(int)
+def _preenchido(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[col].fillna("").astype(str).str.strip() != "").to_numpy()
+
+
+def _tabela(linhas: pd.DataFrame, chaves: pd.Series) -> pd.DataFrame:
+    """Colunas de parâmetros indexadas pela chave (última linha vence)."""
+    cols = [c for c in PARAMETROS_PADRAO if c in linhas.columns]
+    tab = linhas[cols].apply(pd.to_numeric, errors="coerce")
+    tab.index = pd.Index(chaves.astype(str).to_numpy())
+    return tab[~tab.index.duplicated(keep="last")]
+
+
+def resolver_parametros(skus, fornecedores, parametros: pd.DataFrame = None,
+                        **padrao) -> pd.DataFrame:
+    """
+    Parâmetros efetivos de cada linha, numa passada vetorial:
+    tabela por SKU > tabela por fornecedor > valor global.
+
+    parametros: DataFrame com coluna SKU e/ou fornecedor e qualquer uma
+    das colunas de PARAMETROS_PADRAO (célula vazia = herda o nível acima).
+    Linhas com SKU preenchido valem para o SKU; as demais, para o fornecedor.
+    """
+    globais = {**PARAMETROS_PADRAO, **padrao}
+    n = len(skus)
+    out = pd.DataFrame({c: np.full(n, float(v)) for c, v in globais.items()})
+
+    if parametros is None or parametros.empty:
+        return out
+
+    sku_ok = _preenchido(parametros, "SKU")
+    forn_ok = _preenchido(parametros, "fornecedor") & ~sku_ok
+
+    niveis = []
+    if forn_ok.any():
+        linhas = parametros[forn_ok]
+        niveis.append((_tabela(linhas, linhas["fornecedor"]), fornecedores))
+    if sku_ok.any():
+        linhas = parametros[sku_ok]
+        niveis.append((_tabela(linhas, norm_sku_series(linhas["SKU"])), skus))
+
+    # Do menos específico para o mais específico: o último sobrepõe
+    for tab, chaves in niveis:
+        achados = tab.reindex(pd.Index(np.asarray(chaves, dtype=object).astype(str)))
+        for col in tab.columns:
+            v = achados[col].to_numpy(dtype=float)
+            ok = ~np.isnan(v)
+            out.loc[ok, col] = v[ok]
+
+    return out
+
+
+def aplicar_parametros(b: BaseReposicao, horizonte=60,
+                       crescimento=0.0, lead_time=0,
+                       parametros: pd.DataFrame = None,
+                       janela_vendas=60, dias_reserva=30,
+                       rastreador=None) -> pd.DataFrame:
+    """
+    Passos 9 a 12: só aritmética vetorial sobre a base já montada.
+    Os parâmetros globais podem ser sobrepostos por SKU ou por fornecedor
+    (ver resolver_parametros).
+    """
+    r = rastreador_ou_nulo(rastreador)
+    base = b.base
+    full = b.full
+    globais = dict(horizonte=horizonte, crescimento=crescimento,
+                   lead_time=lead_time, janela_vendas=janela_vendas,
+                   dias_reserva=dias_reserva)
+
+    # Parâmetros por anúncio FULL (kit) e por SKU da base
+    with r.etapa("resolver_parametros", len(full) + len(base)) as m:
+        p_full = resolver_parametros(full["SKU"], b.full_fornecedor,
+                                     parametros, **globais)
+        p_base = resolver_parametros(base["SKU"], base["fornecedor"],
+                                     parametros, **globais)
+        m.linhas_saida = len(p_full) + len(p_base)
 
     # -----------------------------
-    # 11. Compra sugerida final
+    # 9. Cálculo de alvo de FULL
     # -----------------------------
-    base["Compra_Sugerida"] = (base["Necessidade"] -
-                               base["Folga_Fisico"]).clip(lower=0).astype(int)
+    with r.etapa("alvo_full", len(full)) as m:
+        h = p_full["horizonte"].to_numpy()
+        fator_crescimento = (1 + p_full["crescimento"].to_numpy() / 100.0) ** (h / 30.0)
+
+        vendas_dia = full["Vendas_60d"].to_numpy() / p_full["janela_vendas"].to_numpy()
+        alvo = np.round(
+            vendas_dia * (h + p_full["lead_time"].to_numpy()) * fator_crescimento
+        ).astype(int)
+
+        oferta = (full["Estoque_Full"].to_numpy() +
+                  full["Em_Transito"].to_numpy()).astype(int)
+
+        envio_desejado = np.clip(alvo - oferta, 0, None)
+        m.linhas_saida = len(envio_desejado)
+
+    # Explode necessidades e traz para as linhas da base
+    with r.etapa("explodir_necessidade", len(full)) as m:
+        nec_comp = b.matriz.explodir(b.matriz.acumular(b.full_kit_pos, envio_desejado))
+        necessidade = np.where(b.base_comp_pos >= 0,
+                               nec_comp[b.base_comp_pos], 0).astype(int)
+        m.linhas_saida = len(necessidade)
+
+    with r.etapa("compra", len(base)) as m:
+        # -----------------------------
+        # 10. Cálculo de reserva física mínima
+        # -----------------------------
+        demanda_dia = base["Vendas_60d_Total"].to_numpy() / p_base["janela_vendas"].to_numpy()
+        reserva = np.round(demanda_dia * p_base["dias_reserva"].to_numpy()).astype(int)
 
-    # Valor da compra
-    base["Valor_Compra_R$"] = (base["Compra_Sugerida"].astype(float) *
-                               base["Preco"].astype(float)).round(2)
+        # Quanto sobra no físico
+        folga_fisico = np.clip(base["Estoque_Fisico"].to_numpy() - reserva,
+                               0, None).astype(int)
+
+        # -----------------------------
+        # 11. Compra sugerida final
+        # -----------------------------
+        compra = np.clip(necessidade - folga_fisico, 0, None).astype(int)
+
+        # Valor da compra
+        valor = np.round(compra.astype(float) *
+                         base["Preco"].to_numpy(dtype=float), 2)
+        m.linhas_saida = len(compra)
 
     # -----------------------------
     # 12. Resultado final
     # -----------------------------
-    cols = [
-        "SKU", "fornecedor",
-        "Vendas_60d_Total",
-        "ML_60d", "Shopee_60d",
-        "Estoque_Full", "Em_Transito",
-        "Estoque_Fisico", "Preco",
-        "Necessidade", "Folga_Fisico",
-        "Compra_Sugerida", "Valor_Compra_R$"
-    ]
-
-    return base[cols].copy().reset_index(drop=True)
+    with r.etapa("resultado", len(base)) as m:
+        cols = [
+            "SKU", "fornecedor",
+            "Vendas_60d_Total",
+            "ML_60d", "Shopee_60d",
+            "Estoque_Full", "Em_Transito",
+            "Estoque_Fisico", "Preco",
+        ]
+
+        out = base[cols].copy().reset_index(drop=True)
+        out["Necessidade"] = necessidade
+        out["Folga_Fisico"] = folga_fisico
+        out["Compra_Sugerida"] = compra
+        out["Valor_Compra_R$"] = valor
+        m.linhas_saida = len(out)
+
+    return out
+
+
+# =====================================================
+# DEMANDA DO HISTÓRICO DIÁRIO (data.vendas_diarias)
+# =====================================================
+
+def demanda_do_historico(full_df, vendas_df, vendas_diarias,
+                         janela_vendas=60, data_ref=None):
+    """
+    Troca Vendas_60d do FULL (canal ML) e as vendas Shopee pelas somas
+    dos últimos janela_vendas dias do histórico, terminando em data_ref
+    (padrão: último dia gravado de cada canal). Canal sem nenhum dia
+    gravado mantém a entrada original.
+    """
+    if vendas_diarias.ultimo_dia(CANAL_FULL) is not None:
+        total = vendas_diarias.total(CANAL_FULL, janela_vendas, data_ref)
+        por_sku = pd.Series(total["Quantidade"].to_numpy(), index=total["SKU"].to_numpy())
+        full_df = full_df.copy()
+        full_df["Vendas_60d"] = (por_sku.reindex(norm_sku_series(full_df["SKU"]).to_numpy())
+                                 .fillna(0).astype(int).to_numpy())
+
+    if vendas_diarias.ultimo_dia(CANAL_SHOPEE) is not None:
+        vendas_df = vendas_diarias.total(CANAL_SHOPEE, janela_vendas, data_ref)
+
+    return full_df, vendas_df
+
+
+def _sem_demanda(impressoes: dict) -> dict:
+    # FULL e vendas foram trocados pelas somas do histórico
+    return {k: v for k, v in (impressoes or {}).items() if k not in ("full", "vendas")}
+
+
+def _checar_janela(parametros: pd.DataFrame):
+    # As somas do histórico cobrem a janela global; dividir por outra
+    # janela por SKU/fornecedor daria uma demanda errada
+    if (parametros is not None and "janela_vendas" in parametros.columns
+            and _preenchido(parametros, "janela_vendas").any()):
+        raise ValueError("janela_vendas por SKU/fornecedor não vale com "
+                         "vendas_diarias; use o parâmetro global")
+
+
+def calcular_reposicao(full_df, fisico_df, vendas_df,
+                       cat: Catalogo, horizonte=60,
+                       crescimento=0.0, lead_time=0,
+                       parametros: pd.DataFrame = None,
+                       janela_vendas=60, dias_reserva=30,
+                       rastreador=None, vendas_diarias=None, data_ref=None,
+                       impressoes: dict = None):
+    """
+    Motor principal da reposição.
+    Mudar só os parâmetros reaproveita a base já montada; com impressoes
+    (ver montar_base) nem o hash das entradas é refeito.
+    parametros: tabela opcional por SKU e/ou fornecedor (ver resolver_parametros).
+    rastreador: engine.rastreio.Rastreador opcional; registra tempo, linhas
+    e memória de cada etapa (rastreador.tabela()).
+    SKUs dos arquivos que não estão no catálogo não entram no cálculo e
+    ficam listados em out.attrs["skus_desconhecidos"]: um por linha, com
+    as origens em que apareceram e a quantidade em cada uma (full, fisico,
+    vendas).
+    vendas_diarias: data.vendas_diarias.VendasDiarias opcional; a demanda
+    passa a ser a soma dos últimos janela_vendas dias até data_ref em vez
+    das colunas fixas de 60 dias (ver demanda_do_historico).
+    """
+    r = rastreador_ou_nulo(rastreador)
+    if vendas_diarias is not None:
+        _checar_janela(parametros)
+
+    with r.etapa("calcular_reposicao", len(full_df) + len(fisico_df) + len(vendas_df)) as m:
+        if vendas_diarias is not None:
+            with r.etapa("demanda_historico") as d:
+                full_df, vendas_df = demanda_do_historico(full_df, vendas_df, vendas_diarias,
+                                                          janela_vendas, data_ref)
+                impressoes = _sem_demanda(impressoes)
+                d.linhas_saida = len(full_df) + len(vendas_df)
+        b = montar_base(full_df, fisico_df, vendas_df, cat, rastreador, impressoes)
+        out = aplicar_parametros(b, horizonte=horizonte,
+                                 crescimento=crescimento, lead_time=lead_time,
+                                 parametros=parametros,
+                                 janela_vendas=janela_vendas,
+                                 dias_reserva=dias_reserva,
+                                 rastreador=rastreador)
+        out.attrs["skus_desconhecidos"] = b.desconhecidos
+        m.linhas_saida = len(out)
+    return out
+
+
+# =====================================================
+# CENÁRIOS (grade de horizonte × lead_time × crescimento)
+# =====================================================
+
+CENARIOS_POR_BLOCO = 64
+
+
+def _por_fornecedor(x: np.ndarray, cod: np.ndarray, n_forn: int) -> np.ndarray:
+    """Soma de cada linha de x (cenário × SKU) por fornecedor → (cenário × fornecedor)."""
+    n_cen = x.shape[0]
+    pos = (np.arange(n_cen)[:, None] * n_forn + cod[None, :]).ravel()
+    return np.bincount(pos, weights=x.ravel(), minlength=n_cen * n_forn).reshape(n_cen, n_forn)
+
+
+def _no_cenario(p: pd.DataFrame, col: str, grade: np.ndarray) -> np.ndarray:
+    """
+    Parâmetro por cenário × linha: o valor da tabela por SKU/fornecedor
+    quando houver, senão o da grade (p veio com NaN como global).
+    """
+    v = p[col].to_numpy()
+    return np.where(np.isnan(v)[None, :], grade[:, None], v[None, :])
+
+
+def calcular_cenarios(full_df, fisico_df, vendas_df, cat: Catalogo,
+                      horizontes=(60,), lead_times=(0,), crescimentos=(0.0,),
+                      parametros: pd.DataFrame = None,
+                      janela_vendas=60, dias_reserva=30,
+                      vendas_diarias=None, data_ref=None, impressoes: dict = None):
+    """
+    Avalia todos os cenários da grade de uma vez, por broadcasting sobre a
+    base já montada (cada cenário é uma coluna das matrizes).
+    parametros: como em calcular_reposicao; valores por SKU/fornecedor
+    prevalecem sobre os da grade.
+    vendas_diarias/data_ref/impressoes: como em calcular_reposicao.
+
+    Retorna (longo, por_fornecedor):
+    - longo: uma linha por SKU × cenário com Compra_Sugerida > 0
+    - por_fornecedor: totais por cenário × fornecedor (Envio_Desejado vai
+      para o fornecedor do kit; "" quando o kit mistura fornecedores)
+    """
+    if vendas_diarias is not None:
+        _checar_janela(parametros)
+        full_df, vendas_df = demanda_do_historico(full_df, vendas_df, vendas_diarias,
+                                                  janela_vendas, data_ref)
+        impressoes = _sem_demanda(impressoes)
+    b = montar_base(full_df, fisico_df, vendas_df, cat, impressoes=impressoes)
+    base = b.base
+    full = b.full
+
+    H, L, C = np.meshgrid(np.asarray(horizontes, dtype=float),
+                          np.asarray(lead_times, dtype=float),
+                          np.asarray(crescimentos, dtype=float),
+                          indexing="ij")
+    H, L, C = H.ravel(), L.ravel(), C.ravel()
+
+    # Parâmetros por linha; os da grade ficam NaN e são preenchidos por cenário
+    globais = dict(horizonte=np.nan, lead_time=np.nan, crescimento=np.nan,
+                   janela_vendas=janela_vendas, dias_reserva=dias_reserva)
+    p_full = resolver_parametros(full["SKU"], b.full_fornecedor, parametros, **globais)
+    p_base = resolver_parametros(base["SKU"], base["fornecedor"], parametros, **globais)
+
+    vendas_dia = full["Vendas_60d"].to_numpy() / p_full["janela_vendas"].to_numpy()
+    oferta = (full["Estoque_Full"].to_numpy() +
+              full["Em_Transito"].to_numpy()).astype(int)
+
+    demanda_dia = base["Vendas_60d_Total"].to_numpy() / p_base["janela_vendas"].to_numpy()
+    reserva = np.round(demanda_dia * p_base["dias_reserva"].to_numpy()).astype(int)
+    folga_fisico = np.clip(base["Estoque_Fisico"].to_numpy() - reserva,
+                           0, None).astype(int)
+    preco = base["Preco"].to_numpy(dtype=float)
+
+    # Códigos de fornecedor da base e dos anúncios FULL (fornecedor do kit)
+    forn_cod, forn_nomes = pd.factorize(
+        np.concatenate([base["fornecedor"].to_numpy(dtype=object),
+                        np.asarray(b.full_fornecedor, dtype=object)]),
+        use_na_sentinel=False)
+    forn_base, forn_full = forn_cod[:len(base)], forn_cod[len(base):]
+    n_forn = len(forn_nomes)
+
+    tem_comp = b.base_comp_pos >= 0
+    comp_pos = np.where(tem_comp, b.base_comp_pos, 0)
+
+    longos = []
+    totais = []
+
+    # Matrizes cenário × SKU (uma linha por cenário), em blocos de cenários
+    # para limitar a memória
+    for ini in range(0, len(H), CENARIOS_POR_BLOCO):
+        fim = min(ini + CENARIOS_POR_BLOCO, len(H))
+
+        # Alvo = vendas_dia × dias_cobertura(cenário, linha)
+        h = _no_cenario(p_full, "horizonte", H[ini:fim])
+        lt = _no_cenario(p_full, "lead_time", L[ini:fim])
+        c = _no_cenario(p_full, "crescimento", C[ini:fim])
+        dias = (h + lt) * (1 + c / 100.0) ** (h / 30.0)
+
+        alvo = np.round(dias * vendas_dia[None, :]).astype(int)
+        envio_desejado = np.clip(alvo - oferta, 0, None)
+
+        nec_comp = b.matriz.explodir(
+            b.matriz.acumular(b.full_kit_pos, envio_desejado.T)).T
+        necessidade = np.take(nec_comp, comp_pos, axis=1)
+        necessidade[:, ~tem_comp] = 0
+
+        compra = np.clip(necessidade - folga_fisico, 0, None)
+        valor = np.round(compra * preco, 2)
+
+        n_cen = fim - ini
+        tot = pd.DataFrame({
+            "cenario": np.repeat(np.arange(ini, fim), n_forn),
+            "fornecedor": np.tile(np.asarray(forn_nomes, dtype=object), n_cen),
+            "Necessidade": _por_fornecedor(necessidade, forn_base, n_forn).ravel().round().astype(int),
+            "Compra_Sugerida": _por_fornecedor(compra, forn_base, n_forn).ravel().round().astype(int),
+            "Valor_Compra_R$": _por_fornecedor(valor, forn_base, n_forn).ravel().round(2),
+            "SKUs_Compra": _por_fornecedor(compra > 0, forn_base, n_forn).ravel().round().astype(int),
+            "Envio_Desejado": _por_fornecedor(envio_desejado, forn_full, n_forn).ravel().round().astype(int),
+        })
+        totais.append(tot)
+
+        cen, linha = np.nonzero(compra)
+        longos.append(pd.DataFrame({
+            "cenario": ini + cen,
+            "SKU": base["SKU"].to_numpy()[linha],
+            "fornecedor": base["fornecedor"].to_numpy()[linha],
+            "Necessidade": necessidade[cen, linha],
+            "Folga_Fisico": folga_fisico[linha],
+            "Compra_Sugerida": compra[cen, linha],
+            "Valor_Compra_R$": valor[cen, linha],
+        }))
+
+    longo = pd.concat(longos, ignore_index=True)
+    por_fornecedor = pd.concat(totais, ignore_index=True)
+
+    # Parâmetros de cada cenário, por indexação (sem merge)
+    for df in (longo, por_fornecedor):
+        c = df["cenario"].to_numpy()
+        df.insert(1, "horizonte", H[c].astype(int))
+        df.insert(2, "lead_time", L[c].astype(int))
+        df.insert(3, "crescimento", C[c])
+
+    return longo, por_fornecedor
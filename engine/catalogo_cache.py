@@ -0,0 +1,108 @@
+import hashlib
+import os
+import shutil
+import time
+import pandas as pd
+
+
+# =====================================================
+# CACHE EM DISCO DO CATÁLOGO COMPILADO
+# Uma pasta por hash da planilha, com um parquet por tabela.
+# =====================================================
+
+CACHE_DIR = os.path.join("cache", "catalogo")
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_MARCADOR = "ok"
+
+# Versão do formato das tabelas gravadas: mudar a leitura da planilha ou o
+# achatamento dos kits exige incrementar, senão versões antigas seriam lidas
+FORMATO = 2
+
+
+def hash_conteudo(dados: bytes) -> str:
+    """Hash do conteúdo enviado + versão do formato (chave do cache)."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"catalogo-v{FORMATO}:".encode())
+    h.update(dados)
+    return h.hexdigest()
+
+
+def ler_cache(chave: str, cache_dir: str = CACHE_DIR):
+    """
+    Retorna {nome: DataFrame} gravado para a chave, ou None se não houver.
+    """
+    pasta = os.path.join(cache_dir, chave)
+    if not os.path.exists(os.path.join(pasta, _MARCADOR)):
+        return None
+
+    try:
+        tabelas = {
+            arq[:-len(".parquet")]: pd.read_parquet(os.path.join(pasta, arq))
+            for arq in os.listdir(pasta) if arq.endswith(".parquet")
+        }
+    except (OSError, ValueError):
+        # Parquet truncado/corrompido (ArrowInvalid é ValueError): descarta
+        # a versão para que seja recompilada e regravada
+        shutil.rmtree(pasta, ignore_errors=True)
+        return None
+
+    # Marca como usado recentemente (ordem de descarte)
+    os.utime(pasta)
+    return tabelas
+
+
+def gravar_cache(chave: str, tabelas: dict, cache_dir: str = CACHE_DIR,
+                 max_bytes: int = CACHE_MAX_BYTES):
+    """
+    Grava as tabelas sob a chave e descarta versões antigas
+    até o cache caber em max_bytes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    pasta = os.path.join(cache_dir, chave)
+    tmp = f"{pasta}.tmp-{os.getpid()}-{time.monotonic_ns()}"
+    os.makedirs(tmp)
+
+    for nome, df in tabelas.items():
+        df.to_parquet(os.path.join(tmp, f"{nome}.parquet"), index=False)
+    open(os.path.join(tmp, _MARCADOR), "w").close()
+
+    try:
+        os.replace(tmp, pasta)
+    except OSError:
+        # Outra sessão gravou a mesma chave antes
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    descartar_antigos(cache_dir, max_bytes, manter=chave)
+
+
+def _tamanho_pasta(pasta: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(pasta) if e.is_file())
+
+
+def descartar_antigos(cache_dir: str = CACHE_DIR,
+                      max_bytes: int = CACHE_MAX_BYTES, manter: str = None):
+    """Remove as versões usadas há mais tempo até caber em max_bytes."""
+    if not os.path.exists(cache_dir):
+        return
+
+    entradas = [
+        (e.stat().st_mtime, e.name, _tamanho_pasta(e.path))
+        for e in os.scandir(cache_dir)
+        if e.is_dir() and ".tmp-" not in e.name
+    ]
+    total = sum(t for _, _, t in entradas)
+
+    for _, nome, tamanho in sorted(entradas):
+        if total <= max_bytes:
+            break
+        if nome == manter:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, nome), ignore_errors=True)
+        total -= tamanho
+
+
+def invalidar_cache(chave: str = None, cache_dir: str = CACHE_DIR):
+    """Remove uma versão específica ou, sem chave, todo o cache."""
+    alvo = os.path.join(cache_dir, chave) if chave else cache_dir
+    shutil.rmtree(alvo, ignore_errors=True)
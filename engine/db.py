@@ -1,11 +1,52 @@
-import streamlit as st
-from supabase import create_client, Client
+import os
+import sys
+from functools import lru_cache
 
-@st.cache_resource
-def init_supabase() -> Client:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    client = create_client(url, key)
-    return client
 
-supabase = init_supabase()
+def _em_streamlit() -> bool:
+    """True só dentro de `streamlit run` (há um runtime ativo)."""
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+def _credenciais():
+    """
+    SUPABASE_URL/SUPABASE_KEY do ambiente ou, na UI, de st.secrets.
+    Fora do Streamlit (lote, benchmarks) só o ambiente vale: ler
+    st.secrets ali emite o aviso de "streamlit run".
+    """
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if url and key:
+        return url, key
+    if not _em_streamlit():
+        raise KeyError("SUPABASE_URL/SUPABASE_KEY não definidos no ambiente")
+
+    import streamlit as st
+    return st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"]
+
+
+def supabase_configurado() -> bool:
+    try:
+        _credenciais()
+        return True
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=1)
+def init_supabase():
+    """Cria o cliente só no primeiro uso (uma vez por processo)."""
+    from supabase import create_client
+
+    url, key = _credenciais()
+    return create_client(url, key)
+
+
+def __getattr__(name):
+    # Compatibilidade com `from engine.db import supabase`
+    if name == "supabase":
+        return init_supabase()
+    raise AttributeError(name)
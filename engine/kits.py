@@ -1,21 +1,180 @@
+import io
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from .normalizador import norm_sku, normalize_cols, br_to_float
+from dataclasses import dataclass, field
+from typing import Optional
+from data.cache import impressao
+from .normalizador import norm_sku_series, normalize_cols, br_to_float_avisando
+from . import catalogo_cache
+
+
+@dataclass
+class MatrizKits:
+    """
+    Tabela de kits efetiva compilada como matriz esparsa kit → componente
+    (formato COO: uma entrada por par kit/componente).
+    """
+    kits: pd.Index           # posição → kit_sku
+    componentes: pd.Index    # posição → component_sku
+    kit_pos: np.ndarray
+    comp_pos: np.ndarray
+    qty: np.ndarray
+
+    def posicoes(self, skus) -> np.ndarray:
+        """Posição de cada SKU em self.kits (-1 quando desconhecido)."""
+        return self.kits.get_indexer(skus)
+
+    def acumular(self, pos: np.ndarray, qtds) -> np.ndarray:
+        """
+        Soma as quantidades por kit a partir de posições já resolvidas.
+        qtds pode ter uma coluna por canal/cenário.
+        """
+        ok = pos >= 0
+        qtds = np.asarray(qtds, dtype=float)
+        if qtds.ndim == 1:
+            return np.bincount(pos[ok], weights=qtds[ok], minlength=len(self.kits))
+
+        canais = _canais_em_linhas(qtds)
+        if not ok.all():
+            canais = np.take(canais, np.flatnonzero(ok), axis=1)
+        return _somar_por_canal(pos[ok], canais, len(self.kits))
+
+    def vetor(self, skus, qtds) -> np.ndarray:
+        """
+        Soma as quantidades por kit (vetor alinhado a self.kits).
+        SKUs que não são kits nem componentes conhecidos são ignorados.
+        """
+        return self.acumular(self.posicoes(skus), qtds)
+
+    def explodir(self, v: np.ndarray) -> np.ndarray:
+        """
+        Produto matriz-vetor (ou matriz-matriz, uma coluna por canal).
+        v: (n_kits,) ou (n_kits, n_canais) → (n_componentes,) ou
+        (n_componentes, n_canais), em inteiros.
+        """
+        v = np.asarray(v, dtype=float)
+        if v.ndim == 1:
+            res = np.bincount(self.comp_pos, weights=v[self.kit_pos] * self.qty,
+                              minlength=len(self.componentes))
+            return np.round(res).astype(np.int64)
+
+        contrib = np.take(_canais_em_linhas(v), self.kit_pos, axis=1)
+        contrib *= self.qty
+        res = _somar_por_canal(self.comp_pos, contrib, len(self.componentes))
+        return np.round(res).astype(np.int64)
+
+
+# Matrizes (n, n_canais) são processadas como (n_canais, n) contíguas:
+# cada canal vira uma linha sequencial na memória, o que mantém o
+# bincount rápido. Os resultados voltam como vista transposta (ordem F),
+# então encadear acumular → explodir não copia nada.
+
+def _canais_em_linhas(x: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(x.T)
+
+
+def _somar_por_canal(pos: np.ndarray, canais: np.ndarray, n: int) -> np.ndarray:
+    """Soma agrupada por pos de cada linha de canais; devolve (n, n_canais)."""
+    out = np.empty((canais.shape[0], n))
+    for j, col in enumerate(canais):
+        out[j] = np.bincount(pos, weights=col, minlength=n)
+    return out.T
+
+
+@dataclass
+class DicionarioSKU:
+    """
+    Id inteiro denso de cada SKU conhecido do catálogo (kits e
+    componentes). Os frames preparados levam a coluna sku_id e o motor
+    junta tudo por indexação de arrays em vez de merge por texto.
+    Id -1 = SKU desconhecido; os arrays por id têm uma posição extra no
+    fim, então indexar com -1 dá o valor de "não encontrado".
+    """
+    skus: pd.Index          # id → SKU
+    kit_pos: np.ndarray     # id → posição em MatrizKits.kits (-1 se não é kit)
+    comp_pos: np.ndarray    # id → posição em MatrizKits.componentes (-1 se não é)
+    catalogo: np.ndarray    # linha de catalogo_simples → id
+
+    def __len__(self):
+        return len(self.skus)
+
+    def ids(self, skus) -> np.ndarray:
+        """Id de cada SKU (já normalizado); -1 quando desconhecido."""
+        return self.skus.get_indexer(skus)
 
 
 @dataclass
 class Catalogo:
     catalogo_simples: pd.DataFrame   # SKU, fornecedor, status
     kits_reais: pd.DataFrame         # kit_sku, component_sku, qty
+    _kits_efetivo: Optional[pd.DataFrame] = field(default=None, init=False,
+                                                  repr=False, compare=False)
+    _matriz: Optional[MatrizKits] = field(default=None, init=False,
+                                          repr=False, compare=False)
+    _dicionario: Optional[DicionarioSKU] = field(default=None, init=False,
+                                                 repr=False, compare=False)
+    # Conteúdo de que os três caches acima foram derivados; só serve para
+    # conferir contra a impressão atual (ver conferir_derivados)
+    _derivados_de: Optional[str] = field(default=None, init=False,
+                                         repr=False, compare=False)
 
 
-def carregar_padrao_excel(xls_bytes: bytes) -> Catalogo:
+def carregar_padrao_excel(xls_bytes: bytes, usar_cache: bool = True,
+                          cache_dir: str = catalogo_cache.CACHE_DIR) -> Catalogo:
     """
     Lê o XLS padrão contendo:
     - Aba CATALOGO
     - Aba KITS
+    Com usar_cache, o catálogo normalizado e a tabela de kits efetiva ficam
+    gravados em disco pelo hash do arquivo; o mesmo arquivo não é relido.
+    """
+    if hasattr(xls_bytes, "getvalue"):
+        xls_bytes = xls_bytes.getvalue()
+    elif hasattr(xls_bytes, "read"):
+        xls_bytes = xls_bytes.read()
+
+    if not usar_cache:
+        return _ler_padrao_excel(xls_bytes)
+
+    chave = catalogo_cache.hash_conteudo(xls_bytes)
+    tabelas = catalogo_cache.ler_cache(chave, cache_dir)
+    if tabelas is not None:
+        cat = Catalogo(catalogo_simples=tabelas["catalogo_simples"],
+                       kits_reais=tabelas["kits_reais"])
+        cat._kits_efetivo = tabelas["kits_efetivo"]
+        cat._derivados_de = impressao_catalogo(cat)
+        return cat
+
+    cat = _ler_padrao_excel(xls_bytes)
+    cat._derivados_de = impressao_catalogo(cat)
+    catalogo_cache.gravar_cache(chave, {
+        "catalogo_simples": cat.catalogo_simples,
+        "kits_reais": cat.kits_reais,
+        "kits_efetivo": construir_kits_efetivo(cat),
+    }, cache_dir)
+    return cat
+
+
+def impressao_catalogo(cat: Catalogo) -> str:
+    """Impressão do conteúdo atual das tabelas (recalculada a cada chamada)."""
+    return impressao(cat.catalogo_simples) + impressao(cat.kits_reais)
+
+
+def conferir_derivados(cat: Catalogo, imp: str = None) -> str:
     """
-    xls = pd.ExcelFile(xls_bytes)
+    Descarta kits efetivos, matriz e dicionário guardados no Catalogo se
+    as tabelas foram alteradas no lugar depois de montados. Retorna a
+    impressão atual.
+    """
+    imp = imp or impressao_catalogo(cat)
+    if cat._derivados_de != imp:
+        cat._kits_efetivo = cat._matriz = cat._dicionario = None
+        cat._derivados_de = imp
+    return imp
+
+
+def _ler_padrao_excel(xls_bytes: bytes) -> Catalogo:
+    xls = pd.ExcelFile(io.BytesIO(xls_bytes))
 
     # --- Carregar catálogo simples ---
     aba_cat = None
@@ -43,7 +202,7 @@ def carregar_padrao_excel(xls_bytes: bytes) -> Catalogo:
                 break
 
     df_cat = df_cat.rename(columns=rename_c)
-    df_cat["component_sku"] = df_cat["component_sku"].map(norm_sku)
+    df_cat["component_sku"] = norm_sku_series(df_cat["component_sku"])
     df_cat["fornecedor"] = df_cat["fornecedor"].fillna("").astype(str)
     df_cat["status_reposicao"] = df_cat["status_reposicao"].fillna("").astype(str)
 
@@ -77,9 +236,9 @@ def carregar_padrao_excel(xls_bytes: bytes) -> Catalogo:
                 break
 
     df_kits = df_kits.rename(columns=rename_k)
-    df_kits["kit_sku"] = df_kits["kit_sku"].map(norm_sku)
-    df_kits["component_sku"] = df_kits["component_sku"].map(norm_sku)
-    df_kits["qty"] = df_kits["qty"].map(br_to_float).fillna(0).astype(int)
+    df_kits["kit_sku"] = norm_sku_series(df_kits["kit_sku"])
+    df_kits["component_sku"] = norm_sku_series(df_kits["component_sku"])
+    df_kits["qty"] = br_to_float_avisando(df_kits["qty"], "KITS.qty").fillna(0).astype(int)
 
     # Remove linhas inválidas
     df_kits = df_kits[df_kits["qty"] > 0]
@@ -91,12 +250,77 @@ def carregar_padrao_excel(xls_bytes: bytes) -> Catalogo:
                     kits_reais=df_kits.reset_index(drop=True))
 
 
+def _ordem_aninhamento(df_k: pd.DataFrame) -> int:
+    """
+    Profundidade máxima de kits dentro de kits.
+    Levanta ValueError se a composição tiver ciclo (A contém B contém A).
+    """
+    kits_definidos = set(df_k["kit_sku"])
+    aninhadas = df_k.loc[df_k["component_sku"].isin(kits_definidos),
+                         ["kit_sku", "component_sku"]]
+
+    profundidade = 0
+    while not aninhadas.empty:
+        # Remove arestas cujo kit interno não contém outros kits
+        pais = set(aninhadas["kit_sku"])
+        folha = ~aninhadas["component_sku"].isin(pais)
+        if not folha.any():
+            envolvidos = sorted(pais)
+            raise ValueError(
+                "Ciclo na composição de kits envolvendo: "
+                + ", ".join(envolvidos[:10])
+                + (" ..." if len(envolvidos) > 10 else "")
+            )
+        aninhadas = aninhadas[~folha]
+        profundidade += 1
+
+    return profundidade
+
+
+def _achatar_kits(df_k: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resolve kits de kits: cada kit passa a apontar direto para os
+    componentes finais, com as quantidades multiplicadas a cada nível.
+    """
+    profundidade = _ordem_aninhamento(df_k)
+    if profundidade == 0:
+        return df_k
+
+    kits_definidos = set(df_k["kit_sku"])
+    resolvidas = []
+    pendentes = df_k
+
+    for _ in range(profundidade + 1):
+        eh_kit = pendentes["component_sku"].isin(kits_definidos)
+        resolvidas.append(pendentes[~eh_kit])
+        pendentes = pendentes[eh_kit]
+        if pendentes.empty:
+            break
+
+        sub = pendentes.merge(df_k, left_on="component_sku",
+                              right_on="kit_sku", suffixes=("", "_sub"))
+        pendentes = pd.DataFrame({
+            "kit_sku": sub["kit_sku"],
+            "component_sku": sub["component_sku_sub"],
+            "qty": sub["qty"] * sub["qty_sub"],
+        })
+
+    # O mesmo componente pode chegar por mais de um caminho
+    out = pd.concat(resolvidas, ignore_index=True)
+    return out.groupby(["kit_sku", "component_sku"], as_index=False,
+                       sort=False)["qty"].sum()
+
+
 def construir_kits_efetivo(cat: Catalogo) -> pd.DataFrame:
     """
-    - Mantém kits reais
+    - Mantém kits reais, já achatados (kits de kits → componentes finais)
     - Adiciona componentes simples como "kits unitários"
+    O resultado fica guardado no Catalogo; chamadas seguintes não recalculam.
     """
-    df_k = cat.kits_reais.copy()
+    if cat._kits_efetivo is not None:
+        return cat._kits_efetivo
+
+    df_k = _achatar_kits(cat.kits_reais[["kit_sku", "component_sku", "qty"]])
 
     componentes = set(cat.catalogo_simples["component_sku"])
     kits_definidos = set(df_k["kit_sku"])
@@ -111,26 +335,75 @@ def construir_kits_efetivo(cat: Catalogo) -> pd.DataFrame:
         df_k = pd.concat([df_k, alias_df], ignore_index=True)
 
     df_k = df_k.drop_duplicates(subset=["kit_sku", "component_sku"])
-    return df_k
+
+    cat._kits_efetivo = df_k.reset_index(drop=True)
+    return cat._kits_efetivo
+
+
+def compilar_kits(kits: pd.DataFrame) -> MatrizKits:
+    """
+    Converte a tabela kit_sku/component_sku/qty em MatrizKits,
+    com índices inteiros para kits e componentes.
+    """
+    kit_pos, kits_idx = pd.factorize(kits["kit_sku"])
+    comp_pos, comp_idx = pd.factorize(kits["component_sku"])
+
+    return MatrizKits(kits=pd.Index(kits_idx, dtype=object),
+                      componentes=pd.Index(comp_idx, dtype=object),
+                      kit_pos=kit_pos,
+                      comp_pos=comp_pos,
+                      qty=kits["qty"].to_numpy(dtype=float))
+
+
+def matriz_kits(cat: Catalogo) -> MatrizKits:
+    """Matriz de kits efetiva do catálogo, compilada uma única vez."""
+    if cat._matriz is None:
+        cat._matriz = compilar_kits(construir_kits_efetivo(cat))
+    return cat._matriz
+
+
+def dicionario_skus(cat: Catalogo) -> DicionarioSKU:
+    """Dicionário de SKUs do catálogo, construído uma única vez."""
+    if cat._dicionario is not None:
+        return cat._dicionario
+
+    matriz = matriz_kits(cat)
+    skus = matriz.kits.append(matriz.componentes.difference(matriz.kits, sort=False))
+    skus = skus.append(pd.Index(cat.catalogo_simples["component_sku"].unique())
+                       .difference(skus, sort=False))
+
+    def posicoes(indice: pd.Index) -> np.ndarray:
+        pos = np.full(len(skus) + 1, -1, dtype=np.int64)
+        pos[:len(skus)] = indice.get_indexer(skus)
+        return pos
+
+    cat._dicionario = DicionarioSKU(
+        skus=pd.Index(skus, dtype=object),
+        kit_pos=posicoes(matriz.kits),
+        comp_pos=posicoes(matriz.componentes),
+        catalogo=skus.get_indexer(cat.catalogo_simples["component_sku"]),
+    )
+    return cat._dicionario
 
 
-def explodir_kits(df_base: pd.DataFrame, kits: pd.DataFrame,
+def explodir_kits(df_base: pd.DataFrame, kits,
                   sku_col: str, qtd_col: str) -> pd.DataFrame:
     """
     Recebe vendas FULL/físicas ou Shopee e explode para nível componente.
+    kits pode ser a tabela efetiva (DataFrame) ou uma MatrizKits já compilada.
     """
-    base = df_base.copy()
-    base["kit_sku"] = base[sku_col].map(norm_sku)
-    base["qtd"] = base[qtd_col].astype(int)
+    matriz = kits if isinstance(kits, MatrizKits) else compilar_kits(kits)
 
-    merged = base.merge(kits, on="kit_sku", how="left")
-    merged = merged.dropna(subset=["component_sku"]).copy()
+    skus = norm_sku_series(df_base[sku_col])
+    qtd = df_base[qtd_col].astype(int).to_numpy()
 
-    merged["qty"] = merged["qty"].astype(int)
-    merged["resultado"] = merged["qtd"] * merged["qty"]
+    v = np.column_stack([matriz.vetor(skus, qtd),
+                         matriz.vetor(skus, np.ones(len(qtd)))])
+    res = matriz.explodir(v)
 
-    out = merged.groupby("component_sku", as_index=False)["resultado"].sum()
-    out = out.rename(columns={"component_sku": "SKU",
-                              "resultado": "Quantidade"})
+    # Mantém só os componentes alcançados por algum kit presente na base
+    alcancado = res[:, 1] > 0
+    out = pd.DataFrame({"SKU": matriz.componentes[alcancado],
+                        "Quantidade": res[alcancado, 0]})
 
-    return out
+    return out.sort_values("SKU", ignore_index=True)
@@ -1,13 +1,59 @@
+import logging
+
 import pandas as pd
 import numpy as np
 from unidecode import unidecode
 
+log = logging.getLogger(__name__)
+
+# Memo compartilhado entre chamadas: texto bruto → SKU normalizado.
+# Limitado para não crescer sem controle em sessões longas.
+_SKU_MEMO: dict = {}
+SKU_MEMO_MAX = 200_000
+
+
 def norm_sku(x: str) -> str:
     """Normaliza SKU removendo acentos, espaços e colocando em maiúsculas."""
     if pd.isna(x):
         return ""
     return unidecode(str(x)).strip().upper()
 
+
+def _norm_sku_memo(texto: str) -> str:
+    sku = _SKU_MEMO.get(texto)
+    if sku is None:
+        sku = unidecode(texto).strip().upper()
+        if len(_SKU_MEMO) >= SKU_MEMO_MAX:
+            # Descarta a metade mais antiga (dict preserva ordem de inserção)
+            for k in list(_SKU_MEMO)[:SKU_MEMO_MAX // 2]:
+                del _SKU_MEMO[k]
+        _SKU_MEMO[texto] = sku
+    return sku
+
+
+def norm_sku_series(s: pd.Series, categorica: bool = False) -> pd.Series:
+    """
+    Versão por coluna de norm_sku.
+    Normaliza apenas os valores distintos (com memo entre chamadas) e
+    reconstrói a coluna pelos códigos. Com categorica=True devolve a
+    coluna já codificada como category.
+    """
+    codigos, unicos = pd.factorize(s, use_na_sentinel=True)
+
+    # Último elemento representa os ausentes (código -1 do factorize)
+    normalizados = [_norm_sku_memo(str(u)) for u in unicos] + [""]
+
+    # Valores brutos distintos podem normalizar para o mesmo SKU
+    mapa, categorias = pd.factorize(np.array(normalizados, dtype=object))
+    codigos = mapa[codigos]
+
+    if categorica:
+        valores = pd.Categorical.from_codes(codigos, categories=pd.Index(categorias, dtype=object))
+    else:
+        valores = categorias.take(codigos)
+
+    return pd.Series(valores, index=s.index, name=s.name)
+
 def br_to_float(x):
     """Converte valores do padrão brasileiro para float."""
     if pd.isna(x):
@@ -31,6 +77,71 @@ def br_to_float(x):
     except:
         return np.nan
 
+_TIPOS_NUMERICOS = (int, float, np.integer, np.floating)
+
+
+def br_to_float_series(s: pd.Series, retornar_rejeitados: bool = False,
+                       decimal: str = ","):
+    """
+    Versão por coluna de br_to_float ("R$ 1.234,56" → 1234.56).
+    Converte apenas os valores distintos e reconstrói a coluna pelos
+    códigos. Células vazias viram NaN; texto inválido também, e é
+    contado como rejeitado. Com retornar_rejeitados=True devolve
+    (serie, qtd_rejeitados). decimal="." lê o formato americano
+    ("1,234.56"), o dos CSVs separados por vírgula.
+    """
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+        out = s.astype(float)
+        return (out, 0) if retornar_rejeitados else out
+
+    codigos, unicos = pd.factorize(s.to_numpy(dtype=object), use_na_sentinel=True)
+    unicos = np.asarray(unicos, dtype=object)
+
+    eh_num = np.fromiter((isinstance(v, _TIPOS_NUMERICOS) for v in unicos),
+                         dtype=bool, count=len(unicos))
+
+    # Último elemento representa os ausentes (código -1 do factorize)
+    valores = np.full(len(unicos) + 1, np.nan)
+    valores[:-1][eh_num] = unicos[eh_num].astype(float)
+    rejeitado = np.zeros(len(unicos) + 1, dtype=bool)
+
+    pos_txt = np.flatnonzero(~eh_num)
+    txt = pd.Series(unicos[pos_txt], dtype=object).astype(str).str.strip()
+    preenchido = (txt != "").to_numpy()
+    pos_txt = pos_txt[preenchido]
+
+    # \s cobre o espaço não separável ("R$\xa01.234,56") dos exports do Excel
+    milhar = "." if decimal == "," else ","
+    limpo = (
+        txt[preenchido].str.replace("R$", "", regex=False)
+                       .str.replace(milhar, "", regex=False)
+                       .str.replace(r"\s", "", regex=True)
+    )
+    if decimal == ",":
+        limpo = limpo.str.replace(",", ".", regex=False)
+    convertidos = pd.to_numeric(limpo, errors="coerce").to_numpy(dtype=float)
+    valores[pos_txt] = convertidos
+    rejeitado[pos_txt] = np.isnan(convertidos)
+
+    out = pd.Series(valores[codigos], index=s.index, name=s.name)
+    if retornar_rejeitados:
+        return out, int(rejeitado[codigos].sum())
+    return out
+
+
+def br_to_float_avisando(s: pd.Series, coluna: str = None,
+                         decimal: str = ",") -> pd.Series:
+    """
+    br_to_float_series que avisa no log quantas células de `coluna` (padrão:
+    nome da série) tinham texto que não é número e viraram NaN.
+    """
+    out, rejeitados = br_to_float_series(s, retornar_rejeitados=True, decimal=decimal)
+    if rejeitados:
+        log.warning("Coluna %s: %d valor(es) não numérico(s) ignorado(s).",
+                    coluna or s.name, rejeitados)
+    return out
+
+
 def norm_header(s: str) -> str:
     """Normaliza nomes de colunas para um formato padrão."""
     if s is None:
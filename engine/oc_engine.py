@@ -1,14 +1,17 @@
+import io
+import json
 import sqlite3
+import threading
 import datetime as dt
+from contextlib import contextmanager
+from functools import lru_cache
+from xml.sax.saxutils import escape
 import pandas as pd
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 import os
 
+# ReportLab só é importado dentro das funções de PDF (seção 6), para não
+# pesar no carregamento das páginas que só consultam o banco.
+
 
 # =====================================================
 # 1 — BANCO LOCAL (db/ocs.db)
@@ -16,14 +19,64 @@ import os
 
 DB_PATH = os.path.join("db", "ocs.db")
 
-def init_db():
-    if not os.path.exists("db"):
-        os.makedirs("db")
+_LOCAL = threading.local()
+
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -32000",      # ~32 MB
+    "PRAGMA mmap_size = 134217728",    # 128 MB
+]
+
+
+def conectar() -> sqlite3.Connection:
+    """
+    Conexão reaproveitada por thread (uma por arquivo de banco), já com
+    WAL e pragmas ajustados. Transações são controladas por transacao().
+    """
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None:
+        conns = _LOCAL.conns = {}
+
+    conn = conns.get(DB_PATH)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conns[DB_PATH] = conn
+    return conn
+
+
+@contextmanager
+def transacao(imediata: bool = False):
+    """
+    Abre uma transação na conexão da thread; commit ao sair, rollback em erro.
+    imediata=True reserva a escrita já no BEGIN (evita disputa entre sessões).
+    """
+    conn = conectar()
+    conn.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+def fechar_conexoes():
+    """Fecha as conexões abertas pela thread atual."""
+    for conn in getattr(_LOCAL, "conns", {}).values():
+        conn.close()
+    _LOCAL.conns = {}
 
-    cur.execute("""
+
+# Cada posição é uma versão do schema (PRAGMA user_version).
+# Novas alterações entram sempre no final da lista.
+MIGRACOES = [
+    # 1 — tabelas originais
+    [
+        """
         CREATE TABLE IF NOT EXISTS ocs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             numero TEXT,
@@ -32,9 +85,8 @@ def init_db():
             criado_em TEXT,
             recebido INTEGER DEFAULT 0
         )
-    """)
-
-    cur.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS oc_itens (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             oc_numero TEXT,
@@ -43,52 +95,200 @@ def init_db():
             preco REAL,
             valor REAL
         )
-    """)
+        """,
+    ],
+    # 2 — índices das consultas por número, status e itens da OC
+    [
+        "CREATE INDEX IF NOT EXISTS idx_ocs_numero ON ocs (numero)",
+        "CREATE INDEX IF NOT EXISTS idx_ocs_recebido ON ocs (recebido)",
+        "CREATE INDEX IF NOT EXISTS idx_oc_itens_oc_numero ON oc_itens (oc_numero)",
+    ],
+    # 3 — sequência diária de numeração (parte do total já emitido no dia)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS oc_sequencia (
+            data TEXT PRIMARY KEY,
+            ultimo INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO oc_sequencia (data, ultimo)
+        SELECT substr(criado_em, 1, 4) || substr(criado_em, 6, 2) || substr(criado_em, 9, 2),
+               COUNT(*)
+        FROM ocs
+        GROUP BY 1
+        """,
+    ],
+    # 4 — filtros do histórico e totais por OC direto do índice
+    [
+        "CREATE INDEX IF NOT EXISTS idx_ocs_fornecedor ON ocs (fornecedor, id)",
+        "CREATE INDEX IF NOT EXISTS idx_ocs_empresa ON ocs (empresa, id)",
+        "CREATE INDEX IF NOT EXISTS idx_ocs_criado_em ON ocs (criado_em)",
+        "CREATE INDEX IF NOT EXISTS idx_oc_itens_totais ON oc_itens (oc_numero, qtd, valor)",
+        "DROP INDEX IF EXISTS idx_oc_itens_oc_numero",
+    ],
+    # 5 — fila de envio ao Supabase (write-behind, ver engine/sync.py)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS sync_fila (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            conflito TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            proxima_tentativa REAL NOT NULL DEFAULT 0,
+            erro TEXT
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_fila_chave ON sync_fila (tabela, chave)",
+        "CREATE INDEX IF NOT EXISTS idx_sync_fila_pronta ON sync_fila (proxima_tentativa, id)",
+    ],
+]
 
-    conn.commit()
-    conn.close()
+
+def init_db():
+    pasta = os.path.dirname(DB_PATH)
+    if pasta and not os.path.exists(pasta):
+        os.makedirs(pasta)
+
+    with transacao(imediata=True) as conn:
+        versao = conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, comandos in enumerate(MIGRACOES[versao:], start=versao + 1):
+            for sql in comandos:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {i}")
 
 
 # =====================================================
 # 2 — GERAR NÚMERO ÚNICO DE OC
 # =====================================================
 
-def gerar_numero_oc(fornecedor: str) -> str:
+def _proximo_numero(conn, fornecedor: str, agora: dt.datetime) -> str:
     """
-    Exemplo: OC-DRAGONFIT-20251201-001
+    Avança a sequência do dia e monta o número. Deve rodar dentro de uma
+    transação de escrita: o incremento é atômico entre sessões.
     """
-    data = dt.datetime.now().strftime("%Y%m%d")
+    data = agora.strftime("%Y%m%d")
     fornecedor_clean = fornecedor.upper().replace(" ", "")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    conn.execute("""
+        INSERT INTO oc_sequencia (data, ultimo) VALUES (?, 1)
+        ON CONFLICT (data) DO UPDATE SET ultimo = ultimo + 1
+    """, (data,))
+    seq = conn.execute("SELECT ultimo FROM oc_sequencia WHERE data = ?",
+                       (data,)).fetchone()[0]
 
-    cur.execute("SELECT COUNT(*) FROM ocs WHERE criado_em LIKE ?", (f"{data}%",))
-    count = cur.fetchone()[0] + 1
-    conn.close()
+    return f"OC-{fornecedor_clean}-{data}-{seq:03d}"
 
-    return f"OC-{fornecedor_clean}-{data}-{count:03d}"
+
+def gerar_numero_oc(fornecedor: str) -> str:
+    """
+    Exemplo: OC-DRAGONFIT-20251201-001
+    Reserva o número na hora. Para numerar e salvar juntos, use
+    salvar_oc(None, ...).
+    """
+    with transacao(imediata=True) as conn:
+        return _proximo_numero(conn, fornecedor, dt.datetime.now())
 
 
 # =====================================================
 # 3 — SALVAR OC NO BANCO
 # =====================================================
 
-def salvar_oc(numero, fornecedor, empresa, df_itens):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+# None = enfileira só se o Supabase estiver configurado (verificado uma vez
+# por processo: variáveis de ambiente ou, dentro do Streamlit, st.secrets);
+# True/False forçam (testes, scripts)
+SINCRONIZAR = None
 
-    cur.execute("INSERT INTO ocs (numero, fornecedor, empresa, criado_em) VALUES (?, ?, ?, ?)",
-                (numero, fornecedor, empresa, dt.datetime.now().isoformat()))
 
-    for _, row in df_itens.iterrows():
-        cur.execute("""
-            INSERT INTO oc_itens (oc_numero, sku, qtd, preco, valor)
-            VALUES (?, ?, ?, ?, ?)
-        """, (numero, row["SKU"], int(row["Qtd_Ajustada"]), float(row["Preco_Custo"]), float(row["Valor_Ajustado_R$"])))
+@lru_cache(maxsize=1)
+def _supabase_configurado() -> bool:
+    from .db import supabase_configurado
+    return supabase_configurado()
+
+
+def sincronizacao_ativa() -> bool:
+    return _supabase_configurado() if SINCRONIZAR is None else SINCRONIZAR
 
-    conn.commit()
-    conn.close()
+
+def _enfileirar_sync(conn, tabela: str, conflito: str, linhas):
+    """
+    Registra linhas para envio ao Supabase na mesma transação da gravação
+    local. linhas: [(chave, dict)]; a chave (tabela + chave) é a chave de
+    idempotência: reenfileirar substitui o payload pendente.
+    Sem Supabase configurado nada é enfileirado (nenhum worker esvaziaria
+    a fila).
+    """
+    if not sincronizacao_ativa():
+        return
+    conn.executemany("""
+        INSERT INTO sync_fila (tabela, conflito, chave, payload)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (tabela, chave) DO UPDATE SET
+            payload = excluded.payload,
+            tentativas = 0,
+            proxima_tentativa = 0,
+            erro = NULL
+    """, [(tabela, conflito, chave, json.dumps(linha)) for chave, linha in linhas])
+
+
+def _inserir_oc(conn, numero, fornecedor, empresa, df_itens, agora: dt.datetime):
+    itens = list(zip(
+        [numero] * len(df_itens),
+        df_itens["SKU"].astype(str).tolist(),
+        df_itens["Qtd_Ajustada"].astype(int).tolist(),
+        df_itens["Preco_Custo"].astype(float).tolist(),
+        df_itens["Valor_Ajustado_R$"].astype(float).tolist(),
+    ))
+
+    conn.execute("INSERT INTO ocs (numero, fornecedor, empresa, criado_em) VALUES (?, ?, ?, ?)",
+                 (numero, fornecedor, empresa, agora.isoformat()))
+
+    conn.executemany("""
+        INSERT INTO oc_itens (oc_numero, sku, qtd, preco, valor)
+        VALUES (?, ?, ?, ?, ?)
+    """, itens)
+
+    _enfileirar_sync(conn, "ocs", "numero", [(numero, {
+        "numero": numero, "fornecedor": fornecedor, "empresa": empresa,
+        "criado_em": agora.isoformat(), "recebido": 0,
+    })])
+    _enfileirar_sync(conn, "oc_itens", "oc_numero,linha", [
+        (f"{numero}:{linha}", {"oc_numero": numero, "linha": linha, "sku": sku,
+                               "qtd": qtd, "preco": preco, "valor": valor})
+        for linha, (_, sku, qtd, preco, valor) in enumerate(itens, start=1)
+    ])
+
+
+def salvar_oc(numero, fornecedor, empresa, df_itens) -> str:
+    """
+    Grava cabeçalho e itens numa única transação.
+    Com numero=None o número é gerado na mesma transação (sem corrida
+    entre sessões). Retorna o número gravado.
+    """
+    agora = dt.datetime.now()
+    with transacao(imediata=True) as conn:
+        if numero is None:
+            numero = _proximo_numero(conn, fornecedor, agora)
+        _inserir_oc(conn, numero, fornecedor, empresa, df_itens, agora)
+    return numero
+
+
+def salvar_ocs_lote(ocs) -> list:
+    """
+    Grava várias OCs numa única transação.
+    ocs: lista de (fornecedor, empresa, df_itens). Retorna os números
+    gerados, na mesma ordem.
+    """
+    agora = dt.datetime.now()
+    numeros = []
+    with transacao(imediata=True) as conn:
+        for fornecedor, empresa, df_itens in ocs:
+            numero = _proximo_numero(conn, fornecedor, agora)
+            _inserir_oc(conn, numero, fornecedor, empresa, df_itens, agora)
+            numeros.append(numero)
+    return numeros
 
 
 # =====================================================
@@ -96,17 +296,105 @@ def salvar_oc(numero, fornecedor, empresa, df_itens):
 # =====================================================
 
 def listar_ocs(status="ABERTAS"):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    conn = conectar()
 
     if status == "ABERTAS":
-        cur.execute("SELECT numero, fornecedor, empresa, criado_em FROM ocs WHERE recebido = 0")
+        cur = conn.execute("SELECT numero, fornecedor, empresa, criado_em FROM ocs WHERE recebido = 0")
     else:
-        cur.execute("SELECT numero, fornecedor, empresa, criado_em FROM ocs WHERE recebido = 1")
+        cur = conn.execute("SELECT numero, fornecedor, empresa, criado_em FROM ocs WHERE recebido = 1")
+
+    return cur.fetchall()
+
 
-    out = cur.fetchall()
-    conn.close()
-    return out
+def _sem_horario(valor) -> bool:
+    """Data pura: date (não datetime) ou texto só com AAAA-MM-DD."""
+    if isinstance(valor, str):
+        return len(valor.strip()) <= 10
+    return not isinstance(valor, dt.datetime)
+
+
+def _limite_data(valor, fim=False) -> str:
+    """
+    Data/datetime/texto → ISO comparável com criado_em.
+    fim com data sem horário = início do dia seguinte (dia inteiro).
+    """
+    sem_horario = _sem_horario(valor)
+    if isinstance(valor, str):
+        valor = dt.datetime.fromisoformat(valor.strip())
+    if not isinstance(valor, dt.datetime):
+        valor = dt.datetime.combine(valor, dt.time.min)
+    if fim and sem_horario:
+        valor += dt.timedelta(days=1)
+    return valor.isoformat()
+
+
+def consultar_ocs(fornecedor=None, empresa=None, data_ini=None, data_fim=None,
+                  status=None, apos_id=None, limite=50) -> pd.DataFrame:
+    """
+    Histórico paginado de OCs com totais por OC (itens, quantidade, R$).
+    - status: None (todas), "ABERTAS" ou "RECEBIDAS"
+    - data_fim sem horário inclui o dia inteiro
+    - paginação por chave: passe apos_id = último id da página anterior
+    Mais recentes primeiro.
+    """
+    filtros = []
+    params = []
+
+    if fornecedor:
+        filtros.append("fornecedor = ?")
+        params.append(fornecedor)
+    if empresa:
+        filtros.append("empresa = ?")
+        params.append(empresa)
+    if data_ini is not None:
+        filtros.append("criado_em >= ?")
+        params.append(_limite_data(data_ini))
+    if data_fim is not None:
+        filtros.append("criado_em < ?" if _sem_horario(data_fim)
+                       else "criado_em <= ?")
+        params.append(_limite_data(data_fim, fim=True))
+    if status == "ABERTAS":
+        filtros.append("recebido = 0")
+    elif status == "RECEBIDAS":
+        filtros.append("recebido = 1")
+    if apos_id is not None:
+        filtros.append("id < ?")
+        params.append(int(apos_id))
+
+    where = ("WHERE " + " AND ".join(filtros)) if filtros else ""
+
+    # Pagina primeiro, agrega só os itens das OCs da página
+    sql = f"""
+        WITH pagina AS (
+            SELECT id, numero, fornecedor, empresa, criado_em, recebido
+            FROM ocs
+            {where}
+            ORDER BY id DESC
+            LIMIT ?
+        )
+        SELECT p.id, p.numero, p.fornecedor, p.empresa, p.criado_em, p.recebido,
+               COUNT(i.oc_numero)      AS itens,
+               COALESCE(SUM(i.qtd), 0)   AS qtd_total,
+               COALESCE(SUM(i.valor), 0) AS valor_total
+        FROM pagina p
+        LEFT JOIN oc_itens i ON i.oc_numero = p.numero
+        GROUP BY p.id
+        ORDER BY p.id DESC
+    """
+    params.append(int(limite))
+
+    df = pd.read_sql_query(sql, conectar(), params=params)
+
+    return df.astype({
+        "id": "int64",
+        "numero": "string",
+        "fornecedor": "string",
+        "empresa": "string",
+        "recebido": "bool",
+        "itens": "int64",
+        "qtd_total": "int64",
+        "valor_total": "float64",
+    }).assign(criado_em=pd.to_datetime(df["criado_em"], format="ISO8601"))
 
 
 # =====================================================
@@ -114,36 +402,78 @@ def listar_ocs(status="ABERTAS"):
 # =====================================================
 
 def marcar_recebida(oc_numero):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE ocs SET recebido = 1 WHERE numero = ?", (oc_numero,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute("UPDATE ocs SET recebido = 1 WHERE numero = ?", (oc_numero,))
+        # Reenvia o cabeçalho completo (substitui o pendente, se houver)
+        linha = conn.execute("""
+            SELECT numero, fornecedor, empresa, criado_em, recebido
+            FROM ocs WHERE numero = ?
+        """, (oc_numero,)).fetchone()
+        if linha:
+            _enfileirar_sync(conn, "ocs", "numero", [(oc_numero, dict(zip(
+                ["numero", "fornecedor", "empresa", "criado_em", "recebido"], linha)))])
 
 
 # =====================================================
 # 6 — GERAR PDF PROFISSIONAL
 # =====================================================
 
-def gerar_pdf_oc(oc_numero, fornecedor, empresa, df_itens, logo_path=None):
+LINHAS_POR_TABELA = 400
+
+CABECALHO_PDF = ["SKU", "Qtd Solicitada", "Preço Unit", "Total (R$)", "Conferência Recebido"]
+
+
+@lru_cache(maxsize=1)
+def _estilos():
+    from reportlab.lib.styles import getSampleStyleSheet
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=1)
+def _estilo_tabela():
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ])
+
+
+@lru_cache(maxsize=8)
+def _logo_bytes(logo_path, mtime):
+    with open(logo_path, "rb") as f:
+        return f.read()
+
+
+def _linhas_pdf(df_itens) -> list:
+    """Linhas da tabela montadas a partir das colunas (sem iterrows)."""
+    skus = df_itens["SKU"].astype(str).tolist()
+    qtds = df_itens["Qtd_Ajustada"].astype(int).tolist()
+    precos = [f"R$ {v:.2f}" for v in df_itens["Preco_Custo"].astype(float).tolist()]
+    totais = [f"R$ {v:.2f}" for v in df_itens["Valor_Ajustado_R$"].astype(float).tolist()]
+    conferencia = ["____________________"] * len(skus)
+    return [list(r) for r in zip(skus, qtds, precos, totais, conferencia)]
+
+
+def renderizar_pdf_oc(oc_numero, fornecedor, empresa, df_itens, logo_path=None) -> bytes:
     """
     Gera uma OC bonita: Logo + Tabela + Campo de conferência.
-    Output: pdfs/<OC_NUMERO>.pdf
+    Renderiza em memória e devolve os bytes do PDF (ex.: st.download_button).
     """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import (SimpleDocTemplate, Table, Paragraph,
+                                    Spacer, Image)
 
-    if not os.path.exists("pdfs"):
-        os.makedirs("pdfs")
-
-    filename = f"pdfs/{oc_numero}.pdf"
-
-    doc = SimpleDocTemplate(filename, pagesize=A4)
-    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = _estilos()
     story = []
 
     # Título
-    title = Paragraph(f"<b>ORDEM DE COMPRA — {oc_numero}</b>", styles['Title'])
-    st_fornecedor = Paragraph(f"<b>Fornecedor:</b> {fornecedor}", styles['Normal'])
-    st_empresa = Paragraph(f"<b>Empresa:</b> {empresa}", styles['Normal'])
+    title = Paragraph(f"<b>ORDEM DE COMPRA — {escape(oc_numero)}</b>", styles['Title'])
+    st_fornecedor = Paragraph(f"<b>Fornecedor:</b> {escape(str(fornecedor))}", styles['Normal'])
+    st_empresa = Paragraph(f"<b>Empresa:</b> {escape(str(empresa))}", styles['Normal'])
     st_data = Paragraph(f"<b>Data de Emissão:</b> {dt.datetime.now().strftime('%d/%m/%Y')}", styles['Normal'])
 
     story.append(title)
@@ -155,32 +485,37 @@ def gerar_pdf_oc(oc_numero, fornecedor, empresa, df_itens, logo_path=None):
 
     # Caso tenha logo
     if logo_path and os.path.exists(logo_path):
-        from reportlab.platypus import Image
-        story.append(Image(logo_path, width=120, height=60))
+        logo = _logo_bytes(logo_path, os.path.getmtime(logo_path))
+        story.append(Image(io.BytesIO(logo), width=120, height=60))
         story.append(Spacer(1, 20))
 
-    # Tabela
-    data = [["SKU", "Qtd Solicitada", "Preço Unit", "Total (R$)", "Conferência Recebido"]]
-
-    for _, row in df_itens.iterrows():
-        data.append([
-            row["SKU"],
-            int(row["Qtd_Ajustada"]),
-            f"R$ {row['Preco_Custo']:.2f}",
-            f"R$ {row['Valor_Ajustado_R$']:.2f}",
-            "____________________"
-        ])
-
-    table = Table(data, colWidths=[100, 90, 80, 80, 120])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-    ]))
+    # Tabela em blocos: cada bloco repete o cabeçalho e quebra entre páginas
+    linhas = _linhas_pdf(df_itens)
+    for ini in range(0, max(len(linhas), 1), LINHAS_POR_TABELA):
+        table = Table([CABECALHO_PDF] + linhas[ini:ini + LINHAS_POR_TABELA],
+                      colWidths=[100, 90, 80, 80, 120], repeatRows=1)
+        table.setStyle(_estilo_tabela())
+        story.append(table)
 
-    story.append(table)
     story.append(Spacer(1, 30))
 
     doc.build(story)
 
+    return buffer.getvalue()
+
+
+def gerar_pdf_oc(oc_numero, fornecedor, empresa, df_itens, logo_path=None):
+    """
+    Output: pdfs/<OC_NUMERO>.pdf (retorna o caminho).
+    Para só os bytes, sem gravar nada, use renderizar_pdf_oc.
+    """
+    pdf = renderizar_pdf_oc(oc_numero, fornecedor, empresa, df_itens,
+                            logo_path=logo_path)
+
+    os.makedirs("pdfs", exist_ok=True)
+
+    filename = f"pdfs/{oc_numero}.pdf"
+    with open(filename, "wb") as f:
+        f.write(pdf)
+
     return filename
@@ -0,0 +1,138 @@
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# =====================================================
+# RASTREIO POR ETAPA (opcional)
+# Tempo, linhas de entrada/saída e memória alocada de cada etapa do
+# motor. Desligado (rastreador=None) custa só uma chamada por etapa.
+# =====================================================
+
+log = logging.getLogger(__name__)
+
+COLUNAS = ["etapa", "nivel", "segundos", "linhas_entrada", "linhas_saida",
+           "memoria_pico_bytes", "memoria_liquida_bytes", "cache"]
+
+
+class Medida:
+    """Preenchida pela etapa em andamento (linhas, acerto de cache)."""
+    __slots__ = ("linhas_entrada", "linhas_saida", "cache")
+
+    def __init__(self, linhas_entrada=None):
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.cache = False
+
+
+class Rastreador:
+    """
+    Registra cada `with rastreador.etapa(nome, entrada) as m:` do motor.
+    Etapas podem ser aninhadas (nivel); o pico de memória de uma etapa
+    inclui o das etapas internas. Com memoria=True liga o tracemalloc
+    durante o rastreio (o motor fica mais lento enquanto isso).
+    """
+
+    def __init__(self, memoria: bool = True):
+        self.memoria = memoria
+        self.registros = []
+        self._nivel = 0
+        self._pilha = []    # [memória no início, maior pico visto] por etapa aberta
+        self._ligou_tracemalloc = False
+
+    def __bool__(self):
+        return True
+
+    @contextmanager
+    def etapa(self, nome: str, entrada=None):
+        m = Medida(entrada)
+        indice = len(self.registros)
+        self.registros.append(None)     # reserva a posição (ordem de início)
+        nivel = self._nivel
+        self._nivel += 1
+
+        if self.memoria:
+            self._abrir_memoria()
+        t = time.perf_counter()
+        try:
+            yield m
+        finally:
+            segundos = time.perf_counter() - t
+            self._nivel -= 1
+            pico, liquida = self._fechar_memoria() if self.memoria else (None, None)
+            self.registros[indice] = {
+                "etapa": nome, "nivel": nivel, "segundos": segundos,
+                "linhas_entrada": m.linhas_entrada, "linhas_saida": m.linhas_saida,
+                "memoria_pico_bytes": pico, "memoria_liquida_bytes": liquida,
+                "cache": m.cache,
+            }
+
+    def _abrir_memoria(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._ligou_tracemalloc = True
+        atual, pico = tracemalloc.get_traced_memory()
+        if self._pilha:
+            self._pilha[-1][1] = max(self._pilha[-1][1], pico)
+        tracemalloc.reset_peak()
+        self._pilha.append([atual, atual])
+
+    def _fechar_memoria(self):
+        atual, pico = tracemalloc.get_traced_memory()
+        inicio, pico_interno = self._pilha.pop()
+        pico = max(pico, pico_interno)
+        if self._pilha:
+            self._pilha[-1][1] = max(self._pilha[-1][1], pico)
+            tracemalloc.reset_peak()
+        elif self._ligou_tracemalloc:
+            tracemalloc.stop()
+            self._ligou_tracemalloc = False
+        return pico - inicio, atual - inicio
+
+    def tabela(self) -> pd.DataFrame:
+        """Uma linha por etapa, na ordem em que começaram."""
+        df = pd.DataFrame([r for r in self.registros if r is not None], columns=COLUNAS)
+        inteiras = ["linhas_entrada", "linhas_saida",
+                    "memoria_pico_bytes", "memoria_liquida_bytes"]
+        return df.astype({c: "Int64" for c in inteiras})
+
+    def registrar(self, logger: logging.Logger = None, nivel=logging.INFO):
+        """Escreve a tabela no log (execuções sem UI)."""
+        (logger or log).log(nivel, "Etapas do motor:\n%s",
+                            self.tabela().to_string(index=False))
+
+    def limpar(self):
+        self.registros.clear()
+
+
+class _Desligado:
+    """Rastreador nulo: etapa() devolve sempre o mesmo contexto vazio."""
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def etapa(self, nome, entrada=None):
+        return _CONTEXTO_NULO
+
+
+class _ContextoNulo:
+    __slots__ = ()
+    _medida = Medida()
+
+    def __enter__(self):
+        return self._medida
+
+    def __exit__(self, *exc):
+        return False
+
+
+_CONTEXTO_NULO = _ContextoNulo()
+DESLIGADO = _Desligado()
+
+
+def rastreador_ou_nulo(rastreador) -> "Rastreador":
+    return DESLIGADO if rastreador is None else rastreador
@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+import time
+
+from . import oc_engine
+
+
+# =====================================================
+# SINCRONIZAÇÃO COM SUPABASE (write-behind)
+# Gravações locais entram em sync_fila na mesma transação;
+# um worker em segundo plano envia em lotes via upsert.
+# =====================================================
+
+log = logging.getLogger(__name__)
+
+LOTE = 500
+INTERVALO = 5.0          # segundos entre varreduras da fila
+ESPERA_MAX = 300.0       # teto do backoff entre tentativas
+
+
+def _cliente_padrao():
+    from .db import init_supabase
+    return init_supabase()
+
+
+class SincronizadorSupabase:
+    """
+    Envia a fila local ao Supabase.
+    cliente_factory: função que devolve um objeto com a interface do
+    cliente supabase-py (cliente.table(nome).upsert(linhas, on_conflict=...)
+    .execute()); em testes, qualquer dublê com essa interface serve.
+    """
+
+    def __init__(self, cliente_factory=None, lote=LOTE, intervalo=INTERVALO):
+        self._cliente_factory = cliente_factory or _cliente_padrao
+        self._cliente = None
+        self.lote = lote
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            self._cliente = self._cliente_factory()
+        return self._cliente
+
+    # -----------------------------
+    # Uma passada pela fila
+    # -----------------------------
+    def sincronizar_uma_vez(self) -> int:
+        """
+        Envia o que estiver pronto, lote a lote, até a fila esvaziar ou
+        um envio falhar. Retorna quantas linhas foram confirmadas.
+        """
+        enviadas = 0
+        while True:
+            pendentes = oc_engine.conectar().execute("""
+                SELECT id, tabela, conflito, payload, tentativas
+                FROM sync_fila
+                WHERE proxima_tentativa <= ?
+                ORDER BY id
+                LIMIT ?
+            """, (time.time(), self.lote)).fetchall()
+            if not pendentes:
+                return enviadas
+
+            ok, falhou = self._enviar(pendentes)
+            enviadas += ok
+            if falhou:
+                return enviadas
+
+    def _enviar(self, pendentes):
+        # Agrupa por tabela mantendo a ordem de chegada (cabeçalho antes dos itens)
+        grupos = {}
+        for linha in pendentes:
+            grupos.setdefault((linha[1], linha[2]), []).append(linha)
+
+        confirmadas = 0
+        grupos = list(grupos.items())
+        for i, ((tabela, conflito), linhas) in enumerate(grupos):
+            try:
+                self.cliente.table(tabela).upsert(
+                    [json.loads(l[3]) for l in linhas], on_conflict=conflito
+                ).execute()
+            except Exception as e:
+                log.warning("Falha ao sincronizar %s (%d linhas): %s",
+                            tabela, len(linhas), e)
+                # Reagenda também os grupos seguintes do lote: itens não
+                # podem chegar antes do cabeçalho que falhou
+                self._reagendar([l for _, ls in grupos[i:] for l in ls], str(e))
+                return confirmadas, True
+
+            # Só remove se o payload não mudou enquanto enviava
+            with oc_engine.transacao() as conn:
+                conn.executemany(
+                    "DELETE FROM sync_fila WHERE id = ? AND payload = ?",
+                    [(l[0], l[3]) for l in linhas])
+            confirmadas += len(linhas)
+
+        return confirmadas, False
+
+    def _reagendar(self, linhas, erro: str):
+        agora = time.time()
+        with oc_engine.transacao() as conn:
+            conn.executemany("""
+                UPDATE sync_fila
+                SET tentativas = tentativas + 1, proxima_tentativa = ?, erro = ?
+                WHERE id = ?
+            """, [(agora + min(ESPERA_MAX, 2.0 ** l[4]), erro, l[0]) for l in linhas])
+
+    # -----------------------------
+    # Worker em segundo plano
+    # -----------------------------
+    def iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="sync-supabase",
+                                        daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                self.sincronizar_uma_vez()
+            except Exception:
+                log.exception("Erro no worker de sincronização")
+            self._parar.wait(self.intervalo)
+
+
+def pendentes() -> int:
+    """Quantidade de linhas aguardando envio."""
+    return oc_engine.conectar().execute("SELECT COUNT(*) FROM sync_fila").fetchone()[0]
+
+
+_sincronizador = None
+_trava = threading.Lock()
+
+
+def iniciar_sincronizacao(cliente_factory=None) -> SincronizadorSupabase:
+    """Inicia (uma vez por processo) o worker de sincronização."""
+    global _sincronizador
+    with _trava:
+        if _sincronizador is None:
+            _sincronizador = SincronizadorSupabase(cliente_factory)
+        _sincronizador.iniciar()
+        return _sincronizador
@@ -1,31 +1,42 @@
+import importlib
 import streamlit as st
-from ui import upload, calculo, pre_oc, oc_oficial, historico, alocacao
 
 st.set_page_config(page_title="Alivvia Gestão", layout="wide")
 
+# --- REGISTRO DAS PÁGINAS ---
+# Cada módulo só é importado quando a página é aberta.
+PAGINAS = {
+    "Upload": "ui.upload",
+    "Cálculo": "ui.calculo",
+    "Pré-OC": "ui.pre_oc",
+    "OC Oficial": "ui.oc_oficial",
+    "Histórico": "ui.historico",
+    "Alocação": "ui.alocacao",
+}
+
+
+@st.cache_resource
+def iniciar_sincronizacao():
+    """Envio das OCs ao Supabase em segundo plano (só se houver credenciais)."""
+    from engine.db import supabase_configurado
+    if not supabase_configurado():
+        return None
+
+    from engine.oc_engine import init_db
+    from engine.sync import iniciar_sincronizacao
+    init_db()
+    return iniciar_sincronizacao()
+
+
+iniciar_sincronizacao()
+
 # --- MENU FIXO NA ESQUERDA ---
 st.sidebar.title("Menu")
 pagina = st.sidebar.radio(
     "Navegação",
-    ["Upload", "Cálculo", "Pré-OC", "OC Oficial", "Histórico", "Alocação"],
+    list(PAGINAS),
     index=0
 )
 
 # --- ROTEAMENTO DAS PÁGINAS ---
-if pagina == "Upload":
-    upload.app()
-
-elif pagina == "Cálculo":
-    calculo.app()
-
-elif pagina == "Pré-OC":
-    pre_oc.app()
-
-elif pagina == "OC Oficial":
-    oc_oficial.app()
-
-elif pagina == "Histórico":
-    historico.app()
-
-elif pagina == "Alocação":
-    alocacao.app()
+importlib.import_module(PAGINAS[pagina]).app()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _etapas_limpas():
+    from engine.calculo import limpar_etapas
+    limpar_etapas()
+    yield
+    limpar_etapas()
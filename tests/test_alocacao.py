@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import alocacao
+
+
+def _vendas():
+    return pd.DataFrame({"SKU": ["A", "B", "C"],
+                         "Vendas_E1": [10, 0, 0],
+                         "Vendas_E2": [20, 0, 0],
+                         "Vendas_E3": [0, 0, 5]})
+
+
+def test_maior_resto_soma_exata():
+    rng = np.random.default_rng(0)
+    qtd = rng.integers(0, 1000, 500)
+    pesos = rng.random((500, 4)) + 0.01
+    out = alocacao.maior_resto(qtd, pesos)
+    assert (out.sum(axis=1) == qtd).all()
+    assert (out >= 0).all()
+    # Ninguém fica a mais de uma unidade da cota exata
+    exata = qtd[:, None] * pesos / pesos.sum(axis=1, keepdims=True)
+    assert (np.abs(out - exata) < 1).all()
+
+
+def test_alocacao_por_vendas_soma_o_recebido():
+    recebido = pd.DataFrame({"SKU": ["a", "A", "C"], "Quantidade": [4, 3, 9]})
+    out = alocacao.alocar_estoque(recebido, _vendas()).set_index("SKU")
+    assert out.loc["A", ["E1", "E2", "E3"]].tolist() == [2, 5, 0]   # 7 em 1:2
+    assert out.loc["C", ["E1", "E2", "E3"]].tolist() == [0, 0, 9]
+    assert (out[["E1", "E2", "E3"]].sum(axis=1) == out["Quantidade"]).all()
+    assert set(out["Criterio"]) == {"vendas"}
+
+
+@pytest.mark.parametrize("regra, esperado", [
+    ("igual", [4, 3, 3]),                   # 10 / 3, resto para o menor índice
+    ("geral", [3, 6, 1]),                   # vendas totais 10:20:5
+    ({"E1": 0, "E2": 1, "E3": 1}, [0, 5, 5]),
+    ([1, 0, 3], [3, 0, 7]),
+])
+def test_regras_para_sku_sem_vendas(regra, esperado):
+    recebido = pd.DataFrame({"SKU": ["B"], "Quantidade": [10]})
+    out = alocacao.alocar_estoque(recebido, _vendas(), regra_sem_vendas=regra)
+    assert out[["E1", "E2", "E3"]].iloc[0].tolist() == esperado
+    assert out["Criterio"].iloc[0] == "sem_vendas"
+
+
+def test_pesos_invalidos():
+    recebido = pd.DataFrame({"SKU": ["B"], "Quantidade": [10]})
+    for regra in ("outra", [1, 1], [0, 0, 0], {"E1": -1, "E2": 2}):
+        with pytest.raises(ValueError):
+            alocacao.alocar_estoque(recebido, _vendas(), regra_sem_vendas=regra)
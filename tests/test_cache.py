@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import storage
+from data.cache import CacheLRU, impressao
+
+
+def test_descarta_as_menos_usadas_pelo_orcamento_em_bytes():
+    c = CacheLRU(orcamento_bytes=250)
+    c.guardar("a", 1, tamanho=100)
+    c.guardar("b", 2, tamanho=100)
+    assert c.obter("a") == 1            # "a" passa a ser a mais recente
+    c.guardar("c", 3, tamanho=100)      # 300 > 250: sai "b"
+
+    assert "b" not in c and "a" in c and "c" in c
+    assert c.bytes_usados == 200
+    assert c.estatisticas()["descartes"] == 1
+
+    c.guardar("enorme", 4, tamanho=251)  # maior que o orçamento: não entra
+    assert "enorme" not in c and c.bytes_usados == 200
+
+    c.redimensionar(100)
+    assert list(c._entradas) == ["c"] and c.bytes_usados == 100
+
+
+def test_contadores_de_acertos_e_falhas():
+    c = CacheLRU()
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return 42
+
+    assert c.obter_ou_calcular("k", calcular) == 42
+    assert c.obter_ou_calcular("k", calcular) == 42
+    assert c.obter("outra") is None
+    assert len(chamadas) == 1
+
+    e = c.estatisticas()
+    assert (e["acertos"], e["falhas"]) == (1, 2)
+    assert e["taxa_acerto"] == pytest.approx(1 / 3)
+
+    c.zerar_contadores()
+    assert c.estatisticas()["acertos"] == c.estatisticas()["falhas"] == 0
+
+
+def test_quem_chama_nao_corrompe_o_valor_guardado():
+    c = CacheLRU()
+    df = pd.DataFrame({"SKU": ["A", "B"], "Quantidade": [1, 2]})
+    c.guardar("df", df)
+    antes = impressao(df)
+
+    obtido = c.obter("df")
+    with pytest.raises(ValueError, match="read-only"):
+        obtido.loc[0, "Quantidade"] = 99
+    obtido["Nova"] = 1                      # só na cópia de quem chamou
+    obtido["Quantidade"] = obtido["Quantidade"] * 10
+
+    guardado = c.obter("df")
+    assert list(guardado.columns) == ["SKU", "Quantidade"]
+    assert impressao(guardado) == antes
+
+    arr = c.obter_ou_calcular("arr", lambda: np.arange(3))
+    with pytest.raises(ValueError):
+        arr[0] = 5
+
+
+def test_impressao_calculada_ao_salvar():
+    estado = {}
+    df = pd.DataFrame({"SKU": ["A", "B"], "Quantidade": [1, 2]})
+    storage.save_dataframe("vendas", df, estado)
+
+    carregado = storage.load_dataframe("vendas", estado)
+    assert storage.impressao_salva("vendas", estado) == impressao(carregado)
+    assert storage.impressao_salva("outro", estado) is None
+    with pytest.raises(ValueError):
+        carregado.loc[0, "Quantidade"] = 5
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import calculo
+from engine.kits import Catalogo
+from engine.rastreio import Rastreador
+
+
+def _catalogo():
+    return Catalogo(
+        catalogo_simples=pd.DataFrame({"component_sku": ["A", "B", "C"],
+                                       "fornecedor": ["F1", "F2", "F2"],
+                                       "status_reposicao": ["", "", ""]}),
+        kits_reais=pd.DataFrame({"kit_sku": ["KIT1"], "component_sku": ["C"], "qty": [2]}),
+    )
+
+
+def _entradas():
+    full = pd.DataFrame({"SKU": ["A", "B", "KIT1"], "Vendas_60d": [120, 60, 10],
+                         "Estoque_Full": [0, 0, 0], "Em_Transito": [0, 0, 0]})
+    fisico = pd.DataFrame({"SKU": ["A", "B", "C"], "Estoque_Fisico": [0, 0, 0],
+                           "Preco": [1.0, 1.0, 1.0]})
+    vendas = pd.DataFrame({"SKU": ["A"], "Quantidade": [0]})
+    return full, fisico, vendas
+
+
+def _sintetico(n_skus: int, semente: int = 0):
+    """Catálogo com n_skus componentes, 30% de kits e entradas no formato dos uploads."""
+    rng = np.random.default_rng(semente)
+    comp = np.array([f"CMP-{i:07d}" for i in range(n_skus)], dtype=object)
+    n_kits = int(n_skus * 0.3)
+    fanout = rng.integers(2, 7, n_kits)
+    kits = pd.DataFrame({
+        "kit_sku": np.repeat([f"KIT-{i:07d}" for i in range(n_kits)], fanout),
+        "component_sku": comp[rng.integers(0, n_skus, fanout.sum())],
+    }).drop_duplicates()
+    kits["qty"] = rng.integers(1, 5, len(kits))
+    cat = Catalogo(
+        catalogo_simples=pd.DataFrame({"component_sku": comp,
+                                       "fornecedor": [f"FORN{i % 200}" for i in range(n_skus)],
+                                       "status_reposicao": ""}),
+        kits_reais=kits.reset_index(drop=True),
+    )
+
+    todos = np.concatenate([comp, kits["kit_sku"].unique()])
+    anuncios = todos[rng.random(len(todos)) < 0.6]
+    full = pd.DataFrame({"SKU": anuncios, "Vendas_60d": rng.poisson(10, len(anuncios)),
+                         "Estoque_Full": rng.poisson(5, len(anuncios)), "Em_Transito": 0})
+    fisico = pd.DataFrame({"SKU": comp, "Estoque_Fisico": rng.poisson(15, n_skus),
+                           "Preco": np.round(rng.lognormal(3, 1, n_skus), 2)})
+    vendas = pd.DataFrame({"SKU": anuncios[rng.integers(0, len(anuncios), 2 * len(anuncios))],
+                           "Quantidade": rng.integers(1, 4, 2 * len(anuncios))})
+    return cat, full, fisico, vendas
+
+
+def _compra(full, fisico, vendas, cat, **kw):
+    out = calculo.calcular_reposicao(full, fisico, vendas, cat, dias_reserva=0, **kw)
+    return dict(zip(out["SKU"], out["Compra_Sugerida"]))
+
+
+def test_alterar_entrada_no_lugar_invalida_etapa():
+    full, fisico, vendas = _entradas()
+    cat = _catalogo()
+    assert _compra(full, fisico, vendas, cat) == {"A": 120, "B": 60, "C": 20}
+
+    fisico.loc[fisico["SKU"] == "A", "Estoque_Fisico"] = 500
+    assert _compra(full, fisico, vendas, cat) == {"A": 0, "B": 60, "C": 20}
+
+    full.loc[full["SKU"] == "B", "Vendas_60d"] = 30
+    assert _compra(full, fisico, vendas, cat) == {"A": 0, "B": 30, "C": 20}
+
+
+def test_alterar_catalogo_no_lugar_invalida_etapa():
+    full, fisico, vendas = _entradas()
+    cat = _catalogo()
+    calculo.calcular_reposicao(full, fisico, vendas, cat)
+
+    cat.catalogo_simples.loc[1, "fornecedor"] = "F9"
+    out = calculo.calcular_reposicao(full, fisico, vendas, cat)
+    assert out.set_index("SKU").loc["B", "fornecedor"] == "F9"
+
+    # Composição do kit muda: matriz e dicionário guardados são refeitos
+    cat.kits_reais.loc[0, "qty"] = 3
+    assert _compra(full, fisico, vendas, cat)["C"] == 30
+
+
+def test_mesma_entrada_reaproveita_etapa():
+    full, fisico, vendas = _entradas()
+    cat = _catalogo()
+    calculo.calcular_reposicao(full, fisico, vendas, cat)
+    antes = calculo.ETAPAS.estatisticas()["acertos"]
+    calculo.calcular_reposicao(full.copy(), fisico.copy(), vendas.copy(), cat, horizonte=30)
+    assert calculo.ETAPAS.estatisticas()["acertos"] > antes
+
+
+
+def test_recalculo_so_de_parametros_com_impressoes_abaixo_de_100ms():
+    import time
+
+    from data.cache import impressao
+    from engine.kits import impressao_catalogo
+
+    cat, full, fisico, vendas = _sintetico(50_000, semente=1)
+    # Calculadas uma vez, na entrada
+    impressoes = {"full": impressao(full), "fisico": impressao(fisico),
+                  "vendas": impressao(vendas), "catalogo": impressao_catalogo(cat)}
+    calculo.calcular_reposicao(full, fisico, vendas, cat, impressoes=impressoes)
+
+    tempos = []
+    for h in (30, 45, 90):
+        t = time.perf_counter()
+        calculo.calcular_reposicao(full, fisico, vendas, cat, horizonte=h,
+                                   impressoes=impressoes)
+        tempos.append(time.perf_counter() - t)
+    assert min(tempos) < 0.1
+
+
+def test_cenarios_iguais_a_calcular_reposicao_com_parametros():
+    cat, full, fisico, vendas = _sintetico(400, semente=1)
+    parametros = pd.DataFrame({
+        "SKU": [cat.catalogo_simples["component_sku"][0], "", ""],
+        "fornecedor": ["", "FORN0", "FORN1"],
+        "horizonte": [90, None, 15],
+        "lead_time": [None, 20, None],
+        "dias_reserva": [None, 5, None],
+    })
+
+    longo, por_forn = calculo.calcular_cenarios(
+        full, fisico, vendas, cat, horizontes=(30, 60), lead_times=(0, 10),
+        parametros=parametros)
+
+    for (h, lt), grupo in longo.groupby(["horizonte", "lead_time"]):
+        ref = calculo.calcular_reposicao(full, fisico, vendas, cat, horizonte=h,
+                                         lead_time=lt, parametros=parametros)
+        ref = ref[ref["Compra_Sugerida"] > 0]
+        assert dict(zip(grupo["SKU"], grupo["Compra_Sugerida"])) == \
+            dict(zip(ref["SKU"], ref["Compra_Sugerida"]))
+
+        tot = por_forn[(por_forn["horizonte"] == h) & (por_forn["lead_time"] == lt)]
+        assert tot["Compra_Sugerida"].sum() == ref["Compra_Sugerida"].sum()
+        assert tot["Valor_Compra_R$"].sum() == pytest.approx(ref["Valor_Compra_R$"].sum())
+
+
+def test_envio_desejado_por_fornecedor_do_kit():
+    full, fisico, vendas = _entradas()
+    _, por_forn = calculo.calcular_cenarios(full, fisico, vendas, _catalogo())
+    envio = dict(zip(por_forn["fornecedor"], por_forn["Envio_Desejado"]))
+    # A (F1) e B (F2) vendidos diretamente; KIT1 só tem C, de F2
+    assert envio == {"F1": 120, "F2": 70}
+
+
+def test_rastreio_marca_etapas_reaproveitadas():
+    full, fisico, vendas = _entradas()
+    cat = _catalogo()
+    tabelas = []
+    for _ in range(2):
+        r = Rastreador(memoria=False)
+        calculo.calcular_reposicao(full, fisico, vendas, cat, rastreador=r)
+        tabelas.append(r.tabela().set_index("etapa"))
+
+    assert not tabelas[0].loc["base", "cache"] and tabelas[1].loc["base", "cache"]
+    assert {"matriz_kits", "explodir_vendas", "compra"} <= set(tabelas[0].index)
+    assert "explodir_vendas" not in tabelas[1].index
+
+
+def test_rastreio_marca_cache_da_matriz_de_kits_so_quando_reaproveitada():
+    full, fisico, vendas = _entradas()
+    cat = _catalogo()
+    acertos = []
+    for _ in range(2):
+        r = Rastreador(memoria=False)
+        calculo.montar_base(full, fisico, vendas, cat, rastreador=r)
+        t = r.tabela().set_index("etapa")
+        acertos.append(bool(t.loc["matriz_kits", "cache"]))
+    assert acertos == [False, True]
+
+
+def test_skus_desconhecidos_um_por_sku_com_origens(caplog):
+    full, fisico, vendas = _entradas()
+    full = pd.concat([full, pd.DataFrame({"SKU": ["X", "X"], "Vendas_60d": [5, 2],
+                                          "Estoque_Full": [0, 0], "Em_Transito": [0, 0]})])
+    fisico = pd.concat([fisico, pd.DataFrame({"SKU": ["X", "Y"], "Estoque_Fisico": [3, 4],
+                                              "Preco": [1.0, 1.0]})])
+    vendas = pd.DataFrame({"SKU": ["x", "A"], "Quantidade": [1, 0]})
+
+    with caplog.at_level("WARNING"):
+        out = calculo.calcular_reposicao(full, fisico, vendas, _catalogo())
+    d = out.attrs["skus_desconhecidos"]
+    assert d.to_dict("list") == {"SKU": ["X", "Y"],
+                                 "origens": ["full, fisico, vendas", "fisico"],
+                                 "full": [7, 0], "fisico": [3, 4], "vendas": [1, 0]}
+    assert "2 SKU(s)" in caplog.text and "X (full, fisico, vendas)" in caplog.text
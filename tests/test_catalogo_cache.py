@@ -0,0 +1,102 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from engine import catalogo_cache, kits
+
+
+@pytest.fixture(scope="module")
+def planilha():
+    catalogo = pd.DataFrame({"SKU": [f"C{i}" for i in range(20)],
+                             "Fornecedor": [f"F{i % 3}" for i in range(20)],
+                             "Status": ["nao_repor" if i == 7 else "" for i in range(20)]})
+    kits_df = pd.DataFrame({"kit_sku": ["K1", "K1", "K2", "K2"],
+                            "componente": ["C1", "C2", "K1", "C3"],
+                            "qtd": [2, 1, 3, 1]})
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as w:
+        catalogo.to_excel(w, sheet_name="CATALOGO", index=False)
+        kits_df.to_excel(w, sheet_name="KITS", index=False)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def leituras(monkeypatch):
+    """Conta as leituras da planilha (cache falhou)."""
+    n = []
+    original = kits._ler_padrao_excel
+
+    def contar(dados):
+        n.append(1)
+        return original(dados)
+
+    monkeypatch.setattr(kits, "_ler_padrao_excel", contar)
+    return n
+
+
+def _iguais(a, b):
+    pd.testing.assert_frame_equal(a.catalogo_simples.reset_index(drop=True),
+                                  b.catalogo_simples.reset_index(drop=True))
+    pd.testing.assert_frame_equal(a.kits_reais.reset_index(drop=True),
+                                  b.kits_reais.reset_index(drop=True))
+
+
+def test_mesma_planilha_reaproveita_o_cache(tmp_path, planilha, leituras):
+    pasta = str(tmp_path)
+    primeiro = kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+    segundo = kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+
+    assert len(leituras) == 1
+    assert os.listdir(pasta) == [catalogo_cache.hash_conteudo(planilha)]
+    _iguais(primeiro, segundo)
+    pd.testing.assert_frame_equal(kits.construir_kits_efetivo(segundo),
+                                  kits.construir_kits_efetivo(primeiro))
+
+
+def test_novo_formato_recompila(tmp_path, planilha, leituras, monkeypatch):
+    pasta = str(tmp_path)
+    kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+    antiga = catalogo_cache.hash_conteudo(planilha)
+
+    monkeypatch.setattr(catalogo_cache, "FORMATO", catalogo_cache.FORMATO + 1)
+    assert catalogo_cache.hash_conteudo(planilha) != antiga
+    kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+    assert len(leituras) == 2
+
+
+def test_parquet_corrompido_e_refeito(tmp_path, planilha, leituras):
+    pasta = str(tmp_path)
+    original = kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+    chave = catalogo_cache.hash_conteudo(planilha)
+    arquivo = os.path.join(pasta, chave, "kits_reais.parquet")
+    with open(arquivo, "r+b") as f:
+        f.truncate(os.path.getsize(arquivo) // 2)
+
+    assert catalogo_cache.ler_cache(chave, pasta) is None
+    assert not os.path.exists(os.path.join(pasta, chave))
+
+    refeito = kits.carregar_padrao_excel(planilha, cache_dir=pasta)
+    assert len(leituras) == 2
+    _iguais(original, refeito)
+    assert catalogo_cache.ler_cache(chave, pasta) is not None
+
+
+def test_descarta_versoes_menos_usadas(tmp_path):
+    pasta = str(tmp_path)
+    df = pd.DataFrame({"x": range(1000)})
+    for i, chave in enumerate(["a", "b", "c"]):
+        catalogo_cache.gravar_cache(chave, {"t": df}, pasta, max_bytes=10**9)
+        t = 1_000_000 + i * 100
+        os.utime(os.path.join(pasta, chave), (t, t))
+    uma = catalogo_cache._tamanho_pasta(os.path.join(pasta, "a"))
+
+    # "a" é a mais antiga, mas foi lida agora: passa a ser a mais recente
+    catalogo_cache.ler_cache("a", pasta)
+    catalogo_cache.descartar_antigos(pasta, max_bytes=2 * uma)
+    assert sorted(os.listdir(pasta)) == ["a", "c"]
+
+    # A versão recém-gravada nunca é descartada
+    catalogo_cache.descartar_antigos(pasta, max_bytes=0, manter="c")
+    assert os.listdir(pasta) == ["c"]
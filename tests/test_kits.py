@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from engine import kits
+from engine.kits import Catalogo
+
+
+def _catalogo(linhas_kits, componentes=("A", "B", "C")):
+    return Catalogo(
+        catalogo_simples=pd.DataFrame({"component_sku": list(componentes),
+                                       "fornecedor": "F1", "status_reposicao": ""}),
+        kits_reais=pd.DataFrame(linhas_kits, columns=["kit_sku", "component_sku", "qty"]),
+    )
+
+
+def _como_dict(df):
+    return {(k, c): q for k, c, q in df[["kit_sku", "component_sku", "qty"]].itertuples(index=False)}
+
+
+def _efetivo_baseline(cat):
+    """construir_kits_efetivo antes dos kits aninhados (sem achatar)."""
+    df_k = cat.kits_reais.copy()
+    kits_definidos = set(df_k["kit_sku"])
+    alias = [(s, s, 1) for s in cat.catalogo_simples["component_sku"] if s not in kits_definidos]
+    df_k = pd.concat([df_k, pd.DataFrame(alias, columns=df_k.columns)], ignore_index=True)
+    return df_k.drop_duplicates(subset=["kit_sku", "component_sku"])
+
+
+def test_kits_de_kits_multiplicam_quantidades():
+    cat = _catalogo([
+        ("K1", "A", 2), ("K1", "B", 1),
+        ("K2", "K1", 3), ("K2", "C", 1),
+        ("K3", "K2", 2), ("K3", "A", 1),
+    ])
+    assert kits._ordem_aninhamento(cat.kits_reais) == 2
+
+    efetivo = _como_dict(kits.construir_kits_efetivo(cat))
+    assert {k: v for k, v in efetivo.items() if k[0] == "K3"} == {
+        ("K3", "A"): 2 * 3 * 2 + 1,     # via K2→K1 e direto
+        ("K3", "B"): 2 * 3 * 1,
+        ("K3", "C"): 2 * 1,
+    }
+    assert efetivo[("K2", "A")] == 6 and efetivo[("K2", "C")] == 1
+    assert not any(c.startswith("K") for _, c in efetivo)
+
+    # Explodir uma venda de K3 chega aos componentes finais
+    m = kits.matriz_kits(cat)
+    comp = m.explodir(m.vetor(["K3"], [1]))
+    assert dict(zip(m.componentes, comp)) == {"A": 13, "B": 6, "C": 2}
+
+
+def test_ciclo_levanta_value_error():
+    cat = _catalogo([("X", "Y", 1), ("Y", "X", 2), ("Y", "A", 1)])
+    with pytest.raises(ValueError, match="Ciclo.*X.*Y"):
+        kits.construir_kits_efetivo(cat)
+
+
+def test_kits_planos_iguais_ao_baseline():
+    cat = _catalogo([("K1", "A", 2), ("K1", "B", 1), ("K2", "C", 4), ("K2", "A", 1)])
+    assert kits._ordem_aninhamento(cat.kits_reais) == 0
+    assert _como_dict(kits.construir_kits_efetivo(cat)) == _como_dict(_efetivo_baseline(cat))
@@ -0,0 +1,130 @@
+import io
+import re
+import zipfile
+
+import pandas as pd
+
+from data import loaders
+
+
+def _xlsx(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def _reescrever_folha(dados: bytes, trocar) -> bytes:
+    """Copia o xlsx aplicando `trocar` ao XML da primeira aba."""
+    origem = zipfile.ZipFile(io.BytesIO(dados))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as destino:
+        for item in origem.infolist():
+            conteudo = origem.read(item.filename)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                conteudo = trocar(conteudo)
+            destino.writestr(item, conteudo)
+    return buf.getvalue()
+
+
+def test_xlsx_com_atributos_em_outra_ordem_le_todas_as_linhas():
+    df = pd.DataFrame({"SKU": [f"A{i}" for i in range(5)], "Estoque": range(5)})
+    dados = _xlsx(df)
+    # Linhas 3+ com r como último atributo e espaçamento duplo: válido,
+    # mas fora da regex do leitor rápido
+    dados = _reescrever_folha(dados, lambda x: re.sub(
+        rb'<c r="([A-Z]+[3-9])"([^>]*?)(/?>)', rb'<c\2  r="\1"\3', x))
+
+    out = loaders.carregar_fisico(dados)
+    assert out["SKU"].tolist() == [f"A{i}" for i in range(5)]
+    assert out["Estoque_Fisico"].tolist() == list(range(5))
+
+
+def test_xlsx_canonico_usa_leitor_rapido():
+    df = pd.DataFrame({"SKU": ["A", "B"], "Estoque": [1, 2]})
+    bruto, _ = loaders._ler_xlsx(_xlsx(df), loaders.COLUNAS_FISICO)
+    assert len(bruto) == 2
+
+
+def test_csv_latin1():
+    texto = "SKU;Estoque;Preço\nAÇÃO-1;3;1,50\nB;4;2,00\n"
+    out = loaders.carregar_fisico(texto.encode("cp1252"))
+    assert out["SKU"].tolist() == ["AÇÃO-1", "B"]
+    assert out["Preco"].tolist() == [1.5, 2.0]
+
+
+def test_valores_nao_numericos_sao_avisados(caplog):
+    texto = "SKU;Estoque;Preço\nA;3;abc\nB;x;2,00\nC;y;1\n"
+    with caplog.at_level("WARNING"):
+        out = loaders.carregar_fisico(texto.encode())
+    assert out["Estoque_Fisico"].tolist() == [3, 0, 0]
+    avisos = [r.getMessage() for r in caplog.records]
+    assert any("Estoque_Fisico" in a and " 2 " in a for a in avisos)
+    assert any("Preco" in a and " 1 " in a for a in avisos)
+
+
+def test_pedidos_cp1252_com_acento_depois_do_inicio(tmp_path):
+    linhas = ["SKU;Quantidade;Data;Loja"]
+    linhas += [f"SKU{i % 50};1;10/01/2025;Loja A" for i in range(4000)]
+    linhas += ["SKU1;2;10/01/2025;Loja São João"]
+    dados = "\n".join(linhas).encode("cp1252")
+    assert dados.index("ã".encode("cp1252")) > 50_000
+    caminho = tmp_path / "pedidos.csv"
+    caminho.write_bytes(dados)
+
+    for arquivo in (str(caminho), dados):
+        out = loaders.agregar_pedidos(arquivo, por_empresa=True, linhas_por_bloco=1000)
+        assert set(out) == {"Loja A", "Loja São João"}
+        assert out["Loja São João"]["Quantidade"].tolist() == [2]
+        assert out["Loja A"]["Quantidade"].sum() == 4000
+
+
+def test_numero_br_com_espaco_nao_separavel():
+    from engine.normalizador import br_to_float_series
+
+    s = pd.Series(["R$\xa01.234,56", "R$ 10,00", " 2.000", "abc"])
+    out, rejeitados = br_to_float_series(s, retornar_rejeitados=True)
+    assert out.tolist()[:3] == [1234.56, 10.0, 2000.0]
+    assert rejeitados == 1
+
+    texto = "SKU;Estoque;Preço\nA;1;R$\xa01.234,56\n"
+    assert loaders.carregar_fisico(texto.encode())["Preco"].tolist() == [1234.56]
+
+
+def test_csv_com_virgula_conta_celulas_invalidas(caplog):
+    texto = 'SKU,Estoque,Preço\nA,3,1.5\nB,abc,"1,234.50"\nC,4,\n'
+    with caplog.at_level("WARNING"):
+        out = loaders.carregar_fisico(texto.encode())
+    assert out["Estoque_Fisico"].tolist() == [3, 0, 4]
+    assert out["Preco"].tolist() == [1.5, 1234.5, 0.0]
+    assert any("Estoque_Fisico" in r.getMessage() and " 1 " in r.getMessage()
+               for r in caplog.records)
+
+
+def test_leitor_xlsx_igual_ao_read_excel():
+    import datetime as dt
+
+    import openpyxl
+    from openpyxl.cell.rich_text import CellRichText, TextBlock
+    from openpyxl.cell.text import InlineFont
+
+    # openpyxl grava textos inline (<is>), inclusive com trechos formatados
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Loja", "SKU", "Qtd", "Data do pedido", "Status", "Obs"])
+    ws.append(["Loja A", CellRichText(["ab-", TextBlock(InlineFont(b=True), "1")]), 2,
+               dt.date(2025, 1, 2), "Pago", None])
+    ws.append([None, 12345, None, dt.datetime(2025, 1, 3, 10, 30), None, "x"])
+    ws.append(["Loja B", "C&D <3>", 1.0, "04/01/2025", "Cancelado", None])
+    ws.append([None, None, None, None, None, None])
+    ws.append(["Loja B", "E", 7, 45662, "", "y"])
+    buf = io.BytesIO()
+    wb.save(buf)
+    dados = buf.getvalue()
+
+    rapido = loaders._tipar(*loaders._ler_xlsx(dados, loaders.COLUNAS_PEDIDOS),
+                            loaders.COLUNAS_PEDIDOS)
+    referencia = loaders._tipar(*loaders._ler_excel_pandas(dados, loaders.COLUNAS_PEDIDOS),
+                                loaders.COLUNAS_PEDIDOS)
+    pd.testing.assert_frame_equal(rapido, referencia)
+    assert rapido["SKU"].tolist() == ["ab-1", "12345", "C&D <3>", "E"]
+    assert rapido["Data"].dt.day.tolist() == [2, 3, 4, 5]
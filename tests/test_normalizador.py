@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from engine.normalizador import br_to_float, br_to_float_series, br_to_float_avisando
+
+
+def test_serie_igual_ao_valor_a_valor():
+    s = pd.Series(["R$ 1.234,56", "10", "2,5", "", None, 7, 3.5, "abc", "10"])
+    esperado = [br_to_float(v) for v in s]
+    out = br_to_float_series(s)
+    np.testing.assert_array_equal(out.to_numpy(), np.array(esperado, dtype=float))
+
+
+def test_espaco_nao_separavel():
+    s = pd.Series(["R$\xa01.234,56", "R$ 10,00", " 2.000", "abc"])
+    out, rejeitados = br_to_float_series(s, retornar_rejeitados=True)
+    assert out.tolist()[:3] == [1234.56, 10.0, 2000.0]
+    assert rejeitados == 1
+
+
+def test_valores_nao_numericos_sao_avisados(caplog):
+    s = pd.Series(["3", "x", "y", ""], name="Estoque")
+    with caplog.at_level("WARNING"):
+        out = br_to_float_avisando(s)
+    assert out.fillna(0).tolist() == [3.0, 0.0, 0.0, 0.0]
+    assert "Estoque: 2 " in caplog.text
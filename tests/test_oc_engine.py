@@ -0,0 +1,126 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from engine import oc_engine
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    oc_engine.fechar_conexoes()
+    monkeypatch.setattr(oc_engine, "DB_PATH", str(tmp_path / "ocs.db"))
+    monkeypatch.setattr(oc_engine, "SINCRONIZAR", False)
+    oc_engine.init_db()
+    yield
+    oc_engine.fechar_conexoes()
+
+
+def test_data_fim_sem_horario_inclui_o_dia(banco):
+    itens = pd.DataFrame({"SKU": ["A"], "Qtd_Ajustada": [1],
+                          "Preco_Custo": [1.0], "Valor_Ajustado_R$": [1.0]})
+    oc_engine.salvar_oc(None, "FORN", "EMP", itens)
+    hoje = dt.date.today()
+
+    for ini, fim in [(hoje, hoje),
+                     (hoje.isoformat(), hoje.isoformat()),
+                     (hoje.isoformat(), f" {hoje.isoformat()} ")]:
+        assert len(oc_engine.consultar_ocs(data_ini=ini, data_fim=fim)) == 1
+
+    # Com horário o limite é exato
+    inicio = dt.datetime.combine(hoje, dt.time.min)
+    assert len(oc_engine.consultar_ocs(data_fim=inicio.isoformat())) == 0
+    assert len(oc_engine.consultar_ocs(data_fim=inicio)) == 0
+
+
+def _itens():
+    return pd.DataFrame({"SKU": ["A"], "Qtd_Ajustada": [1],
+                         "Preco_Custo": [1.0], "Valor_Ajustado_R$": [1.0]})
+
+
+def _seq(numero):
+    return int(numero.rsplit("-", 1)[1])
+
+
+def test_numeros_sequenciais(banco):
+    hoje = dt.date.today().strftime("%Y%m%d")
+    a = oc_engine.salvar_oc(None, "Forn X", "EMP", _itens())
+    b = oc_engine.salvar_oc(None, "Forn X", "EMP", _itens())
+    assert a == f"OC-FORNX-{hoje}-001"
+    assert b == f"OC-FORNX-{hoje}-002"
+
+
+def test_numeros_unicos_entre_conexoes_concorrentes(banco):
+    import threading
+
+    numeros, erros = [], []
+    largada = threading.Barrier(2)
+
+    def sessao():
+        try:
+            largada.wait()
+            for _ in range(20):
+                numeros.append(oc_engine.salvar_oc(None, "FORN", "EMP", _itens()))
+        except Exception as e:
+            erros.append(e)
+        finally:
+            oc_engine.fechar_conexoes()
+
+    threads = [threading.Thread(target=sessao) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not erros
+    assert sorted(map(_seq, numeros)) == list(range(1, 41))
+
+
+def test_migra_banco_do_schema_original(tmp_path, monkeypatch):
+    import sqlite3
+
+    caminho = str(tmp_path / "antigo.db")
+    hoje = dt.datetime.now()
+    conn = sqlite3.connect(caminho)
+    # Schema e dados como o init_db original deixava (user_version 0)
+    conn.execute("""CREATE TABLE ocs (id INTEGER PRIMARY KEY AUTOINCREMENT, numero TEXT,
+                    fornecedor TEXT, empresa TEXT, criado_em TEXT, recebido INTEGER DEFAULT 0)""")
+    conn.execute("""CREATE TABLE oc_itens (id INTEGER PRIMARY KEY AUTOINCREMENT, oc_numero TEXT,
+                    sku TEXT, qtd INTEGER, preco REAL, valor REAL)""")
+    dia = hoje.strftime("%Y%m%d")
+    for i in (1, 2):
+        conn.execute("INSERT INTO ocs (numero, fornecedor, empresa, criado_em) VALUES (?, ?, ?, ?)",
+                     (f"OC-FORN-{dia}-{i:03d}", "FORN", "EMP", hoje.isoformat()))
+    conn.commit()
+    conn.close()
+
+    oc_engine.fechar_conexoes()
+    monkeypatch.setattr(oc_engine, "DB_PATH", caminho)
+    monkeypatch.setattr(oc_engine, "SINCRONIZAR", False)
+    try:
+        oc_engine.init_db()
+        oc_engine.init_db()     # idempotente
+        c = oc_engine.conectar()
+        assert c.execute("PRAGMA user_version").fetchone()[0] == len(oc_engine.MIGRACOES)
+        tabelas = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"ocs", "oc_itens", "oc_sequencia", "sync_fila"} <= tabelas
+
+        # A sequência continua de onde o banco antigo parou
+        assert oc_engine.salvar_oc(None, "FORN", "EMP", _itens()) == f"OC-FORN-{dia}-003"
+        assert len(oc_engine.consultar_ocs()) == 3
+    finally:
+        oc_engine.fechar_conexoes()
+
+
+def test_pdf_em_memoria_e_em_disco(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    itens = pd.DataFrame({"SKU": ["A&B", "C"], "Qtd_Ajustada": [2, 1],
+                          "Preco_Custo": [1.5, 2.0], "Valor_Ajustado_R$": [3.0, 2.0]})
+
+    pdf = oc_engine.renderizar_pdf_oc("OC-1", "Forn <X>", "EMP", itens)
+    assert pdf.startswith(b"%PDF")
+    assert not (tmp_path / "pdfs").exists()
+
+    caminho = oc_engine.gerar_pdf_oc("OC-1", "Forn <X>", "EMP", itens)
+    assert caminho == "pdfs/OC-1.pdf"
+    assert (tmp_path / caminho).read_bytes().startswith(b"%PDF")
@@ -0,0 +1,50 @@
+import os
+import time
+
+import pandas as pd
+
+from data import storage
+
+
+def _envelhecer(pasta, segundos=2 * storage.IDADE_MAX_SESSAO):
+    t = time.time() - segundos
+    os.utime(pasta, (t, t))
+
+
+def test_sessao_em_uso_nao_e_descartada(tmp_path):
+    raiz = str(tmp_path)
+    df = pd.DataFrame({"SKU": ["A", "B"], "Quantidade": [1, 2]})
+    ativa, abandonada = {}, {}
+    storage.save_dataframe("vendas", df, ativa, limiar=0, storage_dir=raiz)
+    storage.save_dataframe("vendas", df, abandonada, limiar=0, storage_dir=raiz)
+    pasta_ativa = os.path.join(raiz, ativa["_storage_sessao"])
+    pasta_abandonada = os.path.join(raiz, abandonada["_storage_sessao"])
+
+    # Ler o frame renova a pasta da sessão
+    _envelhecer(pasta_ativa)
+    assert storage.load_dataframe("vendas", ativa)["Quantidade"].tolist() == [1, 2]
+    _envelhecer(pasta_abandonada)
+    storage.descartar_sessoes_antigas(raiz)
+    assert os.path.isdir(pasta_ativa)
+    assert not os.path.exists(pasta_abandonada)
+
+    # A sessão que grava nunca descarta a própria pasta
+    _envelhecer(pasta_ativa)
+    storage.save_dataframe("fisico", df, ativa, limiar=0, storage_dir=raiz)
+    assert storage.load_dataframe("vendas", ativa)["Quantidade"].tolist() == [1, 2]
+
+
+def test_compactar_nao_estoura_nem_aumenta_o_frame():
+    n = 1000
+    df = pd.DataFrame({"SKU": [f"SKU{i}" for i in range(n)],
+                       "fornecedor": ["F1", "F2"] * (n // 2),
+                       "Estoque": [100] * n,
+                       "Entrada": [120] * n})
+    c = storage.compactar(df)
+
+    assert c["Estoque"].dtype == "int32"
+    assert ((c["Estoque"] + c["Entrada"]) == 220).all()
+    # SKUs todos distintos ficam como texto; fornecedor repetido vira category
+    assert c["SKU"].dtype == object
+    assert c["fornecedor"].dtype == "category"
+    assert storage.tamanho_bytes(c) <= storage.tamanho_bytes(df)
@@ -0,0 +1,129 @@
+import pandas as pd
+import pytest
+
+from engine import oc_engine, sync
+
+
+class _Tabela:
+    def __init__(self, cliente, nome):
+        self.cliente = cliente
+        self.nome = nome
+        self.linhas = None
+
+    def upsert(self, linhas, on_conflict=None):
+        self.linhas = (linhas, on_conflict)
+        return self
+
+    def execute(self):
+        if self.cliente.falhar:
+            raise ConnectionError("sem rede")
+        self.cliente.enviados.setdefault(self.nome, []).extend(self.linhas[0])
+
+
+class ClienteFalso:
+    """Dublê do cliente supabase-py: table(nome).upsert(...).execute()."""
+
+    def __init__(self):
+        self.falhar = False
+        self.enviados = {}
+
+    def table(self, nome):
+        return _Tabela(self, nome)
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    oc_engine.fechar_conexoes()
+    monkeypatch.setattr(oc_engine, "DB_PATH", str(tmp_path / "ocs.db"))
+    monkeypatch.setattr(oc_engine, "SINCRONIZAR", True)
+    oc_engine.init_db()
+    yield
+    oc_engine.fechar_conexoes()
+
+
+def _itens(n=3):
+    return pd.DataFrame({"SKU": [f"SKU{i}" for i in range(n)],
+                         "Qtd_Ajustada": [1] * n,
+                         "Preco_Custo": [2.0] * n,
+                         "Valor_Ajustado_R$": [2.0] * n})
+
+
+def test_envia_e_esvazia_fila(banco):
+    numero = oc_engine.salvar_oc(None, "FORN", "EMP", _itens(3))
+    cliente = ClienteFalso()
+    s = sync.SincronizadorSupabase(cliente_factory=lambda: cliente)
+
+    assert sync.pendentes() == 4
+    assert s.sincronizar_uma_vez() == 4
+    assert sync.pendentes() == 0
+    assert [o["numero"] for o in cliente.enviados["ocs"]] == [numero]
+    assert len(cliente.enviados["oc_itens"]) == 3
+
+
+def test_falha_reagenda_e_reenvia(banco):
+    oc_engine.salvar_oc(None, "FORN", "EMP", _itens(2))
+    cliente = ClienteFalso()
+    cliente.falhar = True
+    s = sync.SincronizadorSupabase(cliente_factory=lambda: cliente)
+
+    assert s.sincronizar_uma_vez() == 0
+    tentativas, erro = oc_engine.conectar().execute(
+        "SELECT MAX(tentativas), MAX(erro) FROM sync_fila").fetchone()
+    assert tentativas == 1 and "sem rede" in erro
+    assert sync.pendentes() == 3
+
+    # Ainda no backoff: nada é reenviado
+    cliente.falhar = False
+    assert s.sincronizar_uma_vez() == 0
+
+    # Vencido o prazo, a nova tentativa envia tudo
+    with oc_engine.transacao() as conn:
+        conn.execute("UPDATE sync_fila SET proxima_tentativa = 0")
+    assert s.sincronizar_uma_vez() == 3
+    assert sync.pendentes() == 0
+    assert len(cliente.enviados["oc_itens"]) == 2
+
+
+def test_sem_supabase_nao_enfileira(banco, monkeypatch):
+    monkeypatch.setattr(oc_engine, "SINCRONIZAR", False)
+    numero = oc_engine.salvar_oc(None, "FORN", "EMP", _itens(3))
+    oc_engine.marcar_recebida(numero)
+    assert sync.pendentes() == 0
+
+
+class _Segredos(dict):
+    """Dublê de st.secrets que registra cada leitura."""
+
+    def __init__(self, lidos, **kw):
+        super().__init__(**kw)
+        self.lidos = lidos
+
+    def __getitem__(self, chave):
+        self.lidos.append(chave)
+        return super().__getitem__(chave)
+
+
+def test_fora_do_streamlit_nao_le_st_secrets(monkeypatch):
+    import streamlit
+    from streamlit import runtime
+    from engine import db
+
+    monkeypatch.delenv("SUPABASE_URL", raising=False)
+    monkeypatch.delenv("SUPABASE_KEY", raising=False)
+    lidos = []
+    monkeypatch.setattr(streamlit, "secrets",
+                        _Segredos(lidos, SUPABASE_URL="u", SUPABASE_KEY="k"))
+
+    assert not db.supabase_configurado()
+    assert lidos == []
+
+    monkeypatch.setenv("SUPABASE_URL", "u")
+    monkeypatch.setenv("SUPABASE_KEY", "k")
+    assert db.supabase_configurado()
+    assert lidos == []
+
+    # Dentro de `streamlit run` os segredos da UI continuam valendo
+    monkeypatch.delenv("SUPABASE_URL")
+    monkeypatch.setattr(runtime, "exists", lambda: True)
+    assert db.supabase_configurado()
+    assert lidos == ["SUPABASE_URL", "SUPABASE_KEY"]
@@ -0,0 +1,21 @@
+import datetime as dt
+
+import pandas as pd
+
+from data.vendas_diarias import VendasDiarias
+
+
+def test_registrar_le_data_com_dia_primeiro(tmp_path):
+    v = VendasDiarias(str(tmp_path))
+    diario = pd.DataFrame({"SKU": ["a", "b", "a"],
+                           "Data": ["01/02/2025", "2025-02-01", "13/01/2025"],
+                           "Quantidade": [2, 3, 1]})
+    assert v.registrar(diario, "ML") == [dt.date(2025, 1, 13), dt.date(2025, 2, 1)]
+    assert v.total("ML", 1).to_dict("list") == {"SKU": ["A", "B"], "Quantidade": [2, 3]}
+
+
+def test_registrar_aceita_datas_tipadas(tmp_path):
+    v = VendasDiarias(str(tmp_path))
+    diario = pd.DataFrame({"SKU": ["A"], "Data": pd.to_datetime(["2025-02-01 15:30"]),
+                           "Quantidade": [4]})
+    assert v.registrar(diario, "ML") == [dt.date(2025, 2, 1)]
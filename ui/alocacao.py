@@ -1,10 +1,35 @@
+import pandas as pd
 import streamlit as st
-from data.storage import load_dataframe
+from data.storage import impressao_salva, load_dataframe
+from engine.alocacao import alocar_estoque, indexar_vendas
+from engine.normalizador import norm_sku, normalize_cols
+
+
+def _tabela_vendas(vendas):
+    """Vendas indexadas por SKU, refeitas só quando o upload muda."""
+    chave = impressao_salva("vendas_60d")
+    if st.session_state.get("aloc_vendas_chave") != chave:
+        st.session_state["aloc_vendas"] = indexar_vendas(vendas)
+        st.session_state["aloc_vendas_chave"] = chave
+    return st.session_state["aloc_vendas"]
+
+
+def _ler_recebido(arquivo) -> pd.DataFrame:
+    if arquivo.name.lower().endswith(".csv"):
+        df = pd.read_csv(arquivo, sep=None, engine="python", dtype=str)
+    else:
+        df = pd.read_excel(arquivo, dtype=str)
+    df = normalize_cols(df)
+    qtd_col = next((c for c in ("quantidade", "qtd", "qty") if c in df.columns), None)
+    if "sku" not in df.columns or qtd_col is None:
+        raise ValueError("O arquivo precisa das colunas SKU e Quantidade.")
+    return df.rename(columns={"sku": "SKU", qtd_col: "Quantidade"})
+
 
 def app():
     st.title("📦 Alocação de Estoque entre Empresas")
 
-    st.write("Distribui o estoque entre Alivvia e JCA com base nas vendas dos últimos 60 dias.")
+    st.write("Distribui o estoque recebido entre as empresas com base nas vendas dos últimos 60 dias.")
 
     # Carrega informações dos uploads
     vendas = load_dataframe("vendas_60d")
@@ -12,31 +37,61 @@ def app():
         st.warning("Faça o upload primeiro.")
         return
 
-    # Campo de SKU
+    try:
+        tabela = _tabela_vendas(vendas)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    regra = st.selectbox(
+        "SKUs sem vendas:",
+        ["igual", "geral"],
+        format_func={"igual": "Dividir igualmente",
+                     "geral": "Proporcional às vendas totais"}.get,
+    )
+
+    # -----------------------------
+    # Container inteiro
+    # -----------------------------
+    st.subheader("Recebimento completo")
+    arquivo = st.file_uploader("Planilha com SKU e Quantidade", type=["xlsx", "csv"])
+    if arquivo is not None:
+        try:
+            resultado = alocar_estoque(_ler_recebido(arquivo), tabela,
+                                       regra_sem_vendas=regra)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            sem_vendas = int((resultado["Criterio"] == "sem_vendas").sum())
+            if sem_vendas:
+                st.info(f"{sem_vendas} SKU(s) sem vendas no período.")
+            st.dataframe(resultado, use_container_width=True)
+            st.download_button(
+                "Baixar alocação (CSV)",
+                resultado.to_csv(index=False, sep=";", decimal=",").encode("utf-8-sig"),
+                file_name="alocacao.csv",
+                mime="text/csv",
+            )
+
+    # -----------------------------
+    # Consulta de um SKU
+    # -----------------------------
+    st.subheader("Consulta por SKU")
     sku = st.text_input("SKU:")
     qtd = st.number_input("Quantidade total recebida:", min_value=1)
 
     if st.button("Calcular Alocação"):
-        df = vendas[vendas["SKU"] == sku]
-
-        if df.empty:
+        sku = norm_sku(sku)
+        if sku not in tabela.index:
             st.error("SKU não encontrado nos uploads.")
             return
 
-        alivvia = df.iloc[0]["Vendas_Alivvia"]
-        jca = df.iloc[0]["Vendas_JCA"]
-        total = alivvia + jca
-
-        if total == 0:
-            st.error("Este SKU não teve vendas no período.")
-            return
-
-        prop_alivvia = alivvia / total
-        prop_jca = jca / total
+        if tabela.loc[sku].sum() == 0:
+            st.warning("Este SKU não teve vendas no período; aplicada a regra escolhida.")
 
-        aloc_alivvia = round(qtd * prop_alivvia)
-        aloc_jca = qtd - aloc_alivvia
+        linha = alocar_estoque(pd.DataFrame({"SKU": [sku], "Quantidade": [qtd]}),
+                               tabela, regra_sem_vendas=regra).iloc[0]
 
         st.success("Alocação realizada!")
-        st.metric("Alivvia", aloc_alivvia)
-        st.metric("JCA", aloc_jca)
+        for col, empresa in zip(st.columns(len(tabela.columns)), tabela.columns):
+            col.metric(empresa, int(linha[empresa]))
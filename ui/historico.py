@@ -1,5 +1,50 @@
 import streamlit as st
+from engine.oc_engine import init_db, consultar_ocs
+
+POR_PAGINA = 50
+
 
 def app():
     st.header("📚 Histórico")
-    st.write("Aqui ficará o histórico de operações.")
+
+    init_db()
+
+    c1, c2, c3 = st.columns(3)
+    fornecedor = c1.text_input("Fornecedor")
+    empresa = c2.text_input("Empresa")
+    status = c3.selectbox("Status", ["Todas", "ABERTAS", "RECEBIDAS"])
+
+    periodo = st.date_input("Período", value=())
+    data_ini = periodo[0] if len(periodo) > 0 else None
+    data_fim = periodo[1] if len(periodo) > 1 else data_ini
+
+    # Paginação por chave: pilha com o último id de cada página visitada
+    filtros = (fornecedor, empresa, status, data_ini, data_fim)
+    if st.session_state.get("hist_filtros") != filtros:
+        st.session_state["hist_filtros"] = filtros
+        st.session_state["hist_cursores"] = [None]
+
+    cursores = st.session_state["hist_cursores"]
+
+    df = consultar_ocs(
+        fornecedor=fornecedor or None,
+        empresa=empresa or None,
+        data_ini=data_ini,
+        data_fim=data_fim,
+        status=None if status == "Todas" else status,
+        apos_id=cursores[-1],
+        limite=POR_PAGINA,
+    )
+
+    if df.empty:
+        st.info("Nenhuma OC encontrada.")
+    else:
+        st.dataframe(df.drop(columns=["id"]), use_container_width=True)
+
+    nav1, nav2, _ = st.columns([1, 1, 6])
+    if nav1.button("← Anterior", disabled=len(cursores) == 1):
+        cursores.pop()
+        st.rerun()
+    if nav2.button("Próxima →", disabled=len(df) < POR_PAGINA):
+        cursores.append(int(df["id"].iloc[-1]))
+        st.rerun()